@@ -0,0 +1,233 @@
+#                                                         -*- coding: utf-8 -*-
+#! \file    ./benchmarks/bench_eval.py
+#! \author  Jiří Kučera, <sanczes@gmail.com>
+#! \stamp   2026-10-18 10:21:17 (UTC+01:00, DST+01:00)
+#! \project DoIt!: Tools and Libraries for Building DSLs
+#! \license MIT
+#! \version 0.0.0
+#! \fdesc   @pyfile.docstr
+#
+"""\
+Command processor's eval module benchmarks.\
+"""
+
+__license__ = """\
+Copyright (c) 2014 - 2017 Jiří Kučera.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+IN THE SOFTWARE.\
+"""
+
+from doit.support.cmd.runtime import \
+    List
+
+from doit.support.cmd.eval import \
+    CommandProcessor
+
+from doit.support.cmd.commands import \
+    MacroNode, MacroNodeAtom, MacroNodeParam, \
+    Expand, \
+    SetLocal, \
+    GetLocal, \
+    DefMacro, Define, \
+    Add, Mod, Eq, \
+    Map, Filter, \
+    Block, If, Foreach, \
+    Call, ECall, Return
+
+from .common import \
+    ScalingBenchmark
+
+SIZES = [ 1000, 4000, 16000, 64000 ]
+
+class LongBlockBenchmark(ScalingBenchmark):
+    __slots__ = []
+
+    def __init__(self):
+        ScalingBenchmark.__init__(self,
+            "Block of n commands (code buffer push/pop)", SIZES
+        )
+    #-def
+
+    def setup(self, n):
+        return (
+            CommandProcessor(),
+            [Block(*[SetLocal('x', i) for i in range(n)])]
+        )
+    #-def
+
+    def step(self, n, data):
+        p, code = data
+        p.run(code)
+    #-def
+#-class
+
+class ForeachBenchmark(ScalingBenchmark):
+    __slots__ = []
+
+    def __init__(self):
+        ScalingBenchmark.__init__(self, "Foreach over n items", SIZES)
+    #-def
+
+    def setup(self, n):
+        return (
+            CommandProcessor(),
+            [Foreach('x', List(range(n)), [GetLocal('x')])]
+        )
+    #-def
+
+    def step(self, n, data):
+        p, code = data
+        p.run(code)
+    #-def
+#-class
+
+class CompiledForeachBenchmark(ScalingBenchmark):
+    __slots__ = [ 'compiled' ]
+
+    def __init__(self, compiled):
+        ScalingBenchmark.__init__(self, "Foreach accumulating n items (%s)" % (
+            "compiled" if compiled else "tree-walking"
+        ), SIZES)
+        self.compiled = compiled
+    #-def
+
+    def setup(self, n):
+        p = CommandProcessor()
+        code = [
+            SetLocal('x', 0),
+            Foreach('i', List(range(n)), [
+                SetLocal('x', Add(GetLocal('x'), GetLocal('i')))
+            ])
+        ]
+        return p, [p.compile(code)] if self.compiled else code
+    #-def
+
+    def step(self, n, data):
+        p, code = data
+        p.run(code)
+    #-def
+#-class
+
+class CallBenchmark(ScalingBenchmark):
+    __slots__ = [ 'compiled' ]
+
+    def __init__(self, compiled):
+        ScalingBenchmark.__init__(self, "Calls reading outer variables (%s)" % (
+            "compiled" if compiled else "tree-walking"
+        ), SIZES)
+        self.compiled = compiled
+    #-def
+
+    def setup(self, n):
+        p = CommandProcessor()
+        code = [
+            SetLocal('k', 1),
+            Define('f', [], ['a'], False, [
+                Block(Block(Return(Add(GetLocal('a'), GetLocal('k')))))
+            ]),
+            SetLocal('x', 0),
+            Foreach('i', List(range(n)), [
+                SetLocal('x', Call(GetLocal('f'), GetLocal('x')))
+            ])
+        ]
+        return p, [p.compile(code)] if self.compiled else code
+    #-def
+
+    def step(self, n, data):
+        p, code = data
+        p.run(code)
+    #-def
+#-class
+
+class SeqOpBenchmark(ScalingBenchmark):
+    __slots__ = [ 'op', 'body' ]
+
+    def __init__(self, op, kind, body):
+        ScalingBenchmark.__init__(self, "%s over n items (%s)" % (
+            op.__name__, kind
+        ), SIZES)
+        self.op = op
+        self.body = body
+    #-def
+
+    def setup(self, n):
+        p = CommandProcessor()
+        p.run([Define('f', [], ['x'], False, self.body)])
+        return p, [self.op(List(range(n)), GetLocal('f'))]
+    #-def
+
+    def step(self, n, data):
+        p, code = data
+        p.run(code)
+    #-def
+#-class
+
+class ExpandBenchmark(ScalingBenchmark):
+    __slots__ = []
+
+    def __init__(self):
+        ScalingBenchmark.__init__(self,
+            "Macro expanded in a loop of n iterations", SIZES
+        )
+    #-def
+
+    def setup(self, n):
+        p = CommandProcessor()
+        p.run([DefMacro('m', ['v'], [
+            MacroNode(SetLocal, MacroNodeAtom('y'), MacroNode(Add,
+                MacroNode(Mod, MacroNode(GetLocal, MacroNodeAtom('x')),
+                    MacroNodeAtom(7)
+                ),
+                MacroNode(GetLocal, MacroNodeParam('v'))
+            ))
+        ])])
+        return p, [Foreach('x', List(range(n)), [
+            Expand(GetLocal('m'), 'x')
+        ])]
+    #-def
+
+    def step(self, n, data):
+        p, code = data
+        p.run(code)
+    #-def
+#-class
+
+def suite():
+    return [
+        LongBlockBenchmark(),
+        ForeachBenchmark(),
+        CompiledForeachBenchmark(False),
+        CompiledForeachBenchmark(True),
+        CallBenchmark(False),
+        CallBenchmark(True),
+        ExpandBenchmark(),
+        SeqOpBenchmark(Map, "operation", [
+            Return(Add(GetLocal('x'), 1))
+        ]),
+        SeqOpBenchmark(Map, "external", [
+            Return(ECall((lambda x: x + 1), GetLocal('x')))
+        ]),
+        SeqOpBenchmark(Filter, "operation", [
+            Return(Eq(Mod(GetLocal('x'), 2), 0))
+        ]),
+        SeqOpBenchmark(Filter, "interpreted", [
+            If(Eq(Mod(GetLocal('x'), 2), 0), [Return(True)], [Return(False)])
+        ])
+    ]
+#-def
@@ -0,0 +1,173 @@
+#                                                         -*- coding: utf-8 -*-
+#! \file    ./benchmarks/bench_operations.py
+#! \author  Jiří Kučera, <sanczes@gmail.com>
+#! \stamp   2026-10-18 14:05:32 (UTC+01:00, DST+01:00)
+#! \project DoIt!: Tools and Libraries for Building DSLs
+#! \license MIT
+#! \version 0.0.0
+#! \fdesc   @pyfile.docstr
+#
+"""\
+Command processor's operations benchmarks.\
+"""
+
+__license__ = """\
+Copyright (c) 2014 - 2017 Jiří Kučera.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+IN THE SOFTWARE.\
+"""
+from doit.support.cmd.runtime import \
+    Pair, \
+    List, \
+    HashMap
+
+from doit.support.cmd.eval import \
+    CommandProcessor
+
+from doit.support.cmd import commands
+
+from .common import \
+    measure, \
+    Benchmark
+
+N = 20000
+
+SAMPLES = {
+    'add': (3, 4),
+    'sub': (3, 4.5),
+    'mul': (3, 4),
+    'div': (7, 2),
+    'mod': (7, 2),
+    'neg': (5,),
+    'bitand': (12, 10),
+    'bitor': (12, 10),
+    'bitxor': (12, 10),
+    'shiftl': (1, 3),
+    'shiftr': (8, 1),
+    'inv': (5,),
+    'lt': (1, 2),
+    'gt': ("a", "b"),
+    'le': (1, 2),
+    'ge': ("a", "b"),
+    'eq': (1, 1),
+    'ne': (1, 2),
+    'is': (1, 1),
+    'not': (True,),
+    'newpair': (1, 2),
+    'copy': (List([1, 2, 3]),),
+    'slice': ("abcdef", 1, 4),
+    'concat': ("ab", "cd"),
+    'join': (List([1]), List([2])),
+    'merge': (HashMap({1: 2}), HashMap({3: 4})),
+    'instanceof': (1, int),
+    'strlen': ("abc",),
+    'size': (List([1, 2]),),
+    'empty': ("",),
+    'contains': ("abc", "b"),
+    'count': (List([1, 1, 2]), 1),
+    'isdigit': ("1a",),
+    'isupper': ("Ab",),
+    'islower': ("Ab",),
+    'isalpha': ("Ab",),
+    'isletter': ("_b",),
+    'isalnum': ("Ab",),
+    'isword': ("_b",),
+    'keys': (HashMap({1: 2}),),
+    'values': (HashMap({1: 2}),),
+    'first': (Pair(1, 2),),
+    'second': (Pair(1, 2),),
+    'getitem': (List([1, 2, 3]), 1),
+    'substr': ("abc", "b"),
+    'find': ("abcabc", "c", 0, 6),
+    'rfind': ("abcabc", "c", 0, 6),
+    'lstrip': (" a ",),
+    'rstrip': (" a ",),
+    'strip': (" a ",),
+    'toupper': ("ab",),
+    'tolower': ("AB",),
+    'subst': ("aba", "a", "c"),
+    'trans': ("abc", HashMap({'a': 'x'})),
+    'head': (List([1, 2]),),
+    'tail': (List([1, 2]),),
+    'sort': (List([3, 1, 2]),),
+    'reverse': (List([3, 1, 2]),),
+    'unique': (List([1, 1, 2]),),
+    'split': ("a,b", ",")
+}
+
+def operation_classes():
+    classes = {}
+    for x in vars(commands).values():
+        if isinstance(x, type) and issubclass(x, commands.Operation):
+            classes[x.__name__.lower()] = x
+    return classes
+#-def
+
+class OperationsBenchmark(Benchmark):
+    __slots__ = []
+
+    def __init__(self):
+        Benchmark.__init__(self,
+            "Operations (%d calls each, specialized vs. generic)" % N
+        )
+    #-def
+
+    def fast(self, p, cmd, args):
+        pushval, do_op = p.pushval, cmd.do_op
+        for _ in range(N):
+            for x in args:
+                pushval(x)
+            do_op(p)
+    #-def
+
+    def generic(self, p, cmd, args):
+        pushval, load_operands, do_op_generic = \
+            p.pushval, cmd.load_operands, cmd.do_op_generic
+        for _ in range(N):
+            for x in args:
+                pushval(x)
+            do_op_generic(p, *load_operands(p))
+    #-def
+
+    def run(self, out):
+        missing = set(commands.Operation.OP_TAB) - set(SAMPLES)
+        if missing:
+            raise ValueError("No samples for %s" % ", ".join(sorted(missing)))
+        classes = operation_classes()
+        out.write("%s:\n" % self.name)
+        out.write("  %-12s %12s %12s %8s\n" % (
+            "operation", "specialized", "generic", "speedup"
+        ))
+        p = CommandProcessor()
+        for name in sorted(SAMPLES):
+            args = SAMPLES[name]
+            cmd = classes[name](*args)
+            tf = measure(self.fast, p, cmd, args)
+            tg = measure(self.generic, p, cmd, args)
+            out.write("  %-12s %10.3fus %10.3fus %8.2f\n" % (
+                name, tf / N * 1e6, tg / N * 1e6, tg / tf
+            ))
+    #-def
+#-class
+
+def suite():
+    return [
+        OperationsBenchmark()
+    ]
+#-def
@@ -0,0 +1,95 @@
+#                                                         -*- coding: utf-8 -*-
+#! \file    ./benchmarks/common.py
+#! \author  Jiří Kučera, <sanczes@gmail.com>
+#! \stamp   2026-10-18 10:14:05 (UTC+01:00, DST+01:00)
+#! \project DoIt!: Tools and Libraries for Building DSLs
+#! \license MIT
+#! \version 0.0.0
+#! \fdesc   @pyfile.docstr
+#
+"""\
+Common benchmarking utilities.\
+"""
+
+__license__ = """\
+Copyright (c) 2014 - 2017 Jiří Kučera.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+IN THE SOFTWARE.\
+"""
+
+import time
+
+REPEAT = 3
+
+def measure(f, *args):
+    best = None
+    for _ in range(REPEAT):
+        t = time.perf_counter()
+        f(*args)
+        t = time.perf_counter() - t
+        if best is None or t < best:
+            best = t
+    return best
+#-def
+
+class Benchmark(object):
+    __slots__ = [ 'name' ]
+
+    def __init__(self, name):
+        self.name = name
+    #-def
+
+    def run(self, out):
+        pass
+    #-def
+#-class
+
+class ScalingBenchmark(Benchmark):
+    __slots__ = [ 'sizes' ]
+
+    def __init__(self, name, sizes):
+        Benchmark.__init__(self, name)
+        self.sizes = sizes
+    #-def
+
+    def setup(self, n):
+        return None
+    #-def
+
+    def step(self, n, data):
+        pass
+    #-def
+
+    def run(self, out):
+        out.write("%s:\n" % self.name)
+        out.write("  %10s %12s %12s %8s\n" % (
+            "n", "time [s]", "per item", "growth"
+        ))
+        first = None
+        for n in self.sizes:
+            data = self.setup(n)
+            t = measure(self.step, n, data)
+            per_item = t / n
+            if first is None:
+                first = per_item
+            out.write("  %10d %12.6f %10.3fus %8.2f\n" % (
+                n, t, per_item * 1e6, per_item / first
+            ))
+    #-def
+#-class
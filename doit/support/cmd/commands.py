@@ -33,7 +33,13 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 IN THE SOFTWARE.\
 """
 
-from doit.support.utils import deep_eq
+import collections
+import inspect
+import threading
+
+from doit.support.utils import \
+    deep_eq, \
+    Structural
 
 from doit.support.cmd.errors import \
     CommandError
@@ -41,9 +47,17 @@ from doit.support.cmd.errors import \
 from doit.support.cmd.runtime import \
     isderived, \
     Evaluable, \
+    Iterable, \
+    LazyIterable, \
+    StreamIterator, \
+    iterator_of, \
     Pair, \
     List, \
     HashMap, \
+    PersistentList, \
+    PersistentHashMap, \
+    Rope, \
+    Set, \
     UserType, \
     ExceptionClass, \
     Procedure
@@ -55,11 +69,272 @@ BREAK = 3
 CONTINUE = 4
 CLEANUP = 5
 
+NOVALUE = object()
+
 NumericTypes = (int, float)
-SequenceTypes = (str, Pair, list)
+TextTypes = (str, Rope)
+ListTypes = (list, PersistentList)
+HashTypes = (dict, PersistentHashMap)
+SequenceTypes = (str, Pair) + ListTypes
 FixedLengthSequenceTypes = (Pair,)
-VariableLengthSequenceTypes = (str, list)
-CollectionTypes = (str, Pair, list, dict)
+VariableLengthSequenceTypes = (str,) + ListTypes
+CollectionTypes = SequenceTypes + HashTypes + (Set,)
+IterableTypes = CollectionTypes + (LazyIterable,)
+
+def value_of(processor, x):
+    """
+    """
+
+    if isinstance(x, Command) or hasattr(x, '__call__'):
+        return NOVALUE
+    elif isinstance(x, (
+        bool, int, float, str, Iterable, UserType, Procedure
+    )):
+        return x
+    elif isinstance(x, tuple) and len(x) == 2:
+        return Pair(*x)
+    elif isinstance(x, list):
+        return List(x)
+    elif isinstance(x, dict):
+        return HashMap(x)
+    elif x is None or x is processor.Null:
+        return processor.Null
+    return NOVALUE
+#-def
+
+def iterate(processor, cmd, x):
+    """
+    """
+
+    if isinstance(x, LazyIterable):
+        x.check(processor)
+    it = iterator_of(x)
+    if isinstance(it, StreamIterator):
+        it.guard(processor, cmd.name)
+    it.reset()
+    return it
+#-def
+
+def make_fast_op(spec):
+    """
+    """
+
+    types = spec['types']
+    arity = len(types[0])
+    conversions = spec.get('conversions')
+    constraints = spec.get('constraints')
+    operation = spec['operation']
+
+    # Common cases (one type signature) are checked inline:
+    if len(types) == 1 and arity == 1:
+        ta, = types[0]
+        def fast_op(processor, args):
+            """
+            """
+
+            if len(args) == 1:
+                a = args[0]
+                if conversions is not None:
+                    a = conversions(processor, a)
+                if isinstance(a, ta) and (
+                    constraints is None or constraints(processor, a)[0]
+                ):
+                    return operation(a)
+            return NOVALUE
+        return fast_op
+    if len(types) == 1 and arity == 2:
+        ta, tb = types[0]
+        def fast_op(processor, args):
+            """
+            """
+
+            if len(args) == 2:
+                a, b = args
+                if conversions is not None:
+                    a = conversions(processor, a)
+                    b = conversions(processor, b)
+                if isinstance(a, ta) and isinstance(b, tb) and (
+                    constraints is None or constraints(processor, a, b)[0]
+                ):
+                    return operation(a, b)
+            return NOVALUE
+        return fast_op
+
+    # Other cases:
+    def fast_op(processor, args):
+        """
+        """
+
+        if len(args) != arity:
+            return NOVALUE
+        if conversions is not None:
+            args = [conversions(processor, x) for x in args]
+        for typespec in types:
+            for x, t in zip(args, typespec):
+                if not isinstance(x, t):
+                    break
+            else:
+                break
+        else:
+            return NOVALUE
+        if constraints is not None and not constraints(processor, *args)[0]:
+            return NOVALUE
+        return operation(*args)
+    return fast_op
+#-def
+
+def bind_args(processor, proc, vals):
+    """
+    """
+
+    # Report bad argument counts in the same way as `Call` does:
+    name, qname, _, params, vararg, _, _ = proc
+    nargs, nparams = len(vals), len(params)
+    if not (nparams > 0 and nargs >= nparams - 1 if vararg \
+    else nargs == nparams):
+        raise CommandError(processor.TypeError,
+            "call %s (%s): Bad count of arguments" % (name, qname),
+            processor.traceback()
+        )
+    nreqargs = nparams - 1 if vararg else nparams
+    args = {}
+    for i in range(nreqargs):
+        args[params[i]] = vals[i]
+    if vararg:
+        args[params[-1]] = List(vals[nreqargs:])
+    return args
+#-def
+
+def fast_expr(x, params):
+    """
+    """
+
+    if isinstance(x, GetLocal):
+        if x.varname not in params:
+            return None
+        i = params.index(x.varname)
+        return lambda processor, vals: vals[i]
+    elif isinstance(x, (bool, int, float, str)):
+        return lambda processor, vals: x
+    elif isinstance(x, Operation) \
+    and x.__class__.expand is Operation.expand \
+    and x.__class__.do_op is Operation.do_op:
+        fast_op = x.FAST_OPS.get((x.__class__, x.name))
+        subs = fast_exprs(x.operands, params)
+        if fast_op is None or subs is None:
+            return None
+        return lambda processor, vals: \
+            fast_op(processor, subs(processor, vals))
+    return None
+#-def
+
+def fast_exprs(xs, params):
+    """
+    """
+
+    subs = [fast_expr(x, params) for x in xs]
+    if None in subs:
+        return None
+    def fast_args(processor, vals):
+        """
+        """
+
+        args = []
+        for sub in subs:
+            a = sub(processor, vals)
+            if a is NOVALUE:
+                return [NOVALUE]
+            args.append(a)
+        return args
+    return fast_args
+#-def
+
+def fast_proc(proc, nargs):
+    """
+    """
+
+    name, qname, _, params, vararg, body, _ = proc
+    if vararg or len(params) != nargs:
+        return None
+    while len(body) == 1 \
+    and isinstance(getattr(body[0], 'commands', None), tuple):
+        body = body[0].commands
+    if len(body) != 1 or not isinstance(body[0], Return):
+        return None
+    x = body[0].expr
+    if isinstance(x, ECall) and x.__class__.expand is ECall.expand:
+        subs = fast_exprs(x.args, params)
+        if subs is None or not hasattr(x.proc, '__call__'):
+            return None
+        def fast_ecall(processor, vals):
+            """
+            """
+
+            args = subs(processor, vals)
+            if NOVALUE in args:
+                return NOVALUE
+            try:
+                r = x.call(processor, args)
+            except CommandError:
+                r = x.do_fail
+            else:
+                if inspect.isawaitable(r):
+                    # The processor suspends when this runs:
+                    r = Suspend(r, x)
+                elif value_of(processor, r) is not NOVALUE:
+                    return r
+            # Let the caller run whatever is left from inside of `proc` and
+            # `x`, so the error traces are the same as on the slow path:
+            return CallFrame(name, qname, x.resume(r))
+        return fast_ecall
+    return fast_expr(x, params)
+#-def
+
+class Suspend(object):
+    """
+    """
+    __slots__ = [ 'awaitable', 'source' ]
+
+    def __init__(self, awaitable, source):
+        """
+        """
+
+        self.awaitable = awaitable
+        self.source = source
+    #-def
+
+    def __call__(self, processor):
+        """
+        """
+
+        processor.suspend(self.awaitable, self.source)
+    #-def
+#-class
+
+class InlineCache(object):
+    """
+    """
+    EMPTY = (NOVALUE, None, None)
+    __slots__ = [ 'entry' ]
+
+    def __init__(self):
+        """
+        """
+
+        # A `(key, version, value)` triple. Sites may be shared between
+        # threads, so the entry is only ever replaced as a whole and never
+        # updated field by field:
+        self.entry = self.EMPTY
+    #-def
+
+    def __reduce__(self):
+        """
+        """
+
+        # Cached entries refer to run time objects; never pickle them:
+        return (self.__class__, ())
+    #-def
+#-class
 
 class CommandContext(object):
     """
@@ -74,6 +349,13 @@ class CommandContext(object):
         self.env = None
         self.nvals = 0
     #-def
+
+    def location(self):
+        """
+        """
+
+        return self.cmd.location
+    #-def
 #-class
 
 class Initializer(object):
@@ -100,18 +382,21 @@ class Finalizer(object):
     """
     """
     __slots__ = [
-        'state', 'ctx', 'after', '__acc', '__sandboxed', '__on_throw'
+        'state', 'ctx', 'after', 'guard', '__acc', '__sandboxed', '__on_throw'
     ]
 
-    def __init__(self, ctx,
-        after = [], sb = False, on_throw = (lambda f, p, e: None)
-    ):
+    def __init__(self, ctx, after = [], sb = False, on_throw = None):
         """
         """
 
         self.state = (NONE,)
         self.ctx = ctx
         self.after = after
+        # Only guards can intercept an exception; the processor records
+        # them in its handler table and unwinds other contexts directly:
+        cmd = getattr(ctx, 'cmd', None)
+        self.guard = sb or bool(after) or on_throw is not None \
+            or cmd is not None and cmd.isguard()
         self.__acc = None
         self.__sandboxed = sb
         self.__on_throw = on_throw
@@ -155,6 +440,11 @@ class Finalizer(object):
             return
         self.acc_backup(processor)
         eh = self.state[2] if self.state[0] == EXCEPTION else []
+        if not (eh or self.after):
+            # There is neither exception handler nor finally block to run, so
+            # the state can be resolved right now without any sandboxing.
+            self.resolve(processor, self.state)
+            return
         if eh is None:
             eh = []
         processor.insertcode(
@@ -170,11 +460,8 @@ class Finalizer(object):
         eh_fnlz = processor.popval()
 
         if after_fnlz.state[0] == NONE:
-            if self.state[0] == EXCEPTION:
-                _, e, eh = self.state
-                if eh is None:
-                    self.do_throw(processor, e)
-                elif eh_fnlz.state[0] == EXCEPTION:
+            if self.state[0] == EXCEPTION and self.state[2] is not None:
+                if eh_fnlz.state[0] == EXCEPTION:
                     self.resolve_exception(processor, eh_fnlz.state)
                 elif eh_fnlz.state[0] == RETURN:
                     self.resolve_return(processor, eh_fnlz.state)
@@ -184,16 +471,8 @@ class Finalizer(object):
                     self.resolve_continue(processor, eh_fnlz.state)
                 else:
                     self.do_leave(processor)
-            elif self.state[0] == RETURN:
-                self.resolve_return(processor, self.state)
-            elif self.state[0] == BREAK:
-                self.resolve_break(processor, self.state)
-            elif self.state[0] == CONTINUE:
-                self.resolve_continue(processor, self.state)
-            elif self.state[0] == CLEANUP:
-                self.resolve_cleanup(processor, self.state)
             else:
-                self.do_leave(processor)
+                self.resolve(processor, self.state)
         elif after_fnlz.state[0] == EXCEPTION:
             self.resolve_exception(processor, after_fnlz.state)
         elif after_fnlz.state[0] == RETURN:
@@ -206,6 +485,28 @@ class Finalizer(object):
             self.do_leave(processor)
     #-def
 
+    def resolve(self, processor, state):
+        """
+        """
+
+        if state[0] == EXCEPTION:
+            _, e, eh = state
+            if eh is None:
+                self.do_throw(processor, e)
+            else:
+                self.do_leave(processor)
+        elif state[0] == RETURN:
+            self.resolve_return(processor, state)
+        elif state[0] == BREAK:
+            self.resolve_break(processor, state)
+        elif state[0] == CONTINUE:
+            self.resolve_continue(processor, state)
+        elif state[0] == CLEANUP:
+            self.resolve_cleanup(processor, state)
+        else:
+            self.do_leave(processor)
+    #-def
+
     def resolve_exception(self, processor, state):
         """
         """
@@ -277,7 +578,8 @@ class Finalizer(object):
         """
         """
 
-        self.__on_throw(self, processor, e)
+        if self.__on_throw is not None:
+            self.__on_throw(self, processor, e)
         self.do_leave(processor)
         processor.insertcode(e)
     #-def
@@ -319,6 +621,15 @@ class Command(Evaluable):
         return False
     #-def
 
+    def isguard(self):
+        """
+        """
+
+        # A command that can catch exceptions is a guard:
+        return self.__class__.find_exception_handler \
+            is not Command.find_exception_handler
+    #-def
+
     def __eq__(self, other):
         """
         """
@@ -366,6 +677,13 @@ class Command(Evaluable):
         pass
     #-def
 
+    def compile(self, compiler):
+        """
+        """
+
+        compiler.fallback(self)
+    #-def
+
     def leave(self, processor, fnlz):
         """
         """
@@ -430,6 +748,13 @@ class Const(Command):
 
         processor.setacc(self.constval)
     #-def
+
+    def compile(self, compiler):
+        """
+        """
+
+        compiler.const(self, self.constval)
+    #-def
 #-class
 
 class Version(Command):
@@ -497,10 +822,20 @@ class Trackable(Command):
     #-def
 #-class
 
-class MacroNode(object):
+def make_list(*args):
+    """
+    """
+
+    return list(args)
+#-def
+
+class MacroNode(Structural):
     """
     """
-    __slots__ = [ 'ctor', 'nodes', 'deferred' ]
+    __slots__ = [
+        'ctor', 'nodes', 'deferred', 'hash_', '__const', '__value'
+    ]
+    NONSTRUCTURAL = [ '__const', '__value' ]
 
     def __init__(self, ctor, *nodes):
         """
@@ -509,6 +844,9 @@ class MacroNode(object):
         self.ctor = ctor
         self.nodes = nodes
         self.deferred = []
+        self.hash_ = None
+        self.__const = None
+        self.__value = NOVALUE
     #-def
 
     def __eq__(self, other):
@@ -543,13 +881,26 @@ class MacroNode(object):
         return not self.__eq__(other)
     #-def
 
+    def isconst(self):
+        """
+        """
+
+        if self.__const is None:
+            self.__const = all(x.isconst() for x in self.nodes)
+        return self.__const
+    #-def
+
     def substitute(self, p2v):
         """
         """
 
+        if self.__value is not NOVALUE:
+            return self.__value
         node = self.ctor(*[x.substitute(p2v) for x in self.nodes])
         for d in self.deferred:
             d(node)
+        if self.isconst():
+            self.__value = node
         return node
     #-def
 #-class
@@ -558,12 +909,13 @@ class MacroNodeSequence(MacroNode):
     """
     """
     __slots__ = []
+    NONSTRUCTURAL = [ 'ctor' ]
 
     def __init__(self, *nodes):
         """
         """
 
-        MacroNode.__init__(self, (lambda *args: list(args)), *nodes)
+        MacroNode.__init__(self, make_list, *nodes)
     #-def
 
     def __eq__(self, other):
@@ -601,6 +953,7 @@ class MacroNodeAtom(MacroNode):
     """
     """
     __slots__ = []
+    NONSTRUCTURAL = [ 'ctor', 'deferred' ]
 
     def __init__(self, atom):
         """
@@ -627,6 +980,13 @@ class MacroNodeAtom(MacroNode):
         return not self.__eq__(other)
     #-def
 
+    def isconst(self):
+        """
+        """
+
+        return True
+    #-def
+
     def substitute(self, p2v):
         """
         """
@@ -639,6 +999,7 @@ class MacroNodeParam(MacroNode):
     """
     """
     __slots__ = []
+    NONSTRUCTURAL = [ 'ctor', 'deferred' ]
 
     def __init__(self, param):
         """
@@ -662,6 +1023,13 @@ class MacroNodeParam(MacroNode):
         return not self.__eq__(other)
     #-def
 
+    def isconst(self):
+        """
+        """
+
+        return False
+    #-def
+
     def substitute(self, p2v):
         """
         """
@@ -673,7 +1041,8 @@ class MacroNodeParam(MacroNode):
 class Macro(object):
     """
     """
-    __slots__ = [ 'name', 'qname', 'params', 'body' ]
+    __slots__ = [ 'name', 'qname', 'params', 'body', 'cache', 'lock' ]
+    CACHE_SIZE = 64
 
     def __init__(self, name, qname, params, body):
         """
@@ -683,15 +1052,36 @@ class Macro(object):
         self.qname = qname
         self.params = params
         self.body = body
+        self.cache = collections.OrderedDict()
+        self.lock = threading.Lock()
+    #-def
+
+    def __reduce__(self):
+        """
+        """
+
+        return (
+            self.__class__, (self.name, self.qname, self.params, self.body)
+        )
     #-def
 
     def substitute(self, args):
         """
         """
 
-        return [node.substitute(dict(zip(self.params, args)))
-            for node in self.body
-        ]
+        cache = self.cache
+        with self.lock:
+            entry = cache.get(id(args))
+            if entry is not None and entry[0] is args:
+                cache.move_to_end(id(args))
+                return list(entry[1])
+        p2v = dict(zip(self.params, args))
+        body = [node.substitute(p2v) for node in self.body]
+        with self.lock:
+            cache[id(args)] = (args, body)
+            if len(cache) > self.CACHE_SIZE:
+                cache.popitem(last = False)
+        return list(body)
     #-def
 #-class
 
@@ -802,17 +1192,31 @@ class SetLocal(Trackable):
         )
     #-def
 
+    def compile(self, compiler):
+        """
+        """
+
+        compiler.compile_setlocal(self)
+    #-def
+
     def do_setlocal(self, processor):
         """
         """
 
-        ctx = processor.cmdctx(self)
-        env, d = ctx.env, self.depth
+        self.setlocal(processor, processor.cmdctx(self).env)
+    #-def
+
+    def setlocal(self, processor, env):
+        """
+        """
+
+        d = self.depth
         while d > 0:
             env = env.outer()
             d -= 1
-        env.setvar(self.varname, processor.acc())
-        env.meta[self.varname].qname = processor.mkqname(self.varname)
+        env.setvar(
+            self.varname, processor.acc(), processor.qpath(self.varname)
+        )
     #-def
 #-class
 
@@ -855,6 +1259,13 @@ class GetLocal(Trackable):
         )
     #-def
 
+    def compile(self, compiler):
+        """
+        """
+
+        compiler.compile_getlocal(self)
+    #-def
+
     def do_getlocal(self, processor):
         """
         """
@@ -915,8 +1326,7 @@ class DefMacro(Trackable):
         qname = processor.mkqname(self.mname)
         ctx.env.setvar(self.mname, Macro(
             self.mname, qname, self.params, self.body
-        ))
-        ctx.env.meta[self.mname].qname = qname
+        ), qname)
     #-def
 #-class
 
@@ -974,8 +1384,9 @@ class DefError(Trackable):
                 processor.traceback()
             )
         qname = processor.mkqname(self.ename)
-        ctx.env.setvar(self.ename, ExceptionClass(self.ename, qname, ebase))
-        ctx.env.meta[self.ename].qname = qname
+        ctx.env.setvar(
+            self.ename, ExceptionClass(self.ename, qname, ebase), qname
+        )
     #-def
 #-class
 
@@ -1026,6 +1437,13 @@ class Define(Trackable):
         )
     #-def
 
+    def compile(self, compiler):
+        """
+        """
+
+        compiler.compile_define(self)
+    #-def
+
     def do_define(self, processor):
         """
         """
@@ -1036,9 +1454,9 @@ class Define(Trackable):
             self.pname,
             Procedure(self.pname, qname,
                 self.bvars, self.params, self.vararg, self.body, ctx.env
-            )
+            ),
+            qname
         )
-        ctx.env.meta[self.pname].qname = qname
     #-def
 #-class
 
@@ -1103,8 +1521,7 @@ class DefModule(Trackable):
 
         ctx = processor.cmdctx(self)
         m = processor.acc()
-        ctx.env.setvar(self.mname, m)
-        ctx.env.meta[self.mname].qname = m.qname
+        ctx.env.setvar(self.mname, m, m.qname)
         processor.setacc(processor.popval())
     #-def
 #-class
@@ -1239,16 +1656,35 @@ class Operation(Trackable):
             operation = (lambda a, b, c: a.__class__(a[b:c]))
         ),
         'concat': dict(
-            types = [(str, str)],
-            operation = (lambda a, b: "%s%s" % (a, b))
+            types = [(TextTypes, TextTypes)],
+            operation = (lambda a, b: \
+                a.concat(b) if isinstance(a, Rope) else \
+                Rope(a, b) if isinstance(b, Rope) else "%s%s" % (a, b)
+            )
         ),
         'join': dict(
-            types = [(list, list)],
-            operation = (lambda a, b: List(a + b))
+            # The last signature is used to report type errors:
+            types = [(Rope, TextTypes), (ListTypes, ListTypes)],
+            operation = (lambda a, b: \
+                a.concat(b) if isinstance(a, Rope) else \
+                a + b if isinstance(a, PersistentList) else List(a + list(b))
+            )
         ),
         'merge': dict(
-            types = [(dict, dict)],
-            operation = (lambda a, b: HashMap.merge(a, b))
+            types = [(HashTypes, HashTypes)],
+            operation = (lambda a, b: a.__class__.merge(a, b))
+        ),
+        'union': dict(
+            types = [(Set, Set)],
+            operation = (lambda a, b: Set(a | b))
+        ),
+        'intersection': dict(
+            types = [(Set, Set)],
+            operation = (lambda a, b: Set(a & b))
+        ),
+        'difference': dict(
+            types = [(Set, Set)],
+            operation = (lambda a, b: Set(a - b))
         ),
         # - informative:
         # 'type' is defined separately
@@ -1257,7 +1693,7 @@ class Operation(Trackable):
             operation = (lambda a, b: isinstance(a, b))
         ),
         'strlen': dict(
-            types = [(str,)],
+            types = [(TextTypes,)],
             operation = (lambda a: len(a))
         ),
         'size': dict(
@@ -1325,11 +1761,11 @@ class Operation(Trackable):
             )
         ),
         'keys': dict(
-            types = [(dict,)],
+            types = [(HashTypes,)],
             operation = (lambda a: List(a.keys()))
         ),
         'values': dict(
-            types = [(dict,)],
+            types = [(HashTypes,)],
             operation = (lambda a: List(a.values()))
         ),
         # - elementwise:
@@ -1342,15 +1778,16 @@ class Operation(Trackable):
             operation = (lambda a: a[1])
         ),
         'getitem': dict(
-            types = [(CollectionTypes, object)],
+            types = [(SequenceTypes + HashTypes, object)],
             constraints = (lambda p, a, b: \
-                (True, None, "") if isinstance(a, dict) and b in a else \
+                (True, None, "") if isinstance(a, HashTypes) and b in a else \
                 (True, None, "") if isinstance(a, SequenceTypes) \
                                  and isinstance(b, int) \
                                  and 0 <= b and b < len(a) else \
-                (False, p.KeyError if isinstance(a, dict) else p.IndexError, \
+                (False, p.KeyError if isinstance(a, HashTypes) \
+                    else p.IndexError, \
                     "%r is not a valid key into the hashmap" % b \
-                        if isinstance(a, dict) else \
+                        if isinstance(a, HashTypes) else \
                     "%r is not a valid index into the sequence" % b
                 )
             ),
@@ -1417,22 +1854,27 @@ class Operation(Trackable):
             )
         ),
         'sort': dict(
-            types = [(list,)],
-            operation = (lambda a: (lambda l: l.sort() or l)(List(a)))
+            types = [(ListTypes,)],
+            operation = (lambda a: \
+                (lambda l: l.sort() or l)(a.__class__(a))
+            )
         ),
         'reverse': dict(
-            types = [(list,)],
-            operation = (lambda a: (lambda l: l.reverse() or l)(List(a)))
+            types = [(ListTypes,)],
+            operation = (lambda a: \
+                (lambda l: l.reverse() or l)(a.__class__(a))
+            )
         ),
         'unique': dict(
-            types = [(list,)],
-            operation = (lambda a: List.unique(a))
+            types = [(ListTypes,)],
+            operation = (lambda a: a.__class__(List.unique(a)))
         ),
         'split': dict(
             types = [(str, str)],
             operation = (lambda a, b: List(a.split(b)))
         )
     }
+    FAST_OPS = {}
     __slots__ = [ 'operands' ]
 
     def __init__(self, *operands):
@@ -1441,6 +1883,20 @@ class Operation(Trackable):
 
         Trackable.__init__(self)
         self.operands = operands
+        self.specialize(self.name)
+    #-def
+
+    @classmethod
+    def specialize(cls, name):
+        """
+        """
+
+        fast_ops = cls.FAST_OPS
+        key = (cls, name)
+        if key not in fast_ops:
+            op_spec = cls.OP_TAB.get(name)
+            fast_ops[key] = make_fast_op(op_spec) if op_spec else None
+        return fast_ops[key]
     #-def
 
     def __eq__(self, other):
@@ -1471,13 +1927,30 @@ class Operation(Trackable):
         processor.insertcode(*code)
     #-def
 
+    def compile(self, compiler):
+        """
+        """
+
+        compiler.compile_operation(self)
+    #-def
+
     def do_op(self, processor):
         """
         """
 
+        # 0) Try the specialized operation first:
+        fast_op = self.FAST_OPS.get((self.__class__, self.name))
+        if fast_op is not None:
+            args, nargs = self.load_operands(processor)
+            r = fast_op(processor, args)
+            if r is NOVALUE:
+                self.do_op_generic(processor, args, nargs)
+            else:
+                processor.setacc(r)
+            return
+
         # 1) Test whether the operation is defined:
-        op_tab = self.__class__.OP_TAB
-        if self.name not in op_tab:
+        if self.name not in self.__class__.OP_TAB:
             raise CommandError(processor.NameError,
                 "Undefined operation '%s'" % self.name,
                 processor.traceback()
@@ -1485,9 +1958,15 @@ class Operation(Trackable):
 
         # 2) Load operands:
         args, nargs = self.load_operands(processor)
+        self.do_op_generic(processor, args, nargs)
+    #-def
+
+    def do_op_generic(self, processor, args, nargs):
+        """
+        """
 
         # 3) Load operation specification:
-        op_spec = op_tab[self.name]
+        op_spec = self.__class__.OP_TAB[self.name]
 
         # 4) Check if the number of operands coincides with the arity of the
         #    operator:
@@ -1839,6 +2318,13 @@ class AndOr(Operation):
         )
     #-def
 
+    def compile(self, compiler):
+        """
+        """
+
+        compiler.compile_andor(self)
+    #-def
+
     def to_bool(self, processor):
         """
         """
@@ -2038,6 +2524,45 @@ class Merge(Operation):
     #-def
 #-class
 
+class Union(Operation):
+    """
+    """
+    __slots__ = []
+
+    def __init__(self, a, b):
+        """
+        """
+
+        Operation.__init__(self, a, b)
+    #-def
+#-class
+
+class Intersection(Operation):
+    """
+    """
+    __slots__ = []
+
+    def __init__(self, a, b):
+        """
+        """
+
+        Operation.__init__(self, a, b)
+    #-def
+#-class
+
+class Difference(Operation):
+    """
+    """
+    __slots__ = []
+
+    def __init__(self, a, b):
+        """
+        """
+
+        Operation.__init__(self, a, b)
+    #-def
+#-class
+
 class Type(Operation):
     """
     """
@@ -2670,6 +3195,8 @@ class ToStr(Operation):
             ) % arg)
         elif isinstance(arg, str):
             processor.setacc(arg)
+        elif isinstance(arg, Rope):
+            processor.setacc(str(arg))
         elif isinstance(arg, UserType):
             processor.setacc(arg.to_str(processor))
         elif isinstance(arg, Procedure):
@@ -2776,9 +3303,9 @@ class ToList(Operation):
         """
 
         arg = processor.popval()
-        if isinstance(arg, SequenceTypes):
+        if isinstance(arg, SequenceTypes + (Set,)):
             processor.setacc(List(arg))
-        elif isinstance(arg, dict):
+        elif isinstance(arg, HashTypes):
             l = List()
             for k in arg:
                 l.append(Pair(k, arg[k]))
@@ -2812,14 +3339,16 @@ class ToHash(Operation):
         arg = processor.popval()
         if isinstance(arg, Pair):
             arg = [arg]
-        if isinstance(arg, list):
+        if isinstance(arg, ListTypes):
             for x in arg:
                 if not isinstance(x, tuple) or len(x) != 2:
                     raise CommandError(processor.ValueError,
                         "%s: A pair was expected inside list" % self.name,
                         processor.traceback()
                     )
-        if isinstance(arg, (list, dict)):
+        if isinstance(arg, PersistentHashMap):
+            processor.setacc(HashMap(arg.items()))
+        elif isinstance(arg, ListTypes + HashTypes):
             processor.setacc(HashMap(arg))
         elif isinstance(arg, UserType):
             processor.setacc(arg.to_hash(processor))
@@ -2831,47 +3360,143 @@ class ToHash(Operation):
     #-def
 #-class
 
-class Quantifier(Operation):
+class ToSet(Operation):
     """
     """
-    __slots__ = [ 'iv', 'cf' ]
+    __slots__ = []
 
-    def __init__(self, a, b, iv, cf):
+    def __init__(self, a):
         """
         """
 
-        Operation.__init__(self, a, b)
-        self.iv = iv
-        self.cf = cf
+        Operation.__init__(self, a)
     #-def
 
     def do_op(self, processor):
         """
         """
 
-        state = {}
-        proc = processor.popval()
-        if not isinstance(proc, Procedure):
+        arg = processor.popval()
+        if not isinstance(arg, IterableTypes):
             raise CommandError(processor.TypeError,
-                "%s: Bad type of 2nd operand" % self.name,
+                "%s: Bad type of 1st operand" % self.name,
                 processor.traceback()
             )
-        state[0] = proc
-        it = processor.popval()
-        if isinstance(it, str):
-            it = List(it)
-        if not isinstance(it, CollectionTypes):
+        try:
+            processor.setacc(arg if isinstance(arg, Set) else Set(arg))
+        except TypeError:
             raise CommandError(processor.TypeError,
-                "%s: Bad type of 1st operand" % self.name,
+                "%s: Set items must be hashable" % self.name,
                 processor.traceback()
             )
-        state[1] = it.iterator()
-        state[1].reset()
-        state[2] = self.iv
-        processor.insertcode(state, self.pushacc, self.do_next)
     #-def
+#-class
 
-    def do_next(self, processor):
+class ToRope(Operation):
+    """
+    """
+    __slots__ = []
+
+    def __init__(self, a):
+        """
+        """
+
+        Operation.__init__(self, a)
+    #-def
+
+    def do_op(self, processor):
+        """
+        """
+
+        arg = processor.popval()
+        if isinstance(arg, Rope):
+            processor.setacc(arg)
+        elif isinstance(arg, str):
+            processor.setacc(Rope(arg))
+        else:
+            raise CommandError(processor.TypeError,
+                "%s: Bad type of 1st operand" % self.name,
+                processor.traceback()
+            )
+    #-def
+#-class
+
+class ToPersistent(Operation):
+    """
+    """
+    __slots__ = []
+
+    def __init__(self, a):
+        """
+        """
+
+        Operation.__init__(self, a)
+    #-def
+
+    def do_op(self, processor):
+        """
+        """
+
+        arg = processor.popval()
+        if isinstance(arg, (PersistentList, PersistentHashMap)):
+            processor.setacc(arg)
+        elif isinstance(arg, list):
+            processor.setacc(PersistentList(arg))
+        elif isinstance(arg, dict):
+            processor.setacc(PersistentHashMap(arg))
+        else:
+            raise CommandError(processor.TypeError,
+                "%s: Bad type of 1st operand" % self.name,
+                processor.traceback()
+            )
+    #-def
+#-class
+
+class Quantifier(Operation):
+    """
+    """
+    __slots__ = [ 'iv', 'cf' ]
+
+    def __init__(self, a, b, iv, cf):
+        """
+        """
+
+        Operation.__init__(self, a, b)
+        self.iv = iv
+        self.cf = cf
+    #-def
+
+    def compile(self, compiler):
+        """
+        """
+
+        compiler.compile_operation(self, True)
+    #-def
+
+    def do_op(self, processor):
+        """
+        """
+
+        state = {}
+        proc = processor.popval()
+        if not isinstance(proc, Procedure):
+            raise CommandError(processor.TypeError,
+                "%s: Bad type of 2nd operand" % self.name,
+                processor.traceback()
+            )
+        state[0] = proc
+        it = processor.popval()
+        if not isinstance(it, IterableTypes):
+            raise CommandError(processor.TypeError,
+                "%s: Bad type of 1st operand" % self.name,
+                processor.traceback()
+            )
+        state[1] = iterate(processor, self, it)
+        state[2] = self.iv
+        processor.insertcode(state, self.pushacc, self.do_next)
+    #-def
+
+    def do_next(self, processor):
         """
         """
 
@@ -2941,6 +3566,13 @@ class SeqOp(Operation):
         self.opf = opf
     #-def
 
+    def compile(self, compiler):
+        """
+        """
+
+        compiler.compile_operation(self, True)
+    #-def
+
     def do_op(self, processor):
         """
         """
@@ -2954,17 +3586,76 @@ class SeqOp(Operation):
             )
         state[0] = proc
         it = processor.popval()
-        if not isinstance(it, SequenceTypes):
+        if not isinstance(it, (SequenceTypes, LazyIterable)):
             raise CommandError(processor.TypeError,
                 "%s: Bad type of 1st operand" % self.name,
                 processor.traceback()
             )
-        if isinstance(it, str):
-            it = List(it)
-        state[1] = it.iterator()
-        state[1].reset()
+        state[1] = iterate(processor, self, it)
         state[2] = List()
-        processor.insertcode(state, self.pushacc, self.do_next)
+        if self.opf is not None:
+            processor.insertcode(state, self.pushacc, self.do_next)
+            return
+        name, qname, bvars, _, _, body, outer = proc
+        state[3] = Closure(name, qname, bvars, {}, body, outer)
+        state[4] = fast_proc(proc, 1)
+        # The procedure is called from an anonymous function, which is seen
+        # in the error traces:
+        state[6] = processor.mkqname("<lambda>")
+        state[7] = CallFrame("<lambda>", state[6], [self.do_call])
+        processor.insertcode(state, self.pushacc, self.do_apply)
+    #-def
+
+    def do_apply(self, processor):
+        """
+        """
+
+        state = processor.topval()
+        it, fast = state[1], state[4]
+        x = it.next()
+        while x is not it:
+            v = value_of(processor, x)
+            state[5] = x = x if v is NOVALUE else v
+            r = NOVALUE if fast is None else fast(processor, [x])
+            if r is NOVALUE:
+                break
+            v = value_of(processor, r)
+            if v is NOVALUE:
+                processor.insertcode(
+                    CallFrame("<lambda>", state[6], [r]),
+                    self.do_collect, self.do_apply
+                )
+                return
+            self.collect(processor, state, v)
+            x = it.next()
+        if x is it:
+            processor.setacc(state[2])
+            processor.popval()
+            return
+        processor.insertcode(state[7], self.do_collect, self.do_apply)
+    #-def
+
+    def do_call(self, processor):
+        """
+        """
+
+        state = processor.topval()
+        state[3].args = bind_args(processor, state[0], [state[5]])
+        processor.insertcode(state[3])
+    #-def
+
+    def do_collect(self, processor):
+        """
+        """
+
+        self.collect(processor, processor.topval(), processor.acc())
+    #-def
+
+    def collect(self, processor, state, r):
+        """
+        """
+
+        pass
     #-def
 
     def do_next(self, processor):
@@ -3015,9 +3706,14 @@ class Map(SeqOp):
         """
         """
 
-        SeqOp.__init__(self, a, b, Lambda(["f", "x"], False, [
-            Return(NewPair(Call(GetLocal("f"), GetLocal("x")), True))
-        ], []))
+        SeqOp.__init__(self, a, b, None)
+    #-def
+
+    def collect(self, processor, state, r):
+        """
+        """
+
+        state[2].append(r)
     #-def
 #-class
 
@@ -3030,9 +3726,21 @@ class Filter(SeqOp):
         """
         """
 
-        SeqOp.__init__(self, a, b, Lambda(["p", "x"], False, [
-            Return(NewPair(GetLocal("x"), Call(GetLocal("p"), GetLocal("x"))))
-        ], []))
+        SeqOp.__init__(self, a, b, None)
+    #-def
+
+    def collect(self, processor, state, r):
+        """
+        """
+
+        if not isinstance(r, bool):
+            raise CommandError(processor.TypeError,
+                "%s: Function %s should return a pair (any, boolean)" \
+                % (self.name, state[0][0]),
+                processor.traceback()
+            )
+        if r:
+            state[2].append(state[5])
     #-def
 #-class
 
@@ -3056,6 +3764,13 @@ class Lambda(Operation):
         processor.insertcode(Initializer(ctx), self.do_op, Finalizer(ctx))
     #-def
 
+    def compile(self, compiler):
+        """
+        """
+
+        compiler.compile_lambda(self)
+    #-def
+
     def do_op(self, processor):
         """
         """
@@ -3115,6 +3830,13 @@ class Block(Trackable):
             *((Initializer(ctx),) + self.commands + (Finalizer(ctx),))
         )
     #-def
+
+    def compile(self, compiler):
+        """
+        """
+
+        compiler.compile_block(self)
+    #-def
 #-class
 
 class If(Trackable):
@@ -3160,6 +3882,13 @@ class If(Trackable):
         )
     #-def
 
+    def compile(self, compiler):
+        """
+        """
+
+        compiler.compile_if(self)
+    #-def
+
     def do_if(self, processor):
         """
         """
@@ -3208,7 +3937,7 @@ class Loop(Trackable):
 class Foreach(Loop):
     """
     """
-    __slots__ = [ 'var', 'qvar', 'itexp', 'body' ]
+    __slots__ = [ 'var', 'itexp', 'body' ]
 
     def __init__(self, var, itexp, body):
         """
@@ -3216,7 +3945,6 @@ class Foreach(Loop):
 
         Loop.__init__(self)
         self.var = var
-        self.qvar = var
         self.itexp = itexp
         self.body = tuple(body)
     #-def
@@ -3228,7 +3956,6 @@ class Foreach(Loop):
         return isinstance(other, self.__class__) \
         and Loop.__eq__(self, other) \
         and self.var == other.var \
-        and self.qvar == other.qvar \
         and deep_eq(self.itexp, other.itexp) \
         and deep_eq(self.body, other.body)
     #-def
@@ -3245,28 +3972,38 @@ class Foreach(Loop):
         """
 
         ctx = CommandContext(self)
-        self.qvar = processor.mkqname(self.var)
         processor.insertcode(
             Initializer(ctx), self.itexp, self.do_foreach, Finalizer(ctx)
         )
     #-def
 
+    def compile(self, compiler):
+        """
+        """
+
+        compiler.compile_foreach(self)
+    #-def
+
     def do_foreach(self, processor):
         """
         """
 
         state = {}
-        it = processor.acc()
-        if not isinstance(it, CollectionTypes):
+        state[0] = self.iterator(processor, processor.acc())
+        state[1] = processor.qpath(self.var)
+        processor.insertcode(state, self.pushacc, self.do_loop)
+    #-def
+
+    def iterator(self, processor, it):
+        """
+        """
+
+        if not isinstance(it, IterableTypes):
             raise CommandError(processor.TypeError,
                 "%s: Object must be iterable" % self.name,
                 processor.traceback()
             )
-        if isinstance(it, str):
-            it = List(it)
-        state[0] = it.iterator()
-        state[0].reset()
-        processor.insertcode(state, self.pushacc, self.do_loop)
+        return iterate(processor, self, it)
     #-def
 
     def do_loop(self, processor):
@@ -3287,9 +4024,16 @@ class Foreach(Loop):
         """
         """
 
-        ctx = processor.cmdctx(self)
-        ctx.env.setvar(self.var, processor.acc())
-        ctx.env.meta[self.var].qname = self.qvar
+        self.setvar(
+            processor.cmdctx(self).env, processor.acc(), processor.topval()[1]
+        )
+    #-def
+
+    def setvar(self, env, value, qvar):
+        """
+        """
+
+        env.setvar(self.var, value, qvar)
     #-def
 
     def do_continue(self, processor):
@@ -3339,6 +4083,13 @@ class While(Loop):
         processor.insertcode(Initializer(ctx), self.do_while, Finalizer(ctx))
     #-def
 
+    def compile(self, compiler):
+        """
+        """
+
+        compiler.compile_while(self)
+    #-def
+
     def do_while(self, processor):
         """
         """
@@ -3401,6 +4152,13 @@ class DoWhile(Loop):
         processor.insertcode(Initializer(ctx), self.do_dowhile, Finalizer(ctx))
     #-def
 
+    def compile(self, compiler):
+        """
+        """
+
+        compiler.compile_dowhile(self)
+    #-def
+
     def do_dowhile(self, processor):
         """
         """
@@ -3442,6 +4200,13 @@ class Break(Command):
 
         processor.handle_event(BREAK, None)
     #-def
+
+    def compile(self, compiler):
+        """
+        """
+
+        compiler.compile_break(self)
+    #-def
 #-class
 
 class Continue(Command):
@@ -3462,6 +4227,13 @@ class Continue(Command):
 
         processor.handle_event(CONTINUE, None)
     #-def
+
+    def compile(self, compiler):
+        """
+        """
+
+        compiler.compile_continue(self)
+    #-def
 #-class
 
 class Closure(Trackable):
@@ -3493,13 +4265,10 @@ class Closure(Trackable):
         """
         """
 
-        inlz.ctx.env = processor.newenv(self.outer)
-        for bvar in self.bvars:
-            inlz.ctx.env.setvar(bvar, processor.Null)
-            inlz.ctx.env.meta[bvar].qname = "%s::%s" % (self.qname, bvar)
-        for argname in self.args:
-            inlz.ctx.env.setvar(argname, self.args[argname])
-            inlz.ctx.env.meta[argname].qname = "%s::%s" % (self.qname, argname)
+        env = inlz.ctx.env = processor.newenv(self.outer)
+        if self.bvars:
+            env.update(dict.fromkeys(self.bvars, processor.Null))
+        env.bind(self.args, processor.qroot(self.qname))
         inlz.ctx.nvals = processor.nvals()
         processor.pushctx(inlz.ctx)
     #-def
@@ -3515,17 +4284,51 @@ class Closure(Trackable):
     #-def
 #-class
 
+class CallFrame(Trackable):
+    """
+    """
+    __slots__ = [ 'body' ]
+
+    def __init__(self, name, qname, body):
+        """
+        """
+
+        Trackable.__init__(self)
+        self.name = name
+        self.qname = qname
+        self.body = tuple(body)
+    #-def
+
+    def isfunc(self):
+        """
+        """
+
+        return True
+    #-def
+
+    def expand(self, processor):
+        """
+        """
+
+        ctx = CommandContext(self)
+        processor.insertcode(
+            *((Initializer(ctx),) + self.body + (Finalizer(ctx),))
+        )
+    #-def
+#-class
+
 class ICall(Command):
     """
     """
-    __slots__ = [ 'proc' ]
+    __slots__ = [ 'proc', 'tail' ]
 
-    def __init__(self, proc):
+    def __init__(self, proc, tail = False):
         """
         """
 
         Command.__init__(self)
         self.proc = proc
+        self.tail = tail
     #-def
 
     def expand(self, processor):
@@ -3534,7 +4337,10 @@ class ICall(Command):
 
         args = processor.popval()
         name, qname, bvars, _, _, body, outer = self.proc
-        processor.insertcode(Closure(name, qname, bvars, args, body, outer))
+        closure = Closure(name, qname, bvars, args, body, outer)
+        if self.tail and processor.tailcall(closure):
+            return
+        processor.insertcode(closure)
     #-def
 #-class
 
@@ -3579,27 +4385,31 @@ class Call(Trackable):
         )
     #-def
 
-    def do_call(self, processor):
+    def tailcall(self, processor):
+        """
+        """
+
+        ctx = CommandContext(self)
+        processor.insertcode(
+            Initializer(ctx), self.proc, self.do_tailcall, Finalizer(ctx)
+        )
+    #-def
+
+    def compile(self, compiler):
+        """
+        """
+
+        compiler.compile_call(self)
+    #-def
+
+    def do_call(self, processor, tail = False):
         """
         """
 
         proc = processor.acc()
-        if not isinstance(proc, Procedure):
-            raise CommandError(processor.TypeError,
-                "%s: Procedure expected" % self.name,
-                processor.traceback()
-            )
+        self.check_proc(processor, proc)
         _, _, _, params, vararg, _, _ = proc
         nargs, nparams = len(self.args), len(params)
-        argsokf = (lambda na, np: np > 0 and na >= np - 1) if vararg \
-            else (lambda na, np: na == np)
-        if not argsokf(nargs, nparams):
-            raise CommandError(processor.TypeError,
-                "%s %s (%s): Bad count of arguments" % (
-                    self.name, proc[0], proc[1]
-                ),
-                processor.traceback()
-            )
         code = [{}, self.pushacc]
         nreqargs = nparams - 1 if vararg else nparams
         i = 0
@@ -3613,10 +4423,39 @@ class Call(Trackable):
             i += 1
         if vararg:
             code.extend([params[-1], self.finish_varargs])
-        code.append(ICall(proc))
+        code.append(ICall(proc, tail))
         processor.insertcode(*code)
     #-def
 
+    def do_tailcall(self, processor):
+        """
+        """
+
+        self.do_call(processor, True)
+    #-def
+
+    def check_proc(self, processor, proc):
+        """
+        """
+
+        if not isinstance(proc, Procedure):
+            raise CommandError(processor.TypeError,
+                "%s: Procedure expected" % self.name,
+                processor.traceback()
+            )
+        _, _, _, params, vararg, _, _ = proc
+        nargs, nparams = len(self.args), len(params)
+        argsokf = (lambda na, np: np > 0 and na >= np - 1) if vararg \
+            else (lambda na, np: na == np)
+        if not argsokf(nargs, nparams):
+            raise CommandError(processor.TypeError,
+                "%s %s (%s): Bad count of arguments" % (
+                    self.name, proc[0], proc[1]
+                ),
+                processor.traceback()
+            )
+    #-def
+
     def do_arg(self, processor):
         """
         """
@@ -3687,15 +4526,18 @@ class ECall(Trackable):
         )
     #-def
 
+    def compile(self, compiler):
+        """
+        """
+
+        compiler.compile_ecall(self)
+    #-def
+
     def do_args(self, processor):
         """
         """
 
-        if not hasattr(self.proc, '__call__'):
-            raise CommandError(processor.TypeError,
-                "%s: External procedure must be callable" % self.name,
-                processor.traceback()
-            )
+        self.check_proc(processor)
         code = [[], self.pushacc]
         for x in self.args:
             code.extend([x, self.do_arg])
@@ -3709,21 +4551,62 @@ class ECall(Trackable):
         processor.topval().append(processor.acc())
     #-def
 
+    def check_proc(self, processor):
+        """
+        """
+
+        if not hasattr(self.proc, '__call__'):
+            raise CommandError(processor.TypeError,
+                "%s: External procedure must be callable" % self.name,
+                processor.traceback()
+            )
+    #-def
+
     def do_ecall(self, processor):
         """
         """
 
+        r = self.call(processor, processor.popval())
+        if inspect.isawaitable(r):
+            processor.suspend(r, self)
+        processor.insertcode(r)
+    #-def
+
+    def call(self, processor, args):
+        """
+        """
+
         try:
-            args = processor.popval()
-            r = self.proc(*args)
-            processor.insertcode(r)
+            return self.proc(*args)
         except CommandError as e:
-            processor.insertcode(e)
+            return e
         except:
-            raise CommandError(processor.TypeError,
-                "%s: Calling the external procedure has failed" % self.name,
-                processor.traceback()
-            )
+            raise self.failure(processor)
+    #-def
+
+    def failure(self, processor):
+        """
+        """
+
+        return CommandError(processor.TypeError,
+            "%s: Calling the external procedure has failed" % self.name,
+            processor.traceback()
+        )
+    #-def
+
+    def do_fail(self, processor):
+        """
+        """
+
+        raise self.failure(processor)
+    #-def
+
+    def resume(self, *code):
+        """
+        """
+
+        ctx = CommandContext(self)
+        return (Initializer(ctx),) + code + (Finalizer(ctx),)
     #-def
 #-class
 
@@ -3760,7 +4643,17 @@ class Return(Command):
         """
         """
 
-        processor.insertcode(self.expr, self.do_return)
+        x = self.expr
+        processor.insertcode(
+            x.tailcall if isinstance(x, Call) else x, self.do_return
+        )
+    #-def
+
+    def compile(self, compiler):
+        """
+        """
+
+        compiler.compile_return(self)
     #-def
 
     def do_return(self, processor):
@@ -3786,6 +4679,13 @@ class TryCatchFinally(Trackable):
         self.f = f
     #-def
 
+    def isguard(self):
+        """
+        """
+
+        return True
+    #-def
+
     def __eq__(self, other):
         """
         """
@@ -3828,9 +4728,9 @@ class TryCatchFinally(Trackable):
                 ec = ctx.env.getvar(name)
                 if isderived(e.ecls, ec):
                     if vname:
-                        ctx.env.setvar(vname, e)
-                        p = ctx.env.processor
-                        ctx.env.meta[vname].qname = p.mkqname(vname)
+                        ctx.env.setvar(
+                            vname, e, ctx.env.processor.qpath(vname)
+                        )
                     return handler
             return None
         except CommandError as ce:
@@ -3970,6 +4870,13 @@ class SandBox(Trackable):
         self.cmds = tuple(cmds)
     #-def
 
+    def isguard(self):
+        """
+        """
+
+        return True
+    #-def
+
     def expand(self, processor):
         """
         """
@@ -4037,12 +4944,12 @@ class SetItem(Trackable):
         index = processor.popval()
         container = processor.popval()
 
-        if not isinstance(container, (list, dict)):
+        if not isinstance(container, ListTypes + HashTypes):
             raise CommandError(processor.TypeError,
                 "%s: Container must be list or hashmap" % self.name,
                 processor.traceback()
             )
-        if isinstance(container, list) and not (
+        if isinstance(container, ListTypes) and not (
             isinstance(index, int) and 0 <= index and index < len(container)
         ):
             raise CommandError(processor.IndexError,
@@ -4105,19 +5012,19 @@ class DelItem(Trackable):
         index = processor.acc()
         container = processor.popval()
 
-        if not isinstance(container, (list, dict)):
+        if not isinstance(container, ListTypes + HashTypes):
             raise CommandError(processor.TypeError,
                 "%s: Container must be list or hashmap" % self.name,
                 processor.traceback()
             )
-        if isinstance(container, list) and not (
+        if isinstance(container, ListTypes) and not (
             isinstance(index, int) and 0 <= index and index < len(container)
         ):
             raise CommandError(processor.IndexError,
                 "%s: Invalid index" % self.name,
                 processor.traceback()
             )
-        if isinstance(container, dict) and index not in container:
+        if isinstance(container, HashTypes) and index not in container:
             return
         del container[index]
     #-def
@@ -4175,7 +5082,7 @@ class Append(Trackable):
         v = processor.acc()
         l = processor.popval()
 
-        if not isinstance(l, list):
+        if not isinstance(l, ListTypes):
             raise CommandError(processor.TypeError,
                 "%s: A list was expected" % self.name,
                 processor.traceback()
@@ -4240,7 +5147,7 @@ class Insert(Trackable):
         i = processor.popval()
         l = processor.popval()
 
-        if not isinstance(l, list):
+        if not isinstance(l, ListTypes):
             raise CommandError(processor.TypeError,
                 "%s: A list was expected" % self.name,
                 processor.traceback()
@@ -4306,7 +5213,7 @@ class Remove(Trackable):
         x = processor.acc()
         l = processor.popval()
 
-        if not isinstance(l, list):
+        if not isinstance(l, ListTypes):
             raise CommandError(processor.TypeError,
                 "%s: A list was expected" % self.name,
                 processor.traceback()
@@ -4368,7 +5275,7 @@ class RemoveAll(Trackable):
         x = processor.acc()
         l = processor.popval()
 
-        if not isinstance(l, list):
+        if not isinstance(l, ListTypes):
             raise CommandError(processor.TypeError,
                 "%s: A list was expected" % self.name,
                 processor.traceback()
@@ -4432,7 +5339,7 @@ class Each(Trackable):
         f = processor.acc()
         l = processor.popval()
 
-        if not isinstance(l, list):
+        if not isinstance(l, ListTypes + (LazyIterable,)):
             raise CommandError(processor.TypeError,
                 "%s: A list was expected" % self.name,
                 processor.traceback()
@@ -4442,9 +5349,20 @@ class Each(Trackable):
                 "%s: A function was expected" % self.name,
                 processor.traceback()
             )
-        state = {0: l.iterator(), 1: f, 2: List()}
-        state[0].reset()
-        processor.insertcode(state, self.pushacc, self.do_args, self.do_next)
+        state = {0: iterate(processor, self, l), 1: f, 2: List()}
+        processor.insertcode(
+            state, self.pushacc, self.do_args, self.do_prepare, self.do_next
+        )
+    #-def
+
+    def do_prepare(self, processor):
+        """
+        """
+
+        state = processor.topval()
+        name, qname, bvars, _, _, body, outer = state[1]
+        state[3] = Closure(name, qname, bvars, {}, body, outer)
+        state[4] = fast_proc(state[1], len(state[2]) + 1)
     #-def
 
     def do_args(self, processor):
@@ -4470,13 +5388,23 @@ class Each(Trackable):
         """
 
         state = processor.topval()
-        x = state[0].next()
-        if x is state[0]:
+        it, fast = state[0], state[4]
+        x = it.next()
+        while x is not it:
+            v = value_of(processor, x)
+            x = x if v is NOVALUE else v
+            r = NOVALUE if fast is None else fast(processor, [x] + state[2])
+            if r is NOVALUE:
+                break
+            if value_of(processor, r) is NOVALUE:
+                processor.insertcode(r, self.do_next)
+                return
+            x = it.next()
+        if x is it:
             processor.popval()
             return
-        processor.insertcode(
-            Call(state[1], x, *(state[2])), self.do_next
-        )
+        state[3].args = bind_args(processor, state[1], [x] + state[2])
+        processor.insertcode(state[3], self.do_next)
     #-def
 #-class
 
@@ -4611,7 +5539,7 @@ class Print(Trackable):
         ctx = CommandContext(self)
         code = [Initializer(ctx)]
         for arg in self.args:
-            code.extend([ToStr(arg), self.do_print_arg])
+            code.extend([arg, self.do_print_arg])
         code.append(Finalizer(ctx))
         processor.insertcode(*code)
     #-def
@@ -4620,6 +5548,20 @@ class Print(Trackable):
         """
         """
 
+        x = processor.acc()
+        if isinstance(x, str):
+            processor.print_impl(x)
+        elif isinstance(x, Rope):
+            for chunk in x.chunks():
+                processor.print_impl(chunk)
+        else:
+            processor.insertcode(ToStr(Const(x)), self.do_print_str)
+    #-def
+
+    def do_print_str(self, processor):
+        """
+        """
+
         processor.print_impl(processor.acc())
     #-def
 #-class
@@ -4653,6 +5595,13 @@ class Module(Trackable):
         return True
     #-def
 
+    def isguard(self):
+        """
+        """
+
+        return True
+    #-def
+
     def enter(self, processor, inlz):
         """
         """
@@ -4660,8 +5609,9 @@ class Module(Trackable):
         if inlz.ctx.env is None:
             inlz.ctx.env = processor.newenv(self.outer)
         sthis = self.__class__.THISVARNAME
-        inlz.ctx.env.setvar(sthis, self)
-        inlz.ctx.env.meta[sthis].qname = "%s::%s" % (self.qname, sthis)
+        inlz.ctx.env.setvar(
+            sthis, self, processor.qroot(self.qname).child(sthis)
+        )
         inlz.ctx.nvals = processor.nvals()
         processor.pushctx(inlz.ctx)
     #-def
@@ -4726,7 +5676,8 @@ class MainModule(Module):
 class SetMember(Trackable):
     """
     """
-    __slots__ = [ 'module', 'member', 'value' ]
+    __slots__ = [ 'module', 'member', 'value', '__cache' ]
+    NONSTRUCTURAL = [ '__cache' ]
 
     def __init__(self, module, member, value):
         """
@@ -4736,6 +5687,7 @@ class SetMember(Trackable):
         self.module = module
         self.member = member
         self.value = value
+        self.__cache = InlineCache()
     #-def
 
     def __eq__(self, other):
@@ -4782,17 +5734,19 @@ class SetMember(Trackable):
                 "%s: Module expected" % self.name,
                 processor.traceback()
             )
-        module.ctx.env.setvar(self.member, value)
-        module.ctx.env.meta[self.member].qname = "%s::%s" % (
-            module.qname, self.member
-        )
+        key, _, qname = self.__cache.entry
+        if module is not key:
+            qname = processor.qroot(module.qname).child(self.member)
+            self.__cache.entry = (module, None, qname)
+        module.ctx.env.setvar(self.member, value, qname)
     #-def
 #-class
 
 class GetMember(Trackable):
     """
     """
-    __slots__ = [ 'module', 'member' ]
+    __slots__ = [ 'module', 'member', '__cache' ]
+    NONSTRUCTURAL = [ '__cache' ]
 
     def __init__(self, module, member):
         """
@@ -4801,6 +5755,7 @@ class GetMember(Trackable):
         Trackable.__init__(self)
         self.module = module
         self.member = member
+        self.__cache = InlineCache()
     #-def
 
     def __eq__(self, other):
@@ -4824,12 +5779,25 @@ class GetMember(Trackable):
         """
         """
 
+        processor.insertcode(self.module, self.do_lookup)
+    #-def
+
+    def do_lookup(self, processor):
+        """
+        """
+
+        module = processor.acc()
+        key, version, value = self.__cache.entry
+
+        # The module environment gets a new version on every change, so a
+        # hit is valid as long as both the module and its version match.
+        # Only a miss needs the context, which is there for error reports:
+        if module is key and module.ctx.env.version == version:
+            processor.setacc(value)
+            return
         ctx = CommandContext(self)
         processor.insertcode(
-            Initializer(ctx),
-            self.module,
-            self.do_getmember,
-            Finalizer(ctx)
+            Initializer(ctx), self.do_getmember, Finalizer(ctx)
         )
     #-def
 
@@ -4844,13 +5812,17 @@ class GetMember(Trackable):
                 "%s: Module expected" % self.name,
                 processor.traceback()
             )
-        if self.member not in module.ctx.env:
+        env = module.ctx.env
+        if self.member not in env:
             raise CommandError(processor.NameError,
                 "%s: Module %s (%s) has no member %s" % (
                     self.name, module.name, module.qname, self.member
                 ),
                 processor.traceback()
             )
-        processor.setacc(module.ctx.env.getvar(self.member))
+        version = env.version
+        value = env.getvar(self.member)
+        self.__cache.entry = (module, version, value)
+        processor.setacc(value)
     #-def
 #-class
@@ -0,0 +1,1130 @@
+#                                                         -*- coding: utf-8 -*-
+#! \file    ./doit/support/cmd/compiler.py
+#! \author  Jiří Kučera, <sanczes@gmail.com>
+#! \stamp   2026-10-18 11:02:44 (UTC+01:00, DST+01:00)
+#! \project DoIt!: Tools and Libraries for Building DSLs
+#! \license MIT
+#! \version 0.0.0
+#! \fdesc   @pyfile.docstr
+#
+"""\
+Command processor's ahead-of-time compiler.\
+"""
+
+__license__ = """\
+Copyright (c) 2014 - 2017 Jiří Kučera.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+IN THE SOFTWARE.\
+"""
+
+import copy
+import inspect
+
+from doit.support.cmd.runtime import \
+    Iterable, \
+    Pair, \
+    List, \
+    HashMap, \
+    Set, \
+    UserType, \
+    Procedure
+
+from doit.support.cmd.commands import \
+    RETURN, \
+    NOVALUE, \
+    NumericTypes, \
+    CollectionTypes, \
+    value_of, \
+    CommandContext, \
+    Initializer, \
+    Finalizer, \
+    Command, \
+    Const, \
+    Trackable, \
+    Expand, \
+    SetLocal, \
+    Define, \
+    Operation, \
+    Or, \
+    NewList, \
+    NewHashMap, \
+    ToBool, \
+    Lambda, \
+    If, \
+    Break, \
+    Continue, \
+    Call, \
+    Closure
+
+def children(x):
+    """
+    """
+
+    for cls in x.__class__.__mro__:
+        for name in getattr(cls, '__slots__', ()):
+            if not name.startswith('__'):
+                yield getattr(x, name, None)
+#-def
+
+def mentions(x, classes):
+    """
+    """
+
+    stack, seen = [x], set()
+    while stack:
+        x = stack.pop()
+        if id(x) in seen:
+            continue
+        seen.add(id(x))
+        if isinstance(x, classes):
+            return True
+        if isinstance(x, Program):
+            stack.extend(x.commands)
+        elif isinstance(x, Command):
+            if x.isloop() or isinstance(x, (Define, Lambda)):
+                continue
+            stack.extend(children(x))
+        elif isinstance(x, (tuple, list)) and not isinstance(x, Procedure):
+            stack.extend(x)
+    return False
+#-def
+
+def escapes(x):
+    """
+    """
+
+    stack, seen = [x], set()
+    while stack:
+        x = stack.pop()
+        if id(x) in seen:
+            continue
+        seen.add(id(x))
+        if isinstance(x, Expand) or isinstance(x, SetLocal) and x.depth > 0:
+            return True
+        if isinstance(x, Program):
+            stack.extend(x.commands)
+        elif isinstance(x, Command):
+            stack.extend(children(x))
+        elif isinstance(x, (tuple, list)) and not isinstance(x, Procedure):
+            stack.extend(x)
+        elif hasattr(x, '__call__'):
+            return True
+    return False
+#-def
+
+def frozen(x):
+    """
+    """
+
+    if isinstance(x, (bool, int, float, str)):
+        return True
+    if isinstance(x, (Pair, Set)):
+        return all(frozen(y) for y in x)
+    return False
+#-def
+
+def names_of(x):
+    """
+    """
+
+    if not isinstance(x, (tuple, list)):
+        return None
+    for name in x:
+        if not isinstance(name, str):
+            return None
+    return x
+#-def
+
+def relocate(new, old):
+    """
+    """
+
+    new.location = old.location
+    new.properties = dict(old.properties)
+    return new
+#-def
+
+def ins_halt(frame, processor, ins):
+    """
+    """
+
+    return True
+#-def
+
+def ins_exec(frame, processor, ins):
+    """
+    """
+
+    processor.insertcode(ins[2], frame)
+    return True
+#-def
+
+def ins_const(frame, processor, ins):
+    """
+    """
+
+    processor.setacc(ins[2])
+#-def
+
+def ins_value(frame, processor, ins):
+    """
+    """
+
+    processor.setacc(ins[2](ins[3]))
+#-def
+
+def ins_null(frame, processor, ins):
+    """
+    """
+
+    processor.setacc(processor.Null)
+#-def
+
+def ins_pushacc(frame, processor, ins):
+    """
+    """
+
+    processor.pushacc()
+#-def
+
+def ins_getlocal(frame, processor, ins):
+    """
+    """
+
+    processor.setacc(frame.env.lookup(ins[1].varname, ins[2]))
+#-def
+
+def ins_setlocal(frame, processor, ins):
+    """
+    """
+
+    ins[1].setlocal(processor, frame.env)
+#-def
+
+def ins_op(frame, processor, ins):
+    """
+    """
+
+    ins[1].do_op(processor)
+#-def
+
+def ins_opyield(frame, processor, ins):
+    """
+    """
+
+    processor.insertcode(frame)
+    ins[1].do_op(processor)
+    return True
+#-def
+
+def ins_andor(frame, processor, ins):
+    """
+    """
+
+    bool_a = processor.acc()
+    orig_a = processor.popval()
+    if bool_a == ins[2]:
+        processor.setacc(orig_a)
+        frame.pc = ins[3]
+#-def
+
+def ins_jump(frame, processor, ins):
+    """
+    """
+
+    frame.pc = ins[2]
+#-def
+
+def ins_jumpf(frame, processor, ins):
+    """
+    """
+
+    if not processor.acc():
+        frame.pc = ins[2]
+#-def
+
+def ins_jumpt(frame, processor, ins):
+    """
+    """
+
+    if processor.acc():
+        frame.pc = ins[2]
+#-def
+
+def ins_enter(frame, processor, ins):
+    """
+    """
+
+    frame.env = processor.newenv(frame.env)
+#-def
+
+def ins_leave(frame, processor, ins):
+    """
+    """
+
+    frame.env = frame.env.outer()
+#-def
+
+def ins_unwind(frame, processor, ins):
+    """
+    """
+
+    _, _, nscopes, nvals, target = ins
+    while nscopes > 0:
+        frame.env = frame.env.outer()
+        nscopes -= 1
+    while nvals > 0:
+        processor.popval()
+        nvals -= 1
+    frame.pc = target
+#-def
+
+def ins_foreach(frame, processor, ins):
+    """
+    """
+
+    node = ins[1]
+    processor.pushval((
+        node.iterator(processor, processor.acc()),
+        processor.qpath(node.var)
+    ))
+#-def
+
+def ins_next(frame, processor, ins):
+    """
+    """
+
+    it = processor.topval()[0]
+    x = it.next()
+    if x is it:
+        processor.popval()
+        frame.pc = ins[2]
+        return
+    v = value_of(processor, x)
+    if v is NOVALUE:
+        processor.insertcode(x, frame)
+        return True
+    processor.setacc(v)
+#-def
+
+def ins_setvar(frame, processor, ins):
+    """
+    """
+
+    _, qvar = processor.topval()
+    ins[1].setvar(frame.env, processor.acc(), qvar)
+#-def
+
+def ins_callproc(frame, processor, ins):
+    """
+    """
+
+    proc = processor.acc()
+    ins[1].check_proc(processor, proc)
+    processor.pushval(proc)
+#-def
+
+def make_closure(processor, node):
+    """
+    """
+
+    vals = [processor.popval() for _ in node.args]
+    vals.reverse()
+    name, qname, bvars, params, vararg, body, outer = processor.popval()
+    nreqargs = len(params) - 1 if vararg else len(params)
+    args = {}
+    for i in range(nreqargs):
+        args[params[i]] = vals[i]
+    if vararg:
+        args[params[-1]] = List(vals[nreqargs:])
+    return Closure(name, qname, bvars, args, body, outer)
+#-def
+
+def ins_call(frame, processor, ins):
+    """
+    """
+
+    processor.insertcode(make_closure(processor, ins[1]), frame)
+    return True
+#-def
+
+def ins_tailcall(frame, processor, ins):
+    """
+    """
+
+    closure = make_closure(processor, ins[1])
+    if not processor.tailcall(closure):
+        processor.insertcode(closure, frame)
+    return True
+#-def
+
+def ins_ecallproc(frame, processor, ins):
+    """
+    """
+
+    ins[1].check_proc(processor)
+#-def
+
+def ins_ecall(frame, processor, ins):
+    """
+    """
+
+    args = [processor.popval() for _ in ins[1].args]
+    args.reverse()
+    r = ins[1].call(processor, args)
+    if inspect.isawaitable(r):
+        processor.insertcode(frame)
+        processor.suspend(r, ins[1])
+    v = value_of(processor, r)
+    if v is NOVALUE:
+        processor.insertcode(r, frame)
+        return True
+    processor.setacc(v)
+#-def
+
+def ins_return(frame, processor, ins):
+    """
+    """
+
+    processor.handle_event(RETURN, None, processor.acc())
+    return True
+#-def
+
+class Frame(CommandContext):
+    """
+    """
+    SLICE = 256
+    __slots__ = [ 'code', 'pc' ]
+
+    def __init__(self, cmd):
+        """
+        """
+
+        CommandContext.__init__(self, cmd)
+        self.code = cmd.code
+        self.pc = 0
+    #-def
+
+    def location(self):
+        """
+        """
+
+        node = self.code[self.pc - 1][1] if self.pc > 0 else None
+        if node is None:
+            return self.cmd.location
+        return node.location
+    #-def
+
+    def __call__(self, processor):
+        """
+        """
+
+        code = self.code
+        n = self.SLICE
+        while n > 0:
+            n -= 1
+            ins = code[self.pc]
+            self.pc += 1
+            if ins[0](self, processor, ins):
+                return
+        processor.insertcode(self)
+    #-def
+#-class
+
+class Program(Trackable):
+    """
+    """
+    __slots__ = [ 'code', 'commands' ]
+    NONSTRUCTURAL = [ 'code' ]
+
+    def __init__(self, code, commands):
+        """
+        """
+
+        Trackable.__init__(self)
+        self.code = code
+        self.commands = tuple(commands)
+    #-def
+
+    def __eq__(self, other):
+        """
+        """
+
+        return isinstance(other, self.__class__) \
+        and Trackable.__eq__(self, other) \
+        and self.commands == other.commands
+    #-def
+
+    def __ne__(self, other):
+        """
+        """
+
+        return not self.__eq__(other)
+    #-def
+
+    def expand(self, processor):
+        """
+        """
+
+        ctx = Frame(self)
+        processor.insertcode(Initializer(ctx), ctx, Finalizer(ctx))
+    #-def
+#-class
+
+class LoopScope(object):
+    """
+    """
+    __slots__ = [
+        'nvals', 'bnvals', 'nscopes', 'ready', 'cont', 'conts', 'breaks',
+        'dynamic'
+    ]
+
+    def __init__(self, nvals, nscopes):
+        """
+        """
+
+        self.nvals = nvals
+        self.bnvals = nvals
+        self.nscopes = nscopes
+        self.ready = False
+        self.cont = None
+        self.conts = []
+        self.breaks = []
+        self.dynamic = False
+    #-def
+#-class
+
+class StaticScope(object):
+    """
+    """
+    __slots__ = [ 'names', 'refs', 'dynamic' ]
+
+    def __init__(self, names = ()):
+        """
+        """
+
+        self.names = set(names)
+        self.refs = []
+        self.dynamic = False
+    #-def
+#-class
+
+class Folder(object):
+    """
+    """
+    __slots__ = []
+
+    def __init__(self):
+        """
+        """
+
+        pass
+    #-def
+
+    def fold(self, x):
+        """
+        """
+
+        if not isinstance(x, Command) or isinstance(x, (Const, Program)):
+            return x
+        if isinstance(x, If):
+            return self.fold_if(x)
+        if isinstance(x, Lambda):
+            return self.fold_lambda(x)
+        if isinstance(x, Operation):
+            return self.fold_operation(x)
+        return self.rebuild(x)
+    #-def
+
+    def fold_items(self, xs):
+        """
+        """
+
+        ys = [self.fold(x) for x in xs]
+        for x, y in zip(xs, ys):
+            if x is not y:
+                return xs.__class__(ys)
+        return xs
+    #-def
+
+    def rebuild(self, node, **folded):
+        """
+        """
+
+        changes = {}
+        for cls in node.__class__.__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                if name.startswith('__') or name in changes:
+                    continue
+                old = getattr(node, name, None)
+                if name in folded:
+                    new = folded[name]
+                elif isinstance(old, (tuple, list)) \
+                and not isinstance(old, Iterable):
+                    new = self.fold_items(old)
+                else:
+                    new = self.fold(old)
+                if new is not old:
+                    changes[name] = new
+        if not changes:
+            return node
+        node = copy.copy(node)
+        for name in changes:
+            setattr(node, name, changes[name])
+        vars(node).pop('hash_', None)
+        return node
+    #-def
+
+    def constant(self, x):
+        """
+        """
+
+        if isinstance(x, Const):
+            return NOVALUE if x.constval is None else x.constval
+        if isinstance(x, Command) or hasattr(x, '__call__'):
+            return NOVALUE
+        if isinstance(x, (bool, int, float, str, Iterable)):
+            return x
+        if isinstance(x, tuple) and len(x) == 2:
+            return Pair(*x)
+        if isinstance(x, list):
+            return List(x)
+        if isinstance(x, dict):
+            return HashMap(x)
+        return NOVALUE
+    #-def
+
+    def truth(self, x):
+        """
+        """
+
+        v = self.constant(x)
+        if isinstance(v, bool):
+            return v
+        if isinstance(v, NumericTypes):
+            return v != 0
+        if isinstance(v, CollectionTypes):
+            return len(v) > 0
+        return None
+    #-def
+
+    def literal(self, node, value):
+        """
+        """
+
+        if frozen(value):
+            return relocate(Const(value), node)
+        # Mutable results become plain literals so that every evaluation
+        # still produces a fresh copy:
+        if value.__class__ is List and all(frozen(x) for x in value):
+            return list(value)
+        if value.__class__ is HashMap \
+        and all(frozen(k) and frozen(v) for k, v in value.items()):
+            return dict(value)
+        return NOVALUE
+    #-def
+
+    def evaluate(self, node, operands):
+        """
+        """
+
+        cls = node.__class__
+        if cls.expand is not Operation.expand:
+            return NOVALUE
+        args = [self.constant(x) for x in operands]
+        if any(x is NOVALUE for x in args):
+            return NOVALUE
+        if cls is NewList:
+            return List(args)
+        if cls is NewHashMap:
+            if all(isinstance(x, tuple) and len(x) == 2 for x in args):
+                return HashMap(dict(args))
+            return NOVALUE
+        op_spec = cls.OP_TAB.get(node.name)
+        if cls.do_op is not Operation.do_op or op_spec is None \
+        or node.name == 'is' or 'conversions' in op_spec:
+            return NOVALUE
+        types = op_spec['types']
+        if len(types[0]) != len(args):
+            return NOVALUE
+        for typespec in types:
+            if all(isinstance(x, t) for x, t in zip(args, typespec)):
+                break
+        else:
+            return NOVALUE
+        # Operations that fail are left to run time where the error is
+        # reported properly:
+        try:
+            constraints = op_spec.get('constraints')
+            if constraints is not None and not constraints(None, *args)[0]:
+                return NOVALUE
+            return op_spec['operation'](*args)
+        except Exception:
+            return NOVALUE
+    #-def
+
+    def fold_operation(self, node):
+        """
+        """
+
+        operands = self.fold_items(node.operands)
+        value = self.evaluate(node, operands)
+        if value is not NOVALUE:
+            value = self.literal(node, value)
+            if value is not NOVALUE:
+                return value
+        return self.rebuild(node, operands = operands)
+    #-def
+
+    def fold_lambda(self, node):
+        """
+        """
+
+        params, vararg, body, bvars = node.operands
+        folded = self.fold_items(body)
+        if folded is body:
+            return node
+        return self.rebuild(node, operands = (params, vararg, folded, bvars))
+    #-def
+
+    def fold_if(self, node):
+        """
+        """
+
+        c = self.fold(node.c)
+        t, e = self.fold_items(node.t), self.fold_items(node.e)
+        v = self.truth(c)
+        if v is None:
+            return self.rebuild(node, c = c, t = t, e = e)
+        taken = t if v else e
+        if not taken:
+            return relocate(Const(v), node)
+        if len(taken) == 1:
+            return taken[0]
+        c = relocate(Const(v), c) if isinstance(c, Command) else v
+        return self.rebuild(node,
+            c = c, t = t if v else t[:0], e = e[:0] if v else e
+        )
+    #-def
+#-class
+
+class Compiler(object):
+    """
+    """
+    __slots__ = [ 'code', 'nvals', 'nscopes', 'loops', 'scopes' ]
+
+    def __init__(self):
+        """
+        """
+
+        self.code = []
+        self.nvals = 0
+        self.nscopes = 0
+        self.loops = []
+        self.scopes = []
+    #-def
+
+    def compile(self, commands, names = None):
+        """
+        """
+
+        self.code, self.nvals, self.nscopes, self.loops = [], 0, 0, []
+        self.scopes = [StaticScope(names)] if names is not None else []
+        for x in Folder().fold_items(commands):
+            self.expr(x)
+        if self.scopes:
+            self.close_scope()
+        self.emit(ins_halt, None)
+        code = tuple(tuple(x) for x in self.code)
+        self.code = []
+        return Program(code, commands)
+    #-def
+
+    def subprogram(self, commands, names = None):
+        """
+        """
+
+        return self.__class__().compile(commands, names)
+    #-def
+
+    def open_scope(self):
+        """
+        """
+
+        self.scopes.append(StaticScope())
+    #-def
+
+    def close_scope(self):
+        """
+        """
+
+        scope = self.scopes.pop()
+        outer = self.scopes[-1] if self.scopes else None
+        for i in scope.refs:
+            ins = self.code[i]
+            if scope.dynamic or ins[1].varname in scope.names:
+                continue
+            ins[2] += 1
+            if outer is not None:
+                outer.refs.append(i)
+    #-def
+
+    def bind(self, name, depth = 0):
+        """
+        """
+
+        k = len(self.scopes) - 1 - depth
+        if k >= 0:
+            self.scopes[k].names.add(name)
+    #-def
+
+    def emit(self, f, node, *args):
+        """
+        """
+
+        self.code.append([f, node] + list(args))
+        return len(self.code) - 1
+    #-def
+
+    def label(self):
+        """
+        """
+
+        return len(self.code)
+    #-def
+
+    def patch(self, i, target):
+        """
+        """
+
+        self.code[i][-1] = target
+    #-def
+
+    def expr(self, x):
+        """
+        """
+
+        if isinstance(x, Command):
+            x.compile(self)
+        elif hasattr(x, '__call__'):
+            self.fallback(x)
+        elif isinstance(x, (
+            bool, int, float, str, Iterable, UserType, Procedure
+        )):
+            self.emit(ins_const, None, x)
+        elif isinstance(x, tuple) and len(x) == 2:
+            self.emit(ins_const, None, Pair(*x))
+        elif isinstance(x, list):
+            self.emit(ins_value, None, List, x)
+        elif isinstance(x, dict):
+            self.emit(ins_value, None, HashMap, x)
+        elif x is None:
+            self.emit(ins_null, None)
+        else:
+            self.fallback(x)
+    #-def
+
+    def exprs(self, xs):
+        """
+        """
+
+        for x in xs:
+            self.expr(x)
+    #-def
+
+    def fallback(self, x, binds = None):
+        """
+        """
+
+        if self.loops and mentions(x, (Break, Continue)):
+            self.loops[-1].dynamic = True
+        if binds is None:
+            for scope in self.scopes:
+                scope.dynamic = True
+        else:
+            for name in binds:
+                self.bind(name)
+        self.emit(ins_exec, x if isinstance(x, Command) else None, x)
+    #-def
+
+    def const(self, node, value):
+        """
+        """
+
+        self.emit(ins_const, node, value)
+    #-def
+
+    def pushacc(self, node):
+        """
+        """
+
+        self.emit(ins_pushacc, node)
+        self.nvals += 1
+    #-def
+
+    def tobool(self, node, x):
+        """
+        """
+
+        self.expr(relocate(ToBool(x), node))
+    #-def
+
+    def begin_loop(self):
+        """
+        """
+
+        loop = LoopScope(self.nvals, self.nscopes)
+        self.loops.append(loop)
+        return loop
+    #-def
+
+    def end_loop(self, node, start):
+        """
+        """
+
+        loop = self.loops.pop()
+        if loop.dynamic:
+            del self.code[start:]
+            for scope in self.scopes:
+                scope.refs = [i for i in scope.refs if i < start]
+            self.nvals, self.nscopes = loop.nvals, loop.nscopes
+            self.fallback(node)
+            return
+        end = self.label()
+        for i in loop.conts:
+            self.patch(i, loop.cont)
+        for i in loop.breaks:
+            self.patch(i, end)
+    #-def
+
+    def compile_setlocal(self, node):
+        """
+        """
+
+        self.expr(node.value)
+        self.emit(ins_setlocal, node)
+        self.bind(node.varname, node.depth)
+    #-def
+
+    def compile_getlocal(self, node):
+        """
+        """
+
+        i = self.emit(ins_getlocal, node, 0)
+        if self.scopes:
+            self.scopes[-1].refs.append(i)
+    #-def
+
+    def compile_define(self, node):
+        """
+        """
+
+        names = names_of(node.bvars), names_of(node.params)
+        names = None if None in names else list(names[0]) + list(names[1])
+        self.fallback(relocate(Define(
+            node.pname, node.bvars, node.params, node.vararg,
+            [self.subprogram(node.body, names)]
+        ), node), None if escapes(node.body) else [node.pname])
+    #-def
+
+    def compile_lambda(self, node):
+        """
+        """
+
+        params, vararg, body, bvars = node.operands
+        names = names_of(bvars), names_of(params)
+        names = None if None in names else list(names[0]) + list(names[1])
+        self.fallback(relocate(Lambda(
+            params, vararg, [self.subprogram(body, names)], bvars
+        ), node), None if escapes(body) else [])
+    #-def
+
+    def compile_operation(self, node, yields = False):
+        """
+        """
+
+        if node.__class__.expand is not Operation.expand:
+            self.fallback(node)
+            return
+        node.specialize(node.name)
+        for x in node.operands:
+            self.expr(x)
+            self.pushacc(node)
+        self.emit(ins_opyield if yields else ins_op, node)
+        self.nvals -= len(node.operands)
+    #-def
+
+    def compile_andor(self, node):
+        """
+        """
+
+        a, b = node.operands
+        self.expr(a)
+        self.pushacc(node)
+        self.pushacc(node)
+        self.emit(ins_op, relocate(ToBool(None), node))
+        self.nvals -= 1
+        j = self.emit(ins_andor, node, isinstance(node, Or), None)
+        self.nvals -= 1
+        self.expr(b)
+        self.patch(j, self.label())
+    #-def
+
+    def compile_block(self, node):
+        """
+        """
+
+        self.emit(ins_enter, node)
+        self.nscopes += 1
+        self.open_scope()
+        self.exprs(node.commands)
+        self.close_scope()
+        self.emit(ins_leave, node)
+        self.nscopes -= 1
+    #-def
+
+    def compile_if(self, node):
+        """
+        """
+
+        self.tobool(node, node.c)
+        j = self.emit(ins_jumpf, node, None)
+        self.exprs(node.t)
+        k = self.emit(ins_jump, node, None)
+        self.patch(j, self.label())
+        self.exprs(node.e)
+        self.patch(k, self.label())
+    #-def
+
+    def compile_foreach(self, node):
+        """
+        """
+
+        start = self.label()
+        loop = self.begin_loop()
+        self.expr(node.itexp)
+        self.emit(ins_foreach, node)
+        self.nvals += 1
+        loop.bnvals, loop.ready = self.nvals, True
+        loop.cont = self.emit(ins_next, node, None)
+        self.emit(ins_setvar, node)
+        self.bind(node.var)
+        self.exprs(node.body)
+        self.emit(ins_jump, node, loop.cont)
+        self.patch(loop.cont, self.label())
+        self.nvals -= 1
+        self.end_loop(node, start)
+    #-def
+
+    def compile_while(self, node):
+        """
+        """
+
+        start = self.label()
+        loop = self.begin_loop()
+        loop.ready, loop.cont = True, start
+        self.tobool(node, node.c)
+        j = self.emit(ins_jumpf, node, None)
+        self.exprs(node.b)
+        self.emit(ins_jump, node, start)
+        self.patch(j, self.label())
+        self.end_loop(node, start)
+    #-def
+
+    def compile_dowhile(self, node):
+        """
+        """
+
+        start = self.label()
+        loop = self.begin_loop()
+        loop.ready = True
+        self.exprs(node.b)
+        loop.cont = self.label()
+        self.tobool(node, node.c)
+        self.emit(ins_jumpt, node, start)
+        self.end_loop(node, start)
+    #-def
+
+    def compile_break(self, node):
+        """
+        """
+
+        if not self.loops:
+            self.fallback(node)
+            return
+        loop = self.loops[-1]
+        loop.breaks.append(self.emit(ins_unwind, node,
+            self.nscopes - loop.nscopes, self.nvals - loop.nvals, None
+        ))
+    #-def
+
+    def compile_continue(self, node):
+        """
+        """
+
+        if not self.loops:
+            self.fallback(node)
+            return
+        loop = self.loops[-1]
+        if not loop.ready:
+            loop.dynamic = True
+            return
+        loop.conts.append(self.emit(ins_unwind, node,
+            self.nscopes - loop.nscopes, self.nvals - loop.bnvals, None
+        ))
+    #-def
+
+    def compile_call(self, node, tail = False):
+        """
+        """
+
+        self.expr(node.proc)
+        self.emit(ins_callproc, node)
+        self.nvals += 1
+        for x in node.args:
+            self.expr(x)
+            self.pushacc(node)
+        self.emit(ins_tailcall if tail else ins_call, node)
+        self.nvals -= len(node.args) + 1
+    #-def
+
+    def compile_ecall(self, node):
+        """
+        """
+
+        self.emit(ins_ecallproc, node)
+        for x in node.args:
+            self.expr(x)
+            self.pushacc(node)
+        self.emit(ins_ecall, node)
+        self.nvals -= len(node.args)
+    #-def
+
+    def compile_return(self, node):
+        """
+        """
+
+        if isinstance(node.expr, Call) \
+        and node.expr.__class__.compile is Call.compile:
+            self.compile_call(node.expr, True)
+        else:
+            self.expr(node.expr)
+        self.emit(ins_return, node)
+    #-def
+#-class
@@ -51,6 +51,13 @@ class CommandProcessorError(DoItError):
         self.traceback = tb
     #-def
 
+    def __reduce__(self):
+        """
+        """
+
+        return (self.__class__, (self.traceback, self.detail))
+    #-def
+
     def __str__(self):
         """
         """
@@ -76,6 +83,13 @@ class CommandError(DoItError):
         self.tb = tb
     #-def
 
+    def __reduce__(self):
+        """
+        """
+
+        return (self.__class__, (self.ecls, self.emsg, self.tb))
+    #-def
+
     def __repr__(self):
         """
         """
@@ -33,7 +33,10 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 IN THE SOFTWARE.\
 """
 
+import asyncio
 import collections
+import copy
+import itertools
 
 from doit.config.version import DOIT_VERSION
 
@@ -43,10 +46,15 @@ from doit.support.cmd.errors import \
 
 from doit.support.cmd.runtime import \
     Location, \
+    QName, \
     Iterable, \
     Pair, \
     List, \
     HashMap, \
+    PersistentList, \
+    PersistentHashMap, \
+    Rope, \
+    Set, \
     UserType, \
     ExceptionClass, \
     Traceback, \
@@ -60,24 +68,45 @@ from doit.support.cmd.commands import \
     CONTINUE, \
     CLEANUP, \
     Finalizer, \
+    CommandContext, \
     Command, \
     Macro, \
     Module, \
     MainModule
 
+from doit.support.cmd.compiler import \
+    Compiler
+
 class MetaInfo(object):
     """
     """
-    __slots__ = [ 'qname', 'location' ]
+    __slots__ = [ '__qname', 'location' ]
 
     def __init__(self):
         """
         """
 
-        self.qname = ""
+        self.__qname = ""
         self.location = Location()
     #-def
 
+    def get_qname(self):
+        """
+        """
+
+        q = self.__qname
+        return q if isinstance(q, str) else str(q)
+    #-def
+
+    def set_qname(self, qname):
+        """
+        """
+
+        self.__qname = qname
+    #-def
+
+    qname = property(get_qname, set_qname)
+
     def __eq__(self, other):
         """
         """
@@ -95,10 +124,14 @@ class MetaInfo(object):
     #-def
 #-class
 
+ENV_VERSIONS = itertools.count()
+
 class Environment(dict):
     """
     """
-    __slots__ = [ 'processor', '__outer', 'meta' ]
+    __slots__ = [
+        'processor', '__outer', 'scope', '__qnames', '__meta', 'version'
+    ]
 
     def __init__(self, processor = None, outer = None):
         """
@@ -110,27 +143,64 @@ class Environment(dict):
             outer.processor if outer is not None else \
             None
         self.__outer = outer
-        self.meta = {}
+        self.scope = None
+        self.__qnames = {}
+        self.__meta = {}
+        self.version = next(ENV_VERSIONS)
     #-def
 
-    def setvar(self, name, value):
+    def setvar(self, name, value, qname = None):
         """
         """
 
         self[name] = value
-        if name not in self.meta:
-            self.meta[name] = MetaInfo()
+        self.version = next(ENV_VERSIONS)
+        if qname is not None:
+            self.__qnames[name] = qname
+            if name in self.__meta:
+                self.__meta[name].qname = qname
+    #-def
+
+    def bind(self, values, scope):
+        """
+        """
+
+        self.update(values)
+        self.scope = scope
+        self.version = next(ENV_VERSIONS)
     #-def
 
     def getvar(self, name):
         """
         """
 
-        if name in self:
-            return self[name]
-        if self.__outer:
-            return self.__outer.getvar(name)
-        raise CommandError(self.processor.NameError,
+        # The search stops at the first outer scope that is empty:
+        env = self
+        while name not in env:
+            env = env.__outer
+            if not env:
+                raise self.__undefined(name)
+        return env[name]
+    #-def
+
+    def lookup(self, name, depth):
+        """
+        """
+
+        env = self
+        while depth > 0:
+            env = env.__outer
+            if not env:
+                raise self.__undefined(name)
+            depth -= 1
+        return env.getvar(name)
+    #-def
+
+    def __undefined(self, name):
+        """
+        """
+
+        return CommandError(self.processor.NameError,
             "Undefined variable '%s'" % name,
             self.processor.traceback()
         )
@@ -142,39 +212,210 @@ class Environment(dict):
 
         if name in self:
             del self[name]
-        if name in self.meta:
-            del self.meta[name]
+            self.version = next(ENV_VERSIONS)
+        if name in self.__qnames:
+            del self.__qnames[name]
+        if name in self.__meta:
+            del self.__meta[name]
+    #-def
+
+    def getmeta(self, name):
+        """
+        """
+
+        meta = self.__meta.get(name)
+        if meta is None:
+            if name not in self:
+                raise KeyError(name)
+            meta = self.__meta[name] = MetaInfo()
+            qname = self.__qnames.get(name)
+            if qname is not None:
+                meta.qname = qname
+            elif self.scope is not None:
+                meta.qname = self.scope.child(name)
+        return meta
+    #-def
+
+    def get_meta(self):
+        """
+        """
+
+        return dict((name, self.getmeta(name)) for name in self)
     #-def
 
+    meta = property(get_meta)
+
     def outer(self):
         """
         """
 
         return self.__outer
     #-def
+
+    def clone(self, processor, memo, copier):
+        """
+        """
+
+        env = memo[id(self)] = self.__class__(processor)
+        env.__outer = copier(self.__outer)
+        env.scope = self.scope
+        env.__qnames = dict(self.__qnames)
+        for name, meta in self.__meta.items():
+            m = env.__meta[name] = MetaInfo()
+            m.qname = meta.qname
+            m.location = meta.location
+        for name, value in self.items():
+            dict.__setitem__(env, name, copier(value))
+        return env
+    #-def
+#-class
+
+class SnapshotNull(object):
+    """
+    """
+    __slots__ = []
+
+    def __reduce__(self):
+        """
+        """
+
+        return 'SNAPSHOT_NULL'
+    #-def
+#-class
+
+SNAPSHOT_NULL = SnapshotNull()
+
+class Snapshot(object):
+    """
+    """
+    __slots__ = [ 'env', 'consts', 'qroots' ]
+
+    def __init__(self, env, consts, qroots):
+        """
+        """
+
+        self.env = env
+        self.consts = consts
+        self.qroots = qroots
+    #-def
+
+    @classmethod
+    def take(cls, processor, env, consts, qroots):
+        """
+        """
+
+        consts = dict(consts)
+        del consts['Null']
+        return cls(
+            cls.copier({id(processor): SNAPSHOT_NULL}, None)(env),
+            consts, dict(qroots)
+        )
+    #-def
+
+    def restore(self, processor):
+        """
+        """
+
+        return self.copier({id(SNAPSHOT_NULL): processor}, processor)(
+            self.env
+        )
+    #-def
+
+    @staticmethod
+    def copier(memo, processor):
+        """
+        """
+
+        def copy_value(x):
+            """
+            """
+
+            r = memo.get(id(x))
+            if r is not None:
+                return r
+            if isinstance(x, Environment):
+                return x.clone(processor, memo, copy_value)
+            elif isinstance(x, Module):
+                # Register the copy first; the module environment refers
+                # back to the module through its 'this' variable:
+                r = memo[id(x)] = copy.copy(x)
+                r.outer = copy_value(x.outer)
+                r.ctx = CommandContext(r)
+                r.ctx.env = copy_value(x.ctx.env)
+                r.ctx.nvals = x.ctx.nvals
+            elif isinstance(x, Procedure):
+                r = x.__class__(*(x[:-1] + (copy_value(x[-1]),)))
+            elif isinstance(x, Pair):
+                r = Pair(copy_value(x[0]), copy_value(x[1]))
+            elif isinstance(x, list):
+                r = List([copy_value(y) for y in x])
+            elif isinstance(x, dict):
+                r = HashMap((k, copy_value(v)) for k, v in x.items())
+            elif isinstance(x, (PersistentList, PersistentHashMap)):
+                r = x.__class__(x)
+            else:
+                return x
+            memo[id(x)] = r
+            return r
+        return copy_value
+    #-def
+#-class
+
+class Suspension(Exception):
+    """
+    """
+    __slots__ = [ 'awaitable', 'source' ]
+
+    def __init__(self, awaitable, source):
+        """
+        """
+
+        Exception.__init__(self)
+        self.awaitable = awaitable
+        self.source = source
+    #-def
 #-class
 
 class CommandProcessor(object):
     """
     """
     __slots__ = [
-        '__env', '__ctxstack', '__valstack', '__codebuff', '__acc', '__consts',
-        '__types'
+        '__env', '__ctxstack', '__ctxchain', '__valstack', '__codebuff',
+        '__fnlzidx', '__guardidx',
+        '__acc', '__consts', '__types', '__debug', '__scopes', '__qroots',
+        '__profiler', '__maxvals', '__maxctxs', '__async'
     ]
 
-    def __init__(self, env = None):
+    def __init__(self, env = None, debug = False, snapshot = None):
         """
         """
 
+        if env is not None and snapshot is not None:
+            raise CommandProcessorError(Traceback([]),
+                "__init__: Environment and snapshot are mutually exclusive"
+            )
+        self.__debug = debug
         self.__env = env if env is not None else Environment()
         self.__env.processor = self
         self.__ctxstack = []
+        self.__ctxchain = None
+        self.__scopes = []
+        self.__qroots = {}
         self.__valstack = []
         self.__codebuff = []
+        self.__fnlzidx = []
+        self.__guardidx = []
         self.__acc = None
+        self.__profiler = None
+        self.__maxvals = None
+        self.__maxctxs = None
+        self.__async = False
         self.__initialize_types_and_constants()
-        self.__copy_exceptions_to_env()
-        self.__initialize_main_module()
+        if snapshot is not None:
+            self.__restore(snapshot)
+        else:
+            self.__copy_exceptions_to_env()
+            self.__initialize_main_module()
         self.cleanup()
     #-def
 
@@ -219,7 +460,17 @@ class CommandProcessor(object):
         """
         """
 
+        if ctx.cmd.isfunc():
+            scopes = self.__scopes
+            scopes.append(
+                scopes[-1].child(ctx.cmd.name) if scopes else \
+                self.qroot(ctx.cmd.name)
+            )
         self.__ctxstack.append(ctx)
+        self.__ctxchain = (ctx, self.__ctxchain)
+        if self.__maxctxs is not None \
+        and len(self.__ctxstack) > self.__maxctxs:
+            self.quota_exceeded("Command context stack")
     #-def
 
     def cmdctx(self, cmd):
@@ -231,19 +482,28 @@ class CommandProcessor(object):
                 "cmdctx: Command context stack is empty"
             )
         ctx = self.__ctxstack[-1]
-        fnlz, i = None, 0
-        while i < len(self.__codebuff):
-            if isinstance(self.__codebuff[i], Finalizer):
-                fnlz = self.__codebuff[i]
-                break
-            i += 1
+        cb, fi = self.__codebuff, self.__fnlzidx
+        fnlz = cb[fi[-1]] if fi else None
+        if self.__debug and not self.check_codebuff(fnlz):
+            fnlz = None
         if not fnlz or fnlz.ctx is not ctx or ctx.cmd is not cmd:
-            raise CommandProcessorError(Traceback(self.__ctxstack),
+            raise CommandProcessorError(Traceback(self.__ctxchain),
                 "cmdctx: Inconsistent state"
             )
         return ctx
     #-def
 
+    def check_codebuff(self, fnlz):
+        """
+        """
+
+        cb, fi = self.__codebuff, self.__fnlzidx
+        idx = [i for i in range(len(cb)) if isinstance(cb[i], Finalizer)]
+        if idx != fi:
+            return False
+        return (cb[idx[-1]] if idx else None) is fnlz
+    #-def
+
     def popctx(self, ctx):
         """
         """
@@ -253,16 +513,22 @@ class CommandProcessor(object):
                 "popctx: Command context stack is empty"
             )
         if self.__ctxstack[-1] is not ctx:
-            raise CommandProcessorError(Traceback(self.__ctxstack),
+            raise CommandProcessorError(Traceback(self.__ctxchain),
                 "popctx: Command context stack is corrupted"
             )
         self.__ctxstack.pop()
+        self.__ctxchain = self.__ctxchain[1]
+        if ctx.cmd.isfunc():
+            self.__scopes.pop()
     #-def
 
     def pushval(self, val):
         """
         """
 
+        if self.__maxvals is not None \
+        and len(self.__valstack) >= self.__maxvals:
+            self.quota_exceeded("Value stack")
         self.__valstack.append(val)
     #-def
 
@@ -270,6 +536,9 @@ class CommandProcessor(object):
         """
         """
 
+        if self.__maxvals is not None \
+        and len(self.__valstack) >= self.__maxvals:
+            self.quota_exceeded("Value stack")
         self.__valstack.append(self.__acc)
     #-def
 
@@ -278,7 +547,7 @@ class CommandProcessor(object):
         """
 
         if not self.__valstack:
-            raise CommandProcessorError(Traceback(self.__ctxstack),
+            raise CommandProcessorError(Traceback(self.__ctxchain),
                 "topval: Value stack is empty"
             )
         return self.__valstack[-1]
@@ -289,7 +558,7 @@ class CommandProcessor(object):
         """
 
         if not self.__valstack:
-            raise CommandProcessorError(Traceback(self.__ctxstack),
+            raise CommandProcessorError(Traceback(self.__ctxchain),
                 "popval: Value stack is empty"
             )
         return self.__valstack.pop()
@@ -306,7 +575,20 @@ class CommandProcessor(object):
         """
         """
 
-        self.__codebuff[:0] = ops
+        self.pushcode(ops)
+    #-def
+
+    def pushcode(self, ops):
+        """
+        """
+
+        cb, fi = self.__codebuff, self.__fnlzidx
+        for x in reversed(ops):
+            if isinstance(x, Finalizer):
+                if x.guard:
+                    self.__guardidx.append(len(cb))
+                fi.append(len(cb))
+            cb.append(x)
     #-def
 
     def setacc(self, v):
@@ -327,14 +609,32 @@ class CommandProcessor(object):
         """
         """
 
-        return Traceback(self.__ctxstack)
+        return Traceback(self.__ctxchain)
     #-def
 
     def mkqname(self, name):
         """
         """
 
-        return "%s::%s" % ("::".join([x.name for x in self.traceback()]), name)
+        return str(self.qpath(name))
+    #-def
+
+    def qpath(self, name):
+        """
+        """
+
+        scopes = self.__scopes
+        return (scopes[-1] if scopes else self.qroot("")).child(name)
+    #-def
+
+    def qroot(self, prefix):
+        """
+        """
+
+        q = self.__qroots.get(prefix)
+        if q is None:
+            q = self.__qroots[prefix] = QName(None, prefix)
+        return q
     #-def
 
     def types(self):
@@ -344,40 +644,205 @@ class CommandProcessor(object):
         return list(self.__types.values())
     #-def
 
-    def run(self, commands):
+    def compile(self, commands):
+        """
+        """
+
+        return Compiler().compile(commands)
+    #-def
+
+    def setprofiler(self, profiler):
+        """
+        """
+
+        self.__profiler = profiler
+    #-def
+
+    def profiler(self):
+        """
+        """
+
+        return self.__profiler
+    #-def
+
+    def setquotas(self, values = None, contexts = None):
+        """
+        """
+
+        self.__maxvals = values
+        self.__maxctxs = contexts
+    #-def
+
+    def quotas(self):
+        """
+        """
+
+        return (self.__maxvals, self.__maxctxs)
+    #-def
+
+    def quota_exceeded(self, what):
+        """
+        """
+
+        raise CommandProcessorError(Traceback(self.__ctxchain),
+            "%s quota exceeded" % what
+        )
+    #-def
+
+    def running(self):
         """
         """
 
-        cb = self.__codebuff
-        cb[:0] = commands
+        return len(self.__codebuff) > 0
+    #-def
+
+    def run(self, commands, max_steps = None):
+        """
+        """
+
+        self.pushcode(commands)
+        if max_steps is not None:
+            return self.step(max_steps)
+        self.__dispatch(-1)
+        return False
+    #-def
+
+    def step(self, budget):
+        """
+        """
+
+        return self.__dispatch(max(budget, 0))
+    #-def
+
+    async def run_async(self, commands, budget = 1024):
+        """
+        """
+
+        self.pushcode(commands)
+        self.__async = True
+        try:
+            while True:
+                try:
+                    if not self.step(budget):
+                        return
+                except Suspension as s:
+                    try:
+                        r = await s.awaitable
+                    except CommandError as e:
+                        r = e
+                    except Exception:
+                        # The processor is still where it suspended, so
+                        # the error and its traceback can be made now:
+                        r = s.source.failure(self)
+                    self.insertcode(r)
+                await asyncio.sleep(0)
+        finally:
+            self.__async = False
+    #-def
+
+    def suspend(self, awaitable, source):
+        """
+        """
+
+        if self.__async:
+            raise Suspension(awaitable, source)
+        if hasattr(awaitable, 'close'):
+            awaitable.close()
+        raise CommandError(self.TypeError,
+            "Awaiting is possible only inside of run_async",
+            self.traceback()
+        )
+    #-def
+
+    def __dispatch(self, budget):
+        """
+        """
+
+        # The budget is the number of items taken from the code buffer; a
+        # negative budget means no limit. The budget is coarse: an item may
+        # do an arbitrary amount of work, e.g. a compiled Frame executes up
+        # to Frame.SLICE instructions before it reschedules itself.
+        cb, fi, gi = self.__codebuff, self.__fnlzidx, self.__guardidx
         types = self.types()
-        while cb:
-            x = cb.pop(0)
+        profiler = self.__profiler
+        while cb and budget != 0:
+            budget -= 1
+            x = cb.pop()
+            if profiler is not None:
+                key, t = profiler.key(self.__ctxstack), profiler.clock()
             if isinstance(x, Command):
+                if profiler is not None:
+                    profiler.expanded(x)
                 x.expand(self)
             elif hasattr(x, '__call__'):
+                if profiler is not None:
+                    profiler.called(x)
+                if fi and fi[-1] == len(cb):
+                    fi.pop()
+                    if gi and gi[-1] == len(cb):
+                        gi.pop()
                 try:
                     x(self)
                 except CommandError as e:
-                    cb[:0] = [e]
-            elif isinstance(x, (
-                bool, int, float, str, Iterable, UserType, Procedure
-            )) or x in types:
-                self.__acc = x
-            elif isinstance(x, tuple) and len(x) == 2:
-                self.__acc = Pair(*x)
-            elif isinstance(x, list):
-                self.__acc = List(x)
-            elif isinstance(x, dict):
-                self.__acc = HashMap(x)
-            elif x is None or x is self.Null:
-                self.__acc = self.Null
-            elif isinstance(x, CommandError):
-                self.handle_event(EXCEPTION, x)
+                    cb.append(e)
             else:
-                raise CommandProcessorError(Traceback(self.__ctxstack),
-                    "run: Unexpected object in code buffer appeared"
-                )
+                self.store(x, types)
+            if profiler is not None:
+                profiler.account(key, profiler.clock() - t)
+        return len(cb) > 0
+    #-def
+
+    def store(self, x, types):
+        """
+        """
+
+        if isinstance(x, (
+            bool, int, float, str, Iterable, UserType, Procedure
+        )) or x in types:
+            self.__acc = x
+        elif isinstance(x, tuple) and len(x) == 2:
+            self.__acc = Pair(*x)
+        elif isinstance(x, list):
+            self.__acc = List(x)
+        elif isinstance(x, dict):
+            self.__acc = HashMap(x)
+        elif x is None or x is self.Null:
+            self.__acc = self.Null
+        elif isinstance(x, CommandError):
+            self.handle_event(EXCEPTION, x)
+        else:
+            raise CommandProcessorError(Traceback(self.__ctxchain),
+                "run: Unexpected object in code buffer appeared"
+            )
+    #-def
+
+    def tailcall(self, cmd):
+        """
+        """
+
+        cb, fi, stack = self.__codebuff, self.__fnlzidx, self.__ctxstack
+        i, j = len(stack), len(fi)
+        if j < i:
+            return False
+        while i > 0:
+            i, j = i - 1, j - 1
+            ctx, fnlz = stack[i], cb[fi[j]]
+            if fnlz.ctx is not ctx or fnlz.sandboxed() or fnlz.after \
+            or ctx.cmd.isguard():
+                return False
+            if ctx.cmd.isfunc():
+                break
+        else:
+            return False
+        k = len(fi)
+        while k > j:
+            k -= 1
+            fnlz = cb[fi[k]]
+            fnlz.ctx.cmd.leave(self, fnlz)
+        del cb[fi[j]:]
+        del fi[j:]
+        self.insertcode(cmd)
+        return True
     #-def
 
     def handle_event(self, event, *args):
@@ -387,20 +852,25 @@ class CommandProcessor(object):
         if event == NONE:
             return
         args = list(args)
-        cb, stack = self.__codebuff, self.__ctxstack
+        cb, fi, stack = self.__codebuff, self.__fnlzidx, self.__ctxstack
         tb = self.extract_tb(event, args)
+        if event == EXCEPTION:
+            self.unwind(tb)
         handled = False
-        while cb:
-            x = cb.pop(0)
-            if isinstance(x, Finalizer):
-                if not stack or x.ctx is not stack[-1]:
-                    raise CommandProcessorError(tb,
-                        "Command context stack is corrupted"
-                    )
-                self.update_fnlz_state(x, event, args)
-                cb.insert(0, x)
-                handled = True
-                break
+        if fi:
+            i = fi.pop()
+            x = cb[i]
+            del cb[i:]
+            if not stack or x.ctx is not stack[-1]:
+                raise CommandProcessorError(tb,
+                    "Command context stack is corrupted"
+                )
+            self.update_fnlz_state(x, event, args)
+            fi.append(len(cb))
+            cb.append(x)
+            handled = True
+        else:
+            del cb[:]
         if event == CLEANUP:
             return
         if (event == EXCEPTION and not handled) or not cb:
@@ -413,6 +883,26 @@ class CommandProcessor(object):
             )
     #-def
 
+    def unwind(self, tb):
+        """
+        """
+
+        # Look up the innermost guard in the handler table. Finalizers above
+        # it would only leave their contexts and rethrow the exception, so
+        # leave these contexts right away:
+        cb, fi, gi = self.__codebuff, self.__fnlzidx, self.__guardidx
+        stack = self.__ctxstack
+        k = gi[-1] if gi else -1
+        while fi and fi[-1] > k:
+            x = cb[fi.pop()]
+            if not stack or x.ctx is not stack[-1]:
+                raise CommandProcessorError(tb,
+                    "Command context stack is corrupted"
+                )
+            x.ctx.cmd.leave(self, x)
+        del cb[k + 1:]
+    #-def
+
     def extract_tb(self, event, args):
         """
         """
@@ -454,10 +944,18 @@ class CommandProcessor(object):
         """
         """
 
-        self.handle_event(CLEANUP, None)
-        self.run([])
+        quotas = self.quotas()
+        self.setquotas()
+        try:
+            self.handle_event(CLEANUP, None)
+            self.run([])
+        finally:
+            self.setquotas(*quotas)
         while self.__ctxstack:
             self.__ctxstack.pop()
+        self.__ctxchain = None
+        while self.__scopes:
+            self.__scopes.pop()
         while self.__valstack:
             self.__valstack.pop()
         self.__acc = None
@@ -469,7 +967,7 @@ class CommandProcessor(object):
 
         if attr[0].isupper():
             if attr not in self.__types and attr not in self.__consts:
-                raise CommandProcessorError(Traceback(self.__ctxstack),
+                raise CommandProcessorError(Traceback(self.__ctxchain),
                     "There is no '%s' type or constant defined" % attr
                 )
             return self.__types.get(attr, self.__consts.get(attr))
@@ -490,6 +988,10 @@ class CommandProcessor(object):
             ('Pair', Pair),
             ('List', list),
             ('HashMap', dict),
+            ('PersistentList', PersistentList),
+            ('PersistentHashMap', PersistentHashMap),
+            ('Set', Set),
+            ('Rope', Rope),
             ('UserType', UserType),
             ('ErrorClass', ExceptionClass),
             ('Error', CommandError),
@@ -522,6 +1024,27 @@ class CommandProcessor(object):
                 self.__env[str(x)] = x
     #-def
 
+    def snapshot(self):
+        """
+        """
+
+        if self.running():
+            raise CommandProcessorError(Traceback(self.__ctxchain),
+                "Cannot take a snapshot of a running processor"
+            )
+        return Snapshot.take(self, self.__env, self.__consts, self.__qroots)
+    #-def
+
+    def __restore(self, snapshot):
+        """
+        """
+
+        self.__consts = dict(snapshot.consts)
+        self.__consts['Null'] = self
+        self.__qroots = dict(snapshot.qroots)
+        self.__env = snapshot.restore(self)
+    #-def
+
     def __initialize_main_module(self):
         """
         """
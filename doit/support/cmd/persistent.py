@@ -0,0 +1,449 @@
+#                                                         -*- coding: utf-8 -*-
+#! \file    ./doit/support/cmd/persistent.py
+#! \author  Jiří Kučera, <sanczes@gmail.com>
+#! \stamp   2026-10-18 14:21:07 (UTC+01:00, DST+01:00)
+#! \project DoIt!: Tools and Libraries for Building DSLs
+#! \license MIT
+#! \version 0.0.0
+#! \fdesc   @pyfile.docstr
+#
+"""\
+Persistent (structure sharing) vectors and hash maps.\
+"""
+
+__license__ = """\
+Copyright (c) 2014 - 2017 Jiří Kučera.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+IN THE SOFTWARE.\
+"""
+BITS = 5
+WIDTH = 1 << BITS
+MASK = WIDTH - 1
+HASH_BITS = 64
+HASH_MASK = (1 << HASH_BITS) - 1
+
+_missing = object()
+
+def popcount(x):
+    """
+    """
+
+    return bin(x).count("1")
+#-def
+
+def new_path(level, node):
+    """
+    """
+
+    while level > 0:
+        node = (node,)
+        level -= BITS
+    return node
+#-def
+
+def push_tail(count, level, parent, tailnode):
+    """
+    """
+
+    i = ((count - 1) >> level) & MASK
+    if level == BITS:
+        node = tailnode
+    elif i < len(parent):
+        node = push_tail(count, level - BITS, parent[i], tailnode)
+    else:
+        node = new_path(level - BITS, tailnode)
+    if i < len(parent):
+        return parent[:i] + (node,) + parent[i + 1:]
+    return parent + (node,)
+#-def
+
+def assoc_leaf(node, level, i, value):
+    """
+    """
+
+    j = (i >> level) & MASK
+    if level == 0:
+        child = value
+    else:
+        child = assoc_leaf(node[j], level - BITS, i, value)
+    return node[:j] + (child,) + node[j + 1:]
+#-def
+
+class PVector(object):
+    """
+    """
+    __slots__ = [ 'count', 'shift', 'root', 'tail' ]
+
+    def __init__(self, count = 0, shift = BITS, root = (), tail = ()):
+        """
+        """
+
+        self.count = count
+        self.shift = shift
+        self.root = root
+        self.tail = tail
+    #-def
+
+    def __len__(self):
+        """
+        """
+
+        return self.count
+    #-def
+
+    def tailoff(self):
+        """
+        """
+
+        return self.count - len(self.tail)
+    #-def
+
+    def leaf(self, i):
+        """
+        """
+
+        if i >= self.tailoff():
+            return self.tail
+        node, level = self.root, self.shift
+        while level > 0:
+            node = node[(i >> level) & MASK]
+            level -= BITS
+        return node
+    #-def
+
+    def get(self, i):
+        """
+        """
+
+        if not 0 <= i < self.count:
+            raise IndexError("PVector index out of range")
+        return self.leaf(i)[i & MASK]
+    #-def
+
+    def set(self, i, value):
+        """
+        """
+
+        if not 0 <= i < self.count:
+            raise IndexError("PVector index out of range")
+        if i >= self.tailoff():
+            j = i & MASK
+            tail = self.tail[:j] + (value,) + self.tail[j + 1:]
+            return PVector(self.count, self.shift, self.root, tail)
+        return PVector(
+            self.count, self.shift,
+            assoc_leaf(self.root, self.shift, i, value), self.tail
+        )
+    #-def
+
+    def push(self):
+        """
+        """
+
+        count, shift, root = self.count, self.shift, self.root
+        if (count >> BITS) > (1 << shift):
+            root = (root, new_path(shift, self.tail))
+            shift += BITS
+        else:
+            root = push_tail(count, shift, root, self.tail)
+        return PVector(count, shift, root, ())
+    #-def
+
+    def append(self, value):
+        """
+        """
+
+        v = self.push() if len(self.tail) == WIDTH else self
+        return PVector(v.count + 1, v.shift, v.root, v.tail + (value,))
+    #-def
+
+    def extend(self, values):
+        """
+        """
+
+        v, values = self, tuple(values)
+        i, n = 0, len(values)
+        while i < n:
+            if len(v.tail) == WIDTH:
+                v = v.push()
+            chunk = values[i : i + WIDTH - len(v.tail)]
+            v = PVector(v.count + len(chunk), v.shift, v.root, v.tail + chunk)
+            i += len(chunk)
+        return v
+    #-def
+
+    def __iter__(self):
+        """
+        """
+
+        tailoff = self.tailoff()
+        i = 0
+        while i < tailoff:
+            for x in self.leaf(i):
+                yield x
+            i += WIDTH
+        for x in self.tail:
+            yield x
+    #-def
+#-class
+
+class PMapNode(object):
+    """
+    """
+    __slots__ = [ 'bitmap', 'entries' ]
+
+    def __init__(self, bitmap, entries):
+        """
+        """
+
+        self.bitmap = bitmap
+        self.entries = entries
+    #-def
+#-class
+
+class PMapCollision(object):
+    """
+    """
+    __slots__ = [ 'hash', 'entries' ]
+
+    def __init__(self, hash, entries):
+        """
+        """
+
+        self.hash = hash
+        self.entries = entries
+    #-def
+#-class
+
+def hash_of(key):
+    """
+    """
+
+    return hash(key) & HASH_MASK
+#-def
+
+def same_key(a, b):
+    """
+    """
+
+    return a is b or a == b
+#-def
+
+def merge_leaves(e1, h1, e2, h2, shift):
+    """
+    """
+
+    if h1 == h2 or shift >= HASH_BITS:
+        return PMapCollision(h1, (e1, e2))
+    b1, b2 = (h1 >> shift) & MASK, (h2 >> shift) & MASK
+    if b1 == b2:
+        return PMapNode(1 << b1, (merge_leaves(e1, h1, e2, h2, shift + BITS),))
+    return PMapNode(
+        (1 << b1) | (1 << b2), (e1, e2) if b1 < b2 else (e2, e1)
+    )
+#-def
+
+def node_assoc(node, h, shift, key, value):
+    """
+    """
+
+    if isinstance(node, PMapCollision):
+        if h != node.hash:
+            node = PMapNode(1 << ((node.hash >> shift) & MASK), (node,))
+            return node_assoc(node, h, shift, key, value)
+        entries = node.entries
+        for i, e in enumerate(entries):
+            if same_key(e[0], key):
+                entries = entries[:i] + ((key, value),) + entries[i + 1:]
+                return PMapCollision(h, entries), False
+        return PMapCollision(h, entries + ((key, value),)), True
+    bitmap, entries = node.bitmap, node.entries
+    bit = 1 << ((h >> shift) & MASK)
+    i = popcount(bitmap & (bit - 1))
+    if not bitmap & bit:
+        entries = entries[:i] + ((key, value),) + entries[i:]
+        return PMapNode(bitmap | bit, entries), True
+    e = entries[i]
+    if isinstance(e, tuple):
+        if same_key(e[0], key):
+            if e[1] is value:
+                return node, False
+            child, added = (key, value), False
+        else:
+            child = merge_leaves(
+                e, hash_of(e[0]), (key, value), h, shift + BITS
+            )
+            added = True
+    else:
+        child, added = node_assoc(e, h, shift + BITS, key, value)
+        if child is e:
+            return node, False
+    return PMapNode(bitmap, entries[:i] + (child,) + entries[i + 1:]), added
+#-def
+
+def node_dissoc(node, h, shift, key):
+    """
+    """
+
+    if isinstance(node, PMapCollision):
+        entries = tuple(e for e in node.entries if not same_key(e[0], key))
+        if len(entries) == len(node.entries):
+            return node
+        if len(entries) == 1:
+            return entries[0]
+        return PMapCollision(node.hash, entries)
+    bitmap, entries = node.bitmap, node.entries
+    bit = 1 << ((h >> shift) & MASK)
+    if not bitmap & bit:
+        return node
+    i = popcount(bitmap & (bit - 1))
+    e = entries[i]
+    if isinstance(e, tuple):
+        if not same_key(e[0], key):
+            return node
+        child = None
+    else:
+        child = node_dissoc(e, h, shift + BITS, key)
+        if child is e:
+            return node
+        if isinstance(child, PMapNode) and len(child.entries) == 1 \
+        and isinstance(child.entries[0], tuple):
+            child = child.entries[0]
+    if child is not None:
+        return PMapNode(bitmap, entries[:i] + (child,) + entries[i + 1:])
+    if bitmap == bit:
+        return None
+    entries = entries[:i] + entries[i + 1:]
+    if len(entries) == 1 and isinstance(entries[0], tuple):
+        return entries[0]
+    return PMapNode(bitmap & ~bit, entries)
+#-def
+
+def node_items(node):
+    """
+    """
+
+    for e in node.entries:
+        if isinstance(e, tuple):
+            yield e
+        else:
+            for x in node_items(e):
+                yield x
+#-def
+
+class PMap(object):
+    """
+    """
+    __slots__ = [ 'count', 'root' ]
+
+    def __init__(self, count = 0, root = None):
+        """
+        """
+
+        self.count = count
+        self.root = root
+    #-def
+
+    def __len__(self):
+        """
+        """
+
+        return self.count
+    #-def
+
+    def get(self, key, default = None):
+        """
+        """
+
+        node, h, shift = self.root, hash_of(key), 0
+        while node is not None:
+            if isinstance(node, PMapCollision):
+                for k, v in node.entries:
+                    if same_key(k, key):
+                        return v
+                return default
+            bit = 1 << ((h >> shift) & MASK)
+            if not node.bitmap & bit:
+                return default
+            e = node.entries[popcount(node.bitmap & (bit - 1))]
+            if isinstance(e, tuple):
+                return e[1] if same_key(e[0], key) else default
+            node, shift = e, shift + BITS
+        return default
+    #-def
+
+    def set(self, key, value):
+        """
+        """
+
+        root = self.root if self.root is not None else PMapNode(0, ())
+        root, added = node_assoc(root, hash_of(key), 0, key, value)
+        if root is self.root:
+            return self
+        return PMap(self.count + 1 if added else self.count, root)
+    #-def
+
+    def remove(self, key):
+        """
+        """
+
+        if self.root is None:
+            return self
+        h = hash_of(key)
+        root = node_dissoc(self.root, h, 0, key)
+        if root is self.root:
+            return self
+        if isinstance(root, tuple):
+            root = PMapNode(1 << (hash_of(root[0]) & MASK), (root,))
+        return PMap(self.count - 1, root)
+    #-def
+
+    def update(self, items):
+        """
+        """
+
+        m = self
+        for k, v in items:
+            m = m.set(k, v)
+        return m
+    #-def
+
+    def items(self):
+        """
+        """
+
+        if self.root is None:
+            return iter(())
+        return node_items(self.root)
+    #-def
+
+    def keys(self):
+        """
+        """
+
+        return (k for k, _ in self.items())
+    #-def
+
+    def values(self):
+        """
+        """
+
+        return (v for _, v in self.items())
+    #-def
+#-class
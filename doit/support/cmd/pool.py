@@ -0,0 +1,96 @@
+#                                                         -*- coding: utf-8 -*-
+#! \file    ./doit/support/cmd/pool.py
+#! \author  Jiří Kučera, <sanczes@gmail.com>
+#! \stamp   2026-10-18 13:05:21 (UTC+01:00, DST+01:00)
+#! \project DoIt!: Tools and Libraries for Building DSLs
+#! \license MIT
+#! \version 0.0.0
+#! \fdesc   @pyfile.docstr
+#
+"""\
+Command processor pool.\
+"""
+
+__license__ = """\
+Copyright (c) 2014 - 2017 Jiří Kučera.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+IN THE SOFTWARE.\
+"""
+import concurrent.futures
+
+from doit.support.cmd.errors import \
+    CommandProcessorError, \
+    CommandError
+
+from doit.support.cmd.eval import \
+    CommandProcessor
+
+def evaluate(factory, job):
+    """
+    """
+
+    processor = factory()
+    try:
+        processor.run(job)
+    except (CommandProcessorError, CommandError) as e:
+        return (None, e)
+    return (processor.acc(), None)
+#-def
+
+class ProcessorPool(object):
+    """
+    """
+    __slots__ = [ 'factory', 'workers', 'processes' ]
+
+    def __init__(self, factory = CommandProcessor, workers = None,
+        processes = False
+    ):
+        """
+        """
+
+        self.factory = factory
+        self.workers = workers
+        self.processes = processes
+    #-def
+
+    def executor(self):
+        """
+        """
+
+        if self.processes:
+            return concurrent.futures.ProcessPoolExecutor(self.workers)
+        return concurrent.futures.ThreadPoolExecutor(self.workers)
+    #-def
+
+    def submit(self, executor, job):
+        """
+        """
+
+        return executor.submit(evaluate, self.factory, job)
+    #-def
+
+    def map(self, jobs):
+        """
+        """
+
+        with self.executor() as executor:
+            futures = [self.submit(executor, job) for job in jobs]
+            return [f.result() for f in futures]
+    #-def
+#-class
@@ -0,0 +1,229 @@
+#                                                         -*- coding: utf-8 -*-
+#! \file    ./doit/support/cmd/profiler.py
+#! \author  Jiří Kučera, <sanczes@gmail.com>
+#! \stamp   2026-10-18 10:12:44 (UTC+01:00, DST+01:00)
+#! \project DoIt!: Tools and Libraries for Building DSLs
+#! \license MIT
+#! \version 0.0.0
+#! \fdesc   @pyfile.docstr
+#
+"""\
+Command processor profiler.\
+"""
+
+__license__ = """\
+Copyright (c) 2014 - 2017 Jiří Kučera.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+IN THE SOFTWARE.\
+"""
+import time
+import marshal
+
+from doit.support.cmd.runtime import \
+    Location
+
+def frame_of(ctx):
+    """
+    """
+
+    cmd = ctx.cmd
+    f, l, c = cmd.location
+    return (f, l, c, cmd.qname if cmd.isfunc() else cmd.name, cmd.isfunc())
+#-def
+
+def label_of(frame):
+    """
+    """
+
+    f, l, c, name, isproc = frame
+    if isproc:
+        return name
+    return "%s %s" % (name, Location(f, l, c))
+#-def
+
+class Profiler(object):
+    """
+    """
+    __slots__ = [
+        'clock', 'expansions', 'callbacks', 'calls', 'samples', 'stats',
+        '__ctxs', '__keys'
+    ]
+
+    def __init__(self, clock = time.perf_counter):
+        """
+        """
+
+        self.clock = clock
+        self.reset()
+    #-def
+
+    def reset(self):
+        """
+        """
+
+        self.expansions = {}
+        self.callbacks = {}
+        self.calls = {}
+        self.samples = {}
+        self.stats = {}
+        self.__ctxs = []
+        self.__keys = [()]
+    #-def
+
+    def expanded(self, cmd):
+        """
+        """
+
+        c = cmd.__class__
+        self.expansions[c] = self.expansions.get(c, 0) + 1
+    #-def
+
+    def called(self, f):
+        """
+        """
+
+        c = getattr(f, '__self__', f).__class__
+        self.callbacks[c] = self.callbacks.get(c, 0) + 1
+    #-def
+
+    def key(self, stack):
+        """
+        """
+
+        ctxs, keys = self.__ctxs, self.__keys
+        n = len(stack)
+        i = min(n, len(ctxs))
+        while i > 0 and ctxs[i - 1] is not stack[i - 1]:
+            i -= 1
+        if i == n == len(ctxs):
+            return keys[n]
+        del ctxs[i:]
+        del keys[i + 1:]
+        calls = self.calls
+        while i < n:
+            ctx = stack[i]
+            key = keys[i]
+            frame = frame_of(ctx)
+            edge = (key[-1] if key else None, frame)
+            calls[edge] = calls.get(edge, 0) + 1
+            ctxs.append(ctx)
+            keys.append(key + (frame,))
+            i += 1
+        return keys[n]
+    #-def
+
+    def account(self, key, t):
+        """
+        """
+
+        self.samples[key] = self.samples.get(key, 0.0) + t
+    #-def
+
+    def aggregate(self, keyof):
+        """
+        """
+
+        table = {}
+        for stack, t in self.samples.items():
+            keys = [k for k in map(keyof, stack) if k is not None]
+            for k in set(keys):
+                table.setdefault(k, [0.0, 0.0])[0] += t
+            if keys:
+                table[keys[-1]][1] += t
+        return dict((k, tuple(v)) for k, v in table.items())
+    #-def
+
+    def locations(self):
+        """
+        """
+
+        return self.aggregate(
+            lambda f: None if f[4] else Location(f[0], f[1], f[2])
+        )
+    #-def
+
+    def procedures(self):
+        """
+        """
+
+        return self.aggregate(lambda f: f[3] if f[4] else None)
+    #-def
+
+    def collapsed(self, root = "<main>", scale = 1000000):
+        """
+        """
+
+        lines = []
+        for stack, t in self.samples.items():
+            n = int(round(t * scale))
+            if n > 0:
+                lines.append("%s %d" % (
+                    ";".join([root] + [label_of(f) for f in stack]), n
+                ))
+        lines.sort()
+        return lines
+    #-def
+
+    def create_stats(self):
+        """
+        """
+
+        def fkey(frame):
+            f, l, c, name, isproc = frame
+            return (f if f is not None else "~", max(l, 0), label_of(frame))
+
+        totals, edges = {}, {}
+        for stack, t in self.samples.items():
+            seen = set()
+            n = len(stack)
+            for i, frame in enumerate(stack):
+                edge = (stack[i - 1] if i > 0 else None, frame)
+                for table, k in ((totals, frame), (edges, edge)):
+                    r = table.setdefault(k, [0.0, 0.0])
+                    if i == n - 1:
+                        r[0] += t
+                    if k not in (stack[:i] if k is frame else seen):
+                        r[1] += t
+                seen.add(edge)
+        stats = {}
+        for frame, (tt, ct) in totals.items():
+            s = stats.setdefault(fkey(frame), [0, 0, 0.0, 0.0, {}])
+            s[2] += tt
+            s[3] += ct
+        for edge, n in self.calls.items():
+            caller, frame = edge
+            tt, ct = edges.get(edge, (0.0, 0.0))
+            s = stats.setdefault(fkey(frame), [0, 0, 0.0, 0.0, {}])
+            s[0] += n
+            s[1] += n
+            if caller is not None:
+                cc, nc, ctt, cct = s[4].get(fkey(caller), (0, 0, 0.0, 0.0))
+                s[4][fkey(caller)] = (cc + n, nc + n, ctt + tt, cct + ct)
+        self.stats = dict((k, tuple(v)) for k, v in stats.items())
+    #-def
+
+    def dump_stats(self, file):
+        """
+        """
+
+        self.create_stats()
+        with open(file, 'wb') as f:
+            marshal.dump(self.stats, f)
+    #-def
+#-class
@@ -33,11 +33,21 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 IN THE SOFTWARE.\
 """
 
-from doit.support.utils import deep_eq
+import itertools
+
+from doit.support.utils import \
+    deep_eq, \
+    Structural
 
 from doit.support.cmd.errors import \
     CommandError
 
+from doit.support.cmd.persistent import \
+    PVector, \
+    PMap
+
+_missing = object()
+
 def isderived(exc, base):
     """
     """
@@ -63,6 +73,13 @@ class Location(tuple):
         return super(Location, cls).__new__(cls, (file, line, column))
     #-def
 
+    def __getnewargs__(self):
+        """
+        """
+
+        return tuple(self)
+    #-def
+
     def __init__(self, file = None, line = -1, column = -1):
         """
         """
@@ -102,9 +119,54 @@ class Location(tuple):
     #-def
 #-class
 
-class Evaluable(object):
+class QName(object):
+    """
+    """
+    __slots__ = [ 'parent', 'name', '__str', '__children' ]
+
+    def __init__(self, parent, name):
+        """
+        """
+
+        self.parent = parent
+        self.name = name
+        self.__str = None
+        self.__children = {}
+    #-def
+
+    def child(self, name):
+        """
+        """
+
+        q = self.__children.get(name)
+        if q is None:
+            q = self.__children[name] = QName(self, name)
+        return q
+    #-def
+
+    def __str__(self):
+        """
+        """
+
+        if self.__str is not None:
+            return self.__str
+        path, q = [], self
+        while q is not None and q.__str is None:
+            path.append(q)
+            q = q.parent
+        s = q.__str if q is not None else None
+        while path:
+            q = path.pop()
+            s = q.name if s is None else "%s::%s" % (s, q.name)
+            q.__str = s
+        return s
+    #-def
+#-class
+
+class Evaluable(Structural):
     """
     """
+    FIELDS = [ 'location', 'properties' ]
 
     def __init__(self):
         """
@@ -169,23 +231,24 @@ class BaseIterator(object):
 class FiniteIterator(BaseIterator):
     """
     """
-    __slots__ = [ '__items', '__nitems', '__idx' ]
+    __slots__ = [ '__items', '__nitems', '__start', '__idx' ]
 
-    def __init__(self, items):
+    def __init__(self, items, start = 0, stop = None):
         """
         """
 
         BaseIterator.__init__(self)
         self.__items = items
-        self.__nitems = len(items)
-        self.__idx = 0
+        self.__nitems = len(items) if stop is None else stop
+        self.__start = start
+        self.__idx = start
     #-def
 
     def reset(self):
         """
         """
 
-        self.__idx = 0
+        self.__idx = self.__start
     #-def
 
     def next(self):
@@ -232,6 +295,13 @@ class Pair(tuple, Iterable):
         return super(Pair, cls).__new__(cls, (a, b))
     #-def
 
+    def __getnewargs__(self):
+        """
+        """
+
+        return tuple(self)
+    #-def
+
     def __init__(self, a, b):
         """
         """
@@ -273,10 +343,16 @@ class List(list, Iterable):
         """
         """
 
-        r = List([])
+        r, seen = List([]), set()
         for x in l:
-            if x not in r:
-                r.append(x)
+            try:
+                if x in seen:
+                    continue
+                seen.add(x)
+            except TypeError:
+                if x in r:
+                    continue
+            r.append(x)
         return r
     #-def
 #-class
@@ -312,24 +388,74 @@ class HashMap(dict, Iterable):
     #-def
 #-class
 
-class UserType(Evaluable):
+class Set(frozenset, Iterable):
     """
     """
     __slots__ = []
 
-    def __init__(self):
+    def __new__(cls, data = ()):
         """
         """
 
-        Evaluable.__init__(self)
+        return super(Set, cls).__new__(cls, data)
+    #-def
+
+    def __getnewargs__(self):
+        """
+        """
+
+        return (frozenset(self),)
+    #-def
+
+    def __init__(self, data = ()):
+        """
+        """
+
+        frozenset.__init__(self)
+        Iterable.__init__(self)
+    #-def
+
+    def iterator(self):
+        """
+        """
+
+        return FiniteIterator(list(self))
+    #-def
+#-class
+
+class PersistentList(Iterable):
+    """
+    """
+    __slots__ = [ '__vec' ]
+
+    def __init__(self, data = ()):
+        """
+        """
+
+        Iterable.__init__(self)
+        if isinstance(data, PersistentList):
+            self.__vec = data.__vec
+        elif isinstance(data, PVector):
+            self.__vec = data
+        else:
+            self.__vec = PVector().extend(data)
+    #-def
+
+    def __hash__(self):
+        """
+        """
+
+        raise TypeError("unhashable type: '%s'" % self.__class__.__name__)
     #-def
 
     def __eq__(self, other):
         """
         """
 
-        return isinstance(other, self.__class__) \
-        and Evaluable.__eq__(self, other)
+        if not isinstance(other, (list, PersistentList)) \
+        or len(self) != len(other):
+            return False
+        return all(deep_eq(x, y) for x, y in zip(self, other))
     #-def
 
     def __ne__(self, other):
@@ -339,157 +465,1128 @@ class UserType(Evaluable):
         return not self.__eq__(other)
     #-def
 
-    def to_bool(self, processor):
+    def __repr__(self):
         """
         """
 
-        return True
+        return "%s(%r)" % (self.__class__.__name__, list(self))
     #-def
 
-    def to_int(self, processor):
+    def __len__(self):
         """
         """
 
-        raise CommandError(processor.TypeError,
-            "%s is not convertible to integer" % self.__class__.__name__,
-            processor.traceback()
-        )
+        return len(self.__vec)
     #-def
 
-    def to_float(self, processor):
+    def __iter__(self):
         """
         """
 
-        raise CommandError(processor.TypeError,
-            "%s is not convertible to float" % self.__class__.__name__,
-            processor.traceback()
-        )
+        return iter(self.__vec)
     #-def
 
-    def to_str(self, processor):
+    def __contains__(self, x):
         """
         """
 
-        raise CommandError(processor.TypeError,
-            "%s is not convertible to string" % self.__class__.__name__,
-            processor.traceback()
-        )
+        return any(y is x or y == x for y in self.__vec)
     #-def
 
-    def to_pair(self, processor):
+    def index_of(self, i):
         """
         """
 
-        raise CommandError(processor.TypeError,
-            "%s is not convertible to pair" % self.__class__.__name__,
-            processor.traceback()
-        )
+        n = len(self.__vec)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("PersistentList index out of range")
+        return i
     #-def
 
-    def to_list(self, processor):
+    def __getitem__(self, i):
         """
         """
 
-        raise CommandError(processor.TypeError,
-            "%s is not convertible to list" % self.__class__.__name__,
-            processor.traceback()
-        )
+        if isinstance(i, slice):
+            vec = self.__vec
+            return PersistentList(
+                vec.get(j) for j in range(*i.indices(len(vec)))
+            )
+        return self.__vec.get(self.index_of(i))
     #-def
 
-    def to_hash(self, processor):
+    def __setitem__(self, i, x):
         """
         """
 
-        raise CommandError(processor.TypeError,
-            "%s is not convertible to hash" % self.__class__.__name__,
-            processor.traceback()
-        )
+        self.__vec = self.__vec.set(self.index_of(i), x)
     #-def
 
-    def do_visit(self, processor, f, *args):
+    def __delitem__(self, i):
         """
         """
 
-        raise CommandError(processor.TypeError,
-            "%s is not visitable" % self.__class__.__name__,
-            processor.traceback()
+        i = self.index_of(i)
+        items = list(self.__vec)
+        del items[i]
+        self.__vec = PVector().extend(items)
+    #-def
+
+    def __add__(self, other):
+        """
+        """
+
+        return PersistentList(self.__vec.extend(other))
+    #-def
+
+    def updated(self, i, x):
+        """
+        """
+
+        return PersistentList(self.__vec.set(self.index_of(i), x))
+    #-def
+
+    def appended(self, x):
+        """
+        """
+
+        return PersistentList(self.__vec.append(x))
+    #-def
+
+    def append(self, x):
+        """
+        """
+
+        self.__vec = self.__vec.append(x)
+    #-def
+
+    def extend(self, xs):
+        """
+        """
+
+        self.__vec = self.__vec.extend(xs)
+    #-def
+
+    def insert(self, i, x):
+        """
+        """
+
+        if i >= len(self.__vec):
+            self.append(x)
+            return
+        items = list(self.__vec)
+        items.insert(i, x)
+        self.__vec = PVector().extend(items)
+    #-def
+
+    def index(self, x):
+        """
+        """
+
+        for i, y in enumerate(self.__vec):
+            if y is x or y == x:
+                return i
+        raise ValueError("%r is not in list" % (x,))
+    #-def
+
+    def remove(self, x):
+        """
+        """
+
+        del self[self.index(x)]
+    #-def
+
+    def count(self, x):
+        """
+        """
+
+        return sum(1 for y in self.__vec if y is x or y == x)
+    #-def
+
+    def sort(self, key = None, reverse = False):
+        """
+        """
+
+        self.__vec = PVector().extend(
+            sorted(self.__vec, key = key, reverse = reverse)
         )
     #-def
+
+    def reverse(self):
+        """
+        """
+
+        self.__vec = PVector().extend(reversed(list(self.__vec)))
+    #-def
+
+    def iterator(self):
+        """
+        """
+
+        return StreamIterator(self.__vec)
+    #-def
 #-class
 
-class ExceptionClass(object):
+class PersistentHashMap(Iterable):
     """
     """
-    __slots__ = [ '__name', 'qname', '__base' ]
+    __slots__ = [ '__map' ]
 
-    def __init__(self, name, qname, base):
+    def __init__(self, data = {}):
         """
         """
 
-        self.__name = name
-        self.qname = qname
-        self.__base = base
+        Iterable.__init__(self)
+        if isinstance(data, PersistentHashMap):
+            self.__map = data.__map
+        elif isinstance(data, PMap):
+            self.__map = data
+        elif hasattr(data, 'keys'):
+            self.__map = PMap().update((k, data[k]) for k in data.keys())
+        else:
+            self.__map = PMap().update(data)
     #-def
 
-    def __str__(self):
+    def __hash__(self):
         """
         """
 
-        return self.__name
+        raise TypeError("unhashable type: '%s'" % self.__class__.__name__)
     #-def
 
-    def base(self):
+    def __eq__(self, other):
         """
         """
 
-        return self.__base
+        if not isinstance(other, (dict, PersistentHashMap)) \
+        or len(self) != len(other):
+            return False
+        for k, v in self.items():
+            if k not in other or not deep_eq(v, other[k]):
+                return False
+        return True
     #-def
-#-class
 
-class Traceback(list):
-    """
-    """
-    __slots__ = [ '__punctator' ]
+    def __ne__(self, other):
+        """
+        """
 
-    def __init__(self, stack):
+        return not self.__eq__(other)
+    #-def
+
+    def __repr__(self):
         """
         """
 
-        list.__init__(self, [ctx.cmd for ctx in stack if ctx.cmd.isfunc()])
-        self.__punctator = ">"
-        if stack:
-            f, l, c = stack[-1].cmd.location
-            if f is not None and l >= 0 and c >= 0:
-                self.__punctator += " At [\"%s\":%d:%d]:" % (f, l, c)
+        return "%s(%r)" % (self.__class__.__name__, dict(self.items()))
     #-def
 
-    def __str__(self):
+    def __len__(self):
         """
         """
 
-        if len(self) == 0:
-            self.append("<main>")
-        s = "In %s" % self[0]
-        i = 1
-        while i < len(self):
-            s += "\n| from %s" % self[i]
-            i += 1
-        return "%s:\n%s" % (s, self.__punctator)
+        return len(self.__map)
     #-def
-#-class
 
-class Procedure(tuple):
-    """
-    """
-    __slots__ = []
+    def __iter__(self):
+        """
+        """
 
-    def __new__(cls, name, qname, bvars, params, vararg, body, outer):
+        return self.__map.keys()
+    #-def
+
+    def __contains__(self, key):
         """
         """
 
-        return super(Procedure, cls).__new__(
-            cls, (name, qname, bvars, params, vararg, body, outer)
-        )
+        return self.__map.get(key, _missing) is not _missing
+    #-def
+
+    def __getitem__(self, key):
+        """
+        """
+
+        v = self.__map.get(key, _missing)
+        if v is _missing:
+            raise KeyError(key)
+        return v
+    #-def
+
+    def get(self, key, default = None):
+        """
+        """
+
+        return self.__map.get(key, default)
+    #-def
+
+    def __setitem__(self, key, value):
+        """
+        """
+
+        self.__map = self.__map.set(key, value)
+    #-def
+
+    def __delitem__(self, key):
+        """
+        """
+
+        m = self.__map.remove(key)
+        if m is self.__map:
+            raise KeyError(key)
+        self.__map = m
+    #-def
+
+    def keys(self):
+        """
+        """
+
+        return self.__map.keys()
+    #-def
+
+    def values(self):
+        """
+        """
+
+        return self.__map.values()
+    #-def
+
+    def items(self):
+        """
+        """
+
+        return self.__map.items()
+    #-def
+
+    def update(self, other):
+        """
+        """
+
+        self.__map = PersistentHashMap.merge(self, other).__map
+    #-def
+
+    def updated(self, key, value):
+        """
+        """
+
+        return PersistentHashMap(self.__map.set(key, value))
+    #-def
+
+    def removed(self, key):
+        """
+        """
+
+        return PersistentHashMap(self.__map.remove(key))
+    #-def
+
+    def iterator(self):
+        """
+        """
+
+        return StreamIterator(self.__map.keys)
+    #-def
+
+    @staticmethod
+    def merge(d1, d2):
+        """
+        """
+
+        r = PersistentHashMap(d1)
+        if hasattr(d2, 'keys'):
+            r.__map = r.__map.update((k, d2[k]) for k in d2.keys())
+        else:
+            r.__map = r.__map.update(d2)
+        return r
+    #-def
+#-class
+
+class RangeIterator(BaseIterator):
+    """
+    """
+    __slots__ = [ '__start', '__stop', '__step', '__cur' ]
+
+    def __init__(self, start, stop, step):
+        """
+        """
+
+        BaseIterator.__init__(self)
+        self.__start = start
+        self.__stop = stop
+        self.__step = step
+        self.__cur = start
+    #-def
+
+    def reset(self):
+        """
+        """
+
+        self.__cur = self.__start
+    #-def
+
+    def next(self):
+        """
+        """
+
+        x = self.__cur
+        if (self.__step > 0 and x < self.__stop) \
+        or (self.__step < 0 and x > self.__stop):
+            self.__cur = x + self.__step
+            return x
+        return self
+    #-def
+#-class
+
+class StreamIterator(BaseIterator):
+    """
+    """
+    __slots__ = [ '__source', '__it', '__processor', '__name' ]
+
+    def __init__(self, source):
+        """
+        """
+
+        BaseIterator.__init__(self)
+        self.__source = source
+        self.__it = None
+        self.__processor = None
+        self.__name = None
+    #-def
+
+    def guard(self, processor, name):
+        """
+        """
+
+        self.__processor = processor
+        self.__name = name
+    #-def
+
+    def reset(self):
+        """
+        """
+
+        source = self.__source
+        try:
+            self.__it = iter(source() if callable(source) else source)
+        except CommandError:
+            raise
+        except Exception:
+            self.failure()
+    #-def
+
+    def next(self):
+        """
+        """
+
+        if self.__it is None:
+            self.reset()
+        try:
+            return next(self.__it, self)
+        except CommandError:
+            raise
+        except Exception:
+            self.failure()
+    #-def
+
+    def failure(self):
+        """
+        """
+
+        # Errors raised by the source are turned into errors the script
+        # can handle when this iterator is driven by a command processor:
+        processor = self.__processor
+        if processor is None:
+            raise
+        raise CommandError(processor.TypeError,
+            "%s: Iteration has failed" % self.__name,
+            processor.traceback()
+        )
+    #-def
+#-class
+
+class LazyIterable(Iterable):
+    """
+    """
+    __slots__ = []
+
+    def __init__(self):
+        """
+        """
+
+        Iterable.__init__(self)
+    #-def
+
+    def check(self, processor):
+        """
+        """
+
+        pass
+    #-def
+
+    def __iter__(self):
+        """
+        """
+
+        it = self.iterator()
+        it.reset()
+        x = it.next()
+        while x is not it:
+            yield x
+            x = it.next()
+    #-def
+#-class
+
+class Range(LazyIterable):
+    """
+    """
+    __slots__ = [ 'start', 'stop', 'step' ]
+
+    def __init__(self, start, stop = None, step = 1):
+        """
+        """
+
+        LazyIterable.__init__(self)
+        if stop is None:
+            start, stop = 0, start
+        self.start = start
+        self.stop = stop
+        self.step = step
+    #-def
+
+    def __eq__(self, other):
+        """
+        """
+
+        return isinstance(other, self.__class__) \
+        and LazyIterable.__eq__(self, other) \
+        and self.start == other.start \
+        and self.stop == other.stop \
+        and self.step == other.step
+    #-def
+
+    def __ne__(self, other):
+        """
+        """
+
+        return not self.__eq__(other)
+    #-def
+
+    def __len__(self):
+        """
+        """
+
+        return len(range(self.start, self.stop, self.step))
+    #-def
+
+    def check(self, processor):
+        """
+        """
+
+        if self.step == 0:
+            raise CommandError(processor.ValueError,
+                "Range step must not be zero",
+                processor.traceback()
+            )
+    #-def
+
+    def iterator(self):
+        """
+        """
+
+        if self.step == 0:
+            raise ValueError("Range step must not be zero")
+        return RangeIterator(self.start, self.stop, self.step)
+    #-def
+#-class
+
+class StrView(LazyIterable):
+    """
+    """
+    __slots__ = [ 'string', 'start', 'stop' ]
+
+    def __init__(self, string, start = 0, stop = None):
+        """
+        """
+
+        LazyIterable.__init__(self)
+        self.string = string
+        self.start, self.stop, _ = slice(start, stop).indices(len(string))
+        self.stop = max(self.start, self.stop)
+    #-def
+
+    def __eq__(self, other):
+        """
+        """
+
+        return isinstance(other, self.__class__) \
+        and LazyIterable.__eq__(self, other) \
+        and str(self) == str(other)
+    #-def
+
+    def __ne__(self, other):
+        """
+        """
+
+        return not self.__eq__(other)
+    #-def
+
+    def __len__(self):
+        """
+        """
+
+        return self.stop - self.start
+    #-def
+
+    def __str__(self):
+        """
+        """
+
+        return self.string[self.start:self.stop]
+    #-def
+
+    def iterator(self):
+        """
+        """
+
+        return FiniteIterator(self.string, self.start, self.stop)
+    #-def
+#-class
+
+class HashMapView(LazyIterable):
+    """
+    """
+    KEYS = 0
+    VALUES = 1
+    ITEMS = 2
+    __slots__ = [ 'hashmap', 'kind' ]
+
+    def __init__(self, hashmap, kind = KEYS):
+        """
+        """
+
+        LazyIterable.__init__(self)
+        self.hashmap = hashmap
+        self.kind = kind
+    #-def
+
+    def __eq__(self, other):
+        """
+        """
+
+        return isinstance(other, self.__class__) \
+        and LazyIterable.__eq__(self, other) \
+        and self.kind == other.kind \
+        and deep_eq(self.hashmap, other.hashmap)
+    #-def
+
+    def __ne__(self, other):
+        """
+        """
+
+        return not self.__eq__(other)
+    #-def
+
+    def __len__(self):
+        """
+        """
+
+        return len(self.hashmap)
+    #-def
+
+    def iterator(self):
+        """
+        """
+
+        return StreamIterator(self.items)
+    #-def
+
+    def items(self):
+        """
+        """
+
+        if self.kind == self.KEYS:
+            return iter(self.hashmap.keys())
+        elif self.kind == self.VALUES:
+            return iter(self.hashmap.values())
+        return (Pair(k, v) for k, v in self.hashmap.items())
+    #-def
+#-class
+
+class Stream(LazyIterable):
+    """
+    """
+    __slots__ = [ 'source' ]
+
+    def __init__(self, source):
+        """
+        """
+
+        LazyIterable.__init__(self)
+        self.source = source
+    #-def
+
+    def __eq__(self, other):
+        """
+        """
+
+        return isinstance(other, self.__class__) \
+        and LazyIterable.__eq__(self, other) \
+        and self.source is other.source
+    #-def
+
+    def __ne__(self, other):
+        """
+        """
+
+        return not self.__eq__(other)
+    #-def
+
+    def iterator(self):
+        """
+        """
+
+        return StreamIterator(self.source)
+    #-def
+#-class
+
+class Rope(LazyIterable):
+    """
+    """
+    __slots__ = [ '__chunks', '__count', '__size', '__text' ]
+
+    def __init__(self, *parts):
+        """
+        """
+
+        LazyIterable.__init__(self)
+        self.__chunks = [x for x in parts if len(x) > 0]
+        self.__count = len(self.__chunks)
+        self.__size = sum(len(x) for x in self.__chunks)
+        self.__text = None
+    #-def
+
+    def __eq__(self, other):
+        """
+        """
+
+        return isinstance(other, self.__class__) \
+        and LazyIterable.__eq__(self, other) \
+        and str(self) == str(other)
+    #-def
+
+    def __ne__(self, other):
+        """
+        """
+
+        return not self.__eq__(other)
+    #-def
+
+    def __hash__(self):
+        """
+        """
+
+        return hash(str(self))
+    #-def
+
+    def __reduce__(self):
+        """
+        """
+
+        return (self.__class__, (str(self),))
+    #-def
+
+    def __len__(self):
+        """
+        """
+
+        return self.__size
+    #-def
+
+    def __str__(self):
+        """
+        """
+
+        if self.__text is None:
+            self.__text = "".join(self.chunks())
+        return self.__text
+    #-def
+
+    def concat(self, part):
+        """
+        """
+
+        if len(part) == 0:
+            return self
+        chunks, n = self.__chunks, self.__count
+        r = Rope()
+        r.__count = n + 1
+        r.__size = self.__size + len(part)
+        # Share the chunk list when this rope is its longest user. The
+        # identity test detects a concurrent append that came first.
+        if len(chunks) == n:
+            chunks.append(part)
+            if chunks[n] is part:
+                r.__chunks = chunks
+                return r
+        r.__chunks = chunks[:n] + [part]
+        return r
+    #-def
+
+    def chunks(self):
+        """
+        """
+
+        if self.__text is not None:
+            yield self.__text
+            return
+        stack = [itertools.islice(self.__chunks, self.__count)]
+        while stack:
+            for part in stack[-1]:
+                if not isinstance(part, Rope):
+                    yield part
+                elif part.__text is not None:
+                    yield part.__text
+                else:
+                    stack.append(
+                        itertools.islice(part.__chunks, part.__count)
+                    )
+                    break
+            else:
+                stack.pop()
+    #-def
+
+    def write_to(self, stream):
+        """
+        """
+
+        write = getattr(stream, 'raw_write', None) or stream.write
+        for chunk in self.chunks():
+            write(chunk)
+    #-def
+
+    def iterator(self):
+        """
+        """
+
+        return StreamIterator(
+            lambda: (c for chunk in self.chunks() for c in chunk)
+        )
+    #-def
+#-class
+
+def iterator_of(x):
+    """
+    """
+
+    if isinstance(x, str):
+        return FiniteIterator(x)
+    return x.iterator()
+#-def
+
+class UserType(Evaluable):
+    """
+    """
+    __slots__ = []
+
+    def __init__(self):
+        """
+        """
+
+        Evaluable.__init__(self)
+    #-def
+
+    def __eq__(self, other):
+        """
+        """
+
+        return isinstance(other, self.__class__) \
+        and Evaluable.__eq__(self, other)
+    #-def
+
+    def __ne__(self, other):
+        """
+        """
+
+        return not self.__eq__(other)
+    #-def
+
+    def to_bool(self, processor):
+        """
+        """
+
+        return True
+    #-def
+
+    def to_int(self, processor):
+        """
+        """
+
+        raise CommandError(processor.TypeError,
+            "%s is not convertible to integer" % self.__class__.__name__,
+            processor.traceback()
+        )
+    #-def
+
+    def to_float(self, processor):
+        """
+        """
+
+        raise CommandError(processor.TypeError,
+            "%s is not convertible to float" % self.__class__.__name__,
+            processor.traceback()
+        )
+    #-def
+
+    def to_str(self, processor):
+        """
+        """
+
+        raise CommandError(processor.TypeError,
+            "%s is not convertible to string" % self.__class__.__name__,
+            processor.traceback()
+        )
+    #-def
+
+    def to_pair(self, processor):
+        """
+        """
+
+        raise CommandError(processor.TypeError,
+            "%s is not convertible to pair" % self.__class__.__name__,
+            processor.traceback()
+        )
+    #-def
+
+    def to_list(self, processor):
+        """
+        """
+
+        raise CommandError(processor.TypeError,
+            "%s is not convertible to list" % self.__class__.__name__,
+            processor.traceback()
+        )
+    #-def
+
+    def to_hash(self, processor):
+        """
+        """
+
+        raise CommandError(processor.TypeError,
+            "%s is not convertible to hash" % self.__class__.__name__,
+            processor.traceback()
+        )
+    #-def
+
+    def do_visit(self, processor, f, *args):
+        """
+        """
+
+        raise CommandError(processor.TypeError,
+            "%s is not visitable" % self.__class__.__name__,
+            processor.traceback()
+        )
+    #-def
+#-class
+
+class ExceptionClass(object):
+    """
+    """
+    __slots__ = [ '__name', 'qname', '__base' ]
+
+    def __init__(self, name, qname, base):
+        """
+        """
+
+        self.__name = name
+        self.qname = qname
+        self.__base = base
+    #-def
+
+    def __str__(self):
+        """
+        """
+
+        return self.__name
+    #-def
+
+    def base(self):
+        """
+        """
+
+        return self.__base
+    #-def
+#-class
+
+class Traceback(object):
+    """
+    """
+    __slots__ = [ '__chain', '__frames', '__location', '__punctator' ]
+
+    def __init__(self, stack):
+        """
+        """
+
+        # `stack` is either a list of command contexts or a context chain
+        # as kept by the processor, i.e. None or a `(ctx, outer_chain)`
+        # pair. A chain is immutable, so it is shared rather than copied
+        # and frames are picked out from it on the first inspection.
+        if isinstance(stack, list):
+            chain = None
+            for ctx in stack:
+                chain = (ctx, chain)
+            stack = chain
+        self.__chain = stack
+        self.__frames = None
+        self.__location = None
+        self.__punctator = None
+        if stack is not None:
+            top = stack[0]
+            self.__location = top.location() if hasattr(top, 'location') \
+                else top.cmd.location
+    #-def
+
+    def frames(self):
+        """
+        """
+
+        if self.__frames is None:
+            frames = []
+            chain, self.__chain = self.__chain, None
+            while chain is not None:
+                ctx, chain = chain
+                if ctx.cmd.isfunc():
+                    frames.append(ctx.cmd)
+            frames.reverse()
+            self.__frames = frames
+        return self.__frames
+    #-def
+
+    def punctator(self):
+        """
+        """
+
+        if self.__punctator is None:
+            self.__punctator = ">"
+            if self.__location is not None:
+                f, l, c = self.__location
+                if f is not None and l >= 0 and c >= 0:
+                    self.__punctator += " At [\"%s\":%d:%d]:" % (f, l, c)
+        return self.__punctator
+    #-def
+
+    def __len__(self):
+        """
+        """
+
+        return len(self.frames())
+    #-def
+
+    def __iter__(self):
+        """
+        """
+
+        return iter(self.frames())
+    #-def
+
+    def __getitem__(self, i):
+        """
+        """
+
+        return self.frames()[i]
+    #-def
+
+    def __contains__(self, x):
+        """
+        """
+
+        return x in self.frames()
+    #-def
+
+    def __eq__(self, other):
+        """
+        """
+
+        if isinstance(other, Traceback):
+            other = other.frames()
+        return self.frames() == other
+    #-def
+
+    def __ne__(self, other):
+        """
+        """
+
+        return not self.__eq__(other)
+    #-def
+
+    __hash__ = None
+
+    def append(self, x):
+        """
+        """
+
+        self.frames().append(x)
+    #-def
+
+    def extend(self, xs):
+        """
+        """
+
+        self.frames().extend(xs)
+    #-def
+
+    def __reduce__(self):
+        """
+        """
+
+        return (
+            self.__class__, ([],), (None, {
+                '_Traceback__frames': [str(x) for x in self],
+                '_Traceback__punctator': self.punctator()
+            })
+        )
+    #-def
+
+    def __repr__(self):
+        """
+        """
+
+        return repr(self.frames())
+    #-def
+
+    def __str__(self):
+        """
+        """
+
+        if len(self) == 0:
+            self.append("<main>")
+        s = "In %s" % self[0]
+        i = 1
+        while i < len(self):
+            s += "\n| from %s" % self[i]
+            i += 1
+        return "%s:\n%s" % (s, self.punctator())
+    #-def
+#-class
+
+class Procedure(tuple):
+    """
+    """
+    __slots__ = []
+
+    def __new__(cls, name, qname, bvars, params, vararg, body, outer):
+        """
+        """
+
+        return super(Procedure, cls).__new__(
+            cls, (name, qname, bvars, params, vararg, body, outer)
+        )
+    #-def
+
+    def __getnewargs__(self):
+        """
+        """
+
+        return tuple(self)
     #-def
 
     def __init__(self, name, qname, bvars, params, vararg, body, outer):
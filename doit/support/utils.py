@@ -87,6 +87,11 @@ def deep_eq(x, y):
             if not deep_eq(x[k], y[k]):
                 return False
         return True
+    hx = getattr(x, 'hash_', None)
+    if hx is not None:
+        hy = getattr(y, 'hash_', None)
+        if hy is not None and hx != hy:
+            return False
     return x == y
 #-def
 
@@ -139,7 +144,249 @@ def timestamp():
     return stamp
 #-def
 
-class Functor(object):
+def _mangle(cls, name):
+    """Returns the attribute name under which `name` declared inside `cls`
+    is stored.
+
+    :param type cls: A class that declares `name`.
+    :param str name: A name of slot or attribute.
+
+    :returns: `name` mangled by the rules for private names (:class:`str`).
+    """
+
+    if name.startswith('__') and not name.endswith('__'):
+        return "_%s%s" % (cls.__name__.lstrip('_'), name)
+    return name
+#-def
+
+_structural_fields = {}
+
+def structural_fields(cls):
+    """Returns the names of attributes which take a part in the structural
+    comparison of `cls` instances.
+
+    :param type cls: A class derived from :class:`Structural \
+        <doit.support.utils.Structural>`.
+
+    :returns: Attribute names (:class:`tuple` of :class:`str`).
+
+    The fields are the slots and the names listed in `FIELDS` of every class
+    in the `cls` method resolution order that defines its own ``__eq__``.
+    Names listed in `NONSTRUCTURAL` are left out, as is the cached hash.
+    """
+
+    fields = _structural_fields.get(cls)
+    if fields is not None:
+        return fields
+    names, skip = [], set(['hash_'])
+    for c in cls.__mro__:
+        for name in c.__dict__.get('NONSTRUCTURAL', []):
+            skip.add(_mangle(c, name))
+        if '__eq__' not in c.__dict__:
+            continue
+        for name in c.__dict__.get('__slots__', []) \
+        + c.__dict__.get('FIELDS', []):
+            name = _mangle(c, name)
+            if name not in names:
+                names.append(name)
+    fields = tuple(name for name in names if name not in skip)
+    _structural_fields[cls] = fields
+    return fields
+#-def
+
+_missing = object()
+
+def structural_hash(x, path = None):
+    """Computes the structural hash of `x`.
+
+    :param object x: An object.
+    :param set path: Identities of containers that are being hashed.
+
+    :returns: The hash of `x` (:class:`int`).
+
+    Sequences and mappings are hashed element-wise in the way
+    :func:`deep_eq <doit.support.utils.deep_eq>` compares them, instances of
+    :class:`Structural <doit.support.utils.Structural>` are hashed by their
+    :func:`structural_fields <doit.support.utils.structural_fields>`. Other
+    objects use their own hash, if they have one.
+    """
+
+    if isinstance(x, (tuple, list, dict)):
+        if path is None:
+            path = set()
+        if id(x) in path:
+            return 0
+        path.add(id(x))
+        if isinstance(x, dict):
+            h = hash(frozenset(
+                (k, structural_hash(v, path)) for k, v in x.items()
+            ))
+        else:
+            h = hash(tuple(structural_hash(y, path) for y in x))
+        path.discard(id(x))
+        return h
+    if isinstance(x, Structural):
+        h = getattr(x, 'hash_', None)
+        if h is not None:
+            return h
+        if type(x).__eq__ is object.__eq__:
+            return object.__hash__(x)
+        return hash((x.__class__, tuple(
+            structural_hash(getattr(x, f, _missing), path)
+            for f in structural_fields(x.__class__)
+        )))
+    try:
+        return hash(x)
+    except TypeError:
+        return 0
+#-def
+
+class Structural(object):
+    """Base class for objects that are compared by their structure.
+
+    :cvar FIELDS: Names of structural attributes that are not slots.
+    :vartype FIELDS: list
+    :cvar NONSTRUCTURAL: Names of slots that are not compared.
+    :vartype NONSTRUCTURAL: list
+    :ivar hash_: Cached structural hash; set when the object is interned.
+    :vartype hash_: int
+
+    Only interned instances are hashable; their hash is the
+    :func:`structural_hash <doit.support.utils.structural_hash>` frozen by
+    :meth:`HashConsTable.intern <doit.support.utils.HashConsTable.intern>`.
+    Hashing an instance that is not interned raises :exc:`TypeError`, as it
+    does for any other object with ``__eq__`` and without ``__hash__``.
+    """
+    __slots__ = []
+    FIELDS = []
+    NONSTRUCTURAL = []
+    hash_ = None
+
+    def __init_subclass__(cls, **kwargs):
+        """Keeps interned instances of `cls` hashable when `cls` redefines
+        ``__eq__``.
+
+        :param dict kwargs: Key-value arguments.
+        """
+
+        super(Structural, cls).__init_subclass__(**kwargs)
+        if '__eq__' in cls.__dict__ and cls.__dict__.get('__hash__') is None:
+            cls.__hash__ = Structural.__hash__
+    #-def
+
+    def __hash__(self):
+        """Implements ``hash(self)``.
+
+        :returns: The structural hash of this object (:class:`int`).
+
+        :raises TypeError: If this object is not interned.
+        """
+
+        h = self.hash_
+        if h is None:
+            raise TypeError("unhashable type: '%s' (not interned)" % (
+                self.__class__.__name__
+            ))
+        return h
+    #-def
+#-class
+
+class HashConsTable(object):
+    """Interns structurally equal objects.
+
+    :ivar buckets: Interned objects grouped by their hashes.
+    :vartype buckets: dict
+
+    :meth:`intern <doit.support.utils.HashConsTable.intern>` replaces every
+    :class:`Structural <doit.support.utils.Structural>` object in a tree by
+    the first structurally equal object interned before, so equal subtrees
+    become the same object. Interned objects cache their hash and must not
+    be modified afterwards.
+    """
+    __slots__ = [ 'buckets' ]
+
+    def __init__(self):
+        """Initializes the table.
+        """
+
+        self.buckets = {}
+    #-def
+
+    def __len__(self):
+        """Implements ``len(self)``.
+
+        :returns: The number of interned objects (:class:`int`).
+        """
+
+        return sum(len(b) for b in self.buckets.values())
+    #-def
+
+    def __contains__(self, x):
+        """Implements ``x in self``.
+
+        :param object x: An object.
+
+        :returns: :obj:`True` if `x` itself is interned in this table \
+            (:class:`bool`).
+        """
+
+        h = getattr(x, 'hash_', None)
+        return h is not None \
+        and any(y is x for y in self.buckets.get(h, []))
+    #-def
+
+    def clear(self):
+        """Forgets all interned objects.
+        """
+
+        self.buckets.clear()
+    #-def
+
+    def intern(self, x):
+        """Interns `x` and its subtrees.
+
+        :param object x: An object.
+
+        :returns: The canonical object structurally equal to `x`.
+
+        Lists and dictionaries are updated in place, tuples are rebuilt only
+        if some of their items changed.
+        """
+
+        if isinstance(x, list):
+            for i, y in enumerate(x):
+                x[i] = self.intern(y)
+            return x
+        if isinstance(x, dict):
+            for k, v in x.items():
+                x[k] = self.intern(v)
+            return x
+        if type(x) is tuple:
+            t = tuple(self.intern(y) for y in x)
+            return x if all(a is b for a, b in zip(x, t)) else t
+        if not isinstance(x, Structural) or type(x).__eq__ is object.__eq__:
+            return x
+        if x in self:
+            return x
+        for f in structural_fields(x.__class__):
+            v = getattr(x, f, _missing)
+            if v is _missing:
+                continue
+            w = self.intern(v)
+            if w is not v:
+                setattr(x, f, w)
+        h = structural_hash(x)
+        bucket = self.buckets.setdefault(h, [])
+        for y in bucket:
+            if y == x:
+                return y
+        x.hash_ = h
+        bucket.append(x)
+        return x
+    #-def
+#-class
+
+class Functor(Structural):
     """Base class for implementing function objects.
 
     :ivar args: List of arguments.
@@ -147,7 +394,7 @@ class Functor(object):
     :ivar kwargs: Key-value arguments.
     :vartype kwargs: dict
     """
-    __slots__ = [ 'args', 'kwargs' ]
+    __slots__ = [ 'args', 'kwargs', 'hash_' ]
 
     def __init__(self, *args, **kwargs):
         """Initialize the function object.
@@ -158,6 +405,7 @@ class Functor(object):
 
         self.args = args
         self.kwargs = kwargs
+        self.hash_ = None
     #-def
 
     def __eq__(self, other):
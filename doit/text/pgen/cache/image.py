@@ -0,0 +1,222 @@
+#                                                         -*- coding: utf-8 -*-
+#! \file    ./doit/text/pgen/cache/image.py
+#! \author  Jiří Kučera, <sanczes@gmail.com>
+#! \stamp   2026-10-18 14:21:37 (UTC+01:00, DST+01:00)
+#! \project DoIt!: Tools and Libraries for Building DSLs
+#! \license MIT
+#! \version 0.0.0
+#! \fdesc   @pyfile.docstr
+#
+"""\
+Compiled module image cache.\
+"""
+
+__license__ = """\
+Copyright (c) 2014 - 2017 Jiří Kučera.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+IN THE SOFTWARE.\
+"""
+
+import hashlib
+import os
+import pickle
+import struct
+
+from doit.config.version import DOIT_VERSION
+
+IMAGES_CACHE = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), 'images'
+)
+
+class ImageCache(object):
+    """
+    """
+    MAGIC = b"DOITIMG\x00"
+    FORMAT = 2
+    HEADER = struct.Struct("<8sHIIII32sQ")
+    SUFFIX = ".dimg"
+    LIMIT = 64 * 1024 * 1024
+    __slots__ = [ 'directory', 'limit', 'version', '__total' ]
+
+    def __init__(self,
+        directory = IMAGES_CACHE, limit = LIMIT, version = DOIT_VERSION
+    ):
+        """
+        """
+
+        self.directory = directory
+        self.limit = limit
+        self.version = version
+        # An upper estimate of the cache size kept by store(), so that the
+        # cache directory is scanned only when the limit may be exceeded;
+        # None until the first scan:
+        self.__total = None
+    #-def
+
+    def digest(self, data, name = ""):
+        """
+        """
+
+        h = hashlib.sha256()
+        h.update(name.encode('utf-8'))
+        h.update(b"\x00")
+        h.update(data.encode('utf-8'))
+        return h.digest()
+    #-def
+
+    def path(self, digest):
+        """
+        """
+
+        return os.path.join(self.directory, digest.hex() + self.SUFFIX)
+    #-def
+
+    def header(self, digest, size):
+        """
+        """
+
+        v = self.version
+        return self.HEADER.pack(
+            self.MAGIC, self.FORMAT,
+            v.major, v.minor, v.patchlevel, v.date,
+            digest, size
+        )
+    #-def
+
+    def load(self, data, name = ""):
+        """
+        """
+
+        digest = self.digest(data, name)
+        path = self.path(digest)
+        try:
+            with open(path, 'rb') as f:
+                head = f.read(self.HEADER.size)
+                if len(head) != self.HEADER.size \
+                or head[:-8] != self.header(digest, 0)[:-8]:
+                    raise ValueError("Stale or foreign image")
+                size = self.HEADER.unpack(head)[-1]
+                if os.fstat(f.fileno()).st_size != self.HEADER.size + size:
+                    raise ValueError("Truncated image")
+                image = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            self.remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return image
+    #-def
+
+    def store(self, data, image, name = ""):
+        """
+        """
+
+        digest = self.digest(data, name)
+        path = self.path(digest)
+        tmp = "%s.%d.tmp" % (path, os.getpid())
+        try:
+            payload = pickle.dumps(image, pickle.HIGHEST_PROTOCOL)
+            os.makedirs(self.directory, exist_ok = True)
+            with open(tmp, 'wb') as f:
+                f.write(self.header(digest, len(payload)))
+                f.write(payload)
+            os.replace(tmp, path)
+        except Exception:
+            self.remove(tmp)
+            return False
+        if self.__total is None:
+            self.__total = self.size()
+        else:
+            self.__total += self.HEADER.size + len(payload)
+        if self.__total > self.limit:
+            self.evict()
+        return True
+    #-def
+
+    def entries(self):
+        """
+        """
+
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        entries = []
+        for name in names:
+            if not name.endswith(self.SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        entries.sort()
+        return entries
+    #-def
+
+    def size(self):
+        """
+        """
+
+        return sum(e[1] for e in self.entries())
+    #-def
+
+    def remove(self, path):
+        """
+        """
+
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    #-def
+
+    def invalidate(self, data = None, name = ""):
+        """
+        """
+
+        if data is not None:
+            self.remove(self.path(self.digest(data, name)))
+            return
+        for _, _, path in self.entries():
+            self.remove(path)
+        self.__total = 0
+    #-def
+
+    def evict(self, limit = None):
+        """
+        """
+
+        if limit is None:
+            limit = self.limit
+        entries = self.entries()
+        total = sum(e[1] for e in entries)
+        for _, size, path in entries:
+            if total <= limit:
+                break
+            self.remove(path)
+            total -= size
+        self.__total = total
+    #-def
+#-class
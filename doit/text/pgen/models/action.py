@@ -246,7 +246,7 @@ class Expr(ActionNode):
         """
         """
 
-        if attr[-1] == '_':
+        if attr[-1] == '_' and not attr.startswith('__'):
             return AccessExpr(self, Id(attr[:-1]))
         return object.__getattribute__(self, attr)
     #-def
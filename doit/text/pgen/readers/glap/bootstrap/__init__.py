@@ -1897,14 +1897,29 @@ class GlapReader(Reader):
         """
         """
 
-        data, name = self.load_source(source, **opts)
+        data = self.load_source(source, **opts)
         if data is None:
             return None
+        name = self.source_name(source, **opts)
+        cache = self.option(self.CACHE, opts)
+        if cache is not None:
+            module = cache.load(data, name)
+            if module is not None:
+                return module
+        # The parser module imports this one:
+        from doit.text.pgen.readers.glap.bootstrap.parser import \
+            GlapLexer, \
+            GlapParser
+
         ctx = GlapContext()
         GlapStream(ctx, name, data)
         GlapLexer(ctx)
-        GlapParser(ctx)
-        GlapActions(ctx)
+        parser = GlapParser(ctx)
+        GlapParserActions(ctx)
+        module = parser.parse()
+        if cache is not None:
+            cache.store(data, module, name)
+        return module
     #-def
 #-class
 
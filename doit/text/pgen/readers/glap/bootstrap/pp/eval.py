@@ -41,10 +41,10 @@ class GlapGrammarPreprocessor(CommandProcessor):
     """
     __slots__ = []
 
-    def __init__(self, env = None):
+    def __init__(self, env = None, snapshot = None):
         """
         """
 
-        CommandProcessor.__init__(self, env)
+        CommandProcessor.__init__(self, env, snapshot = snapshot)
     #-def
 #-class
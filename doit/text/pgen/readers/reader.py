@@ -33,10 +33,16 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 IN THE SOFTWARE.\
 """
 
+from doit.support.errors import not_implemented
+
+from doit.support.app.io import read_all
+
 class Reader(object):
     """
     """
     FROM_FILE = 'from_file'
+    NAME = 'name'
+    CACHE = 'cache'
     __slots__ = [ '__opts' ]
 
     def __init__(self, **opts):
@@ -53,6 +59,13 @@ class Reader(object):
         return self.__opts
     #-def
 
+    def option(self, name, opts, default = None):
+        """
+        """
+
+        return opts.get(name, self.__opts.get(name, default))
+    #-def
+
     def read(self, source, *args, **opts):
         """
         """
@@ -64,10 +77,17 @@ class Reader(object):
         """
         """
 
-        k = self.FROM_FILE
-        from_file = opts.get(k, self.__opts.get(k, False))
-        if from_file:
+        if self.option(self.FROM_FILE, opts, False):
             return read_all(source)
         return source
     #-def
+
+    def source_name(self, source, **opts):
+        """
+        """
+
+        if self.option(self.FROM_FILE, opts, False):
+            return source
+        return self.option(self.NAME, opts, "<string>")
+    #-def
 #-class
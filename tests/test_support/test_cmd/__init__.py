@@ -35,7 +35,8 @@ IN THE SOFTWARE.\
 
 import unittest
 
-from . import test_errors, test_runtime, test_eval, test_commands
+from . import test_errors, test_runtime, test_eval, test_commands, \
+    test_compiler, test_profiler, test_pool, test_persistent
 
 def suite():
     suite = unittest.TestSuite()
@@ -43,5 +44,9 @@ def suite():
     suite.addTest(test_runtime.suite())
     suite.addTest(test_eval.suite())
     suite.addTest(test_commands.suite())
+    suite.addTest(test_compiler.suite())
+    suite.addTest(test_profiler.suite())
+    suite.addTest(test_pool.suite())
+    suite.addTest(test_persistent.suite())
     return suite
 #-def
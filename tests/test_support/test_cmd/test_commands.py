@@ -37,6 +37,10 @@ import unittest
 
 from doit.config.version import DOIT_VERSION as DV
 
+from doit.support.utils import \
+    structural_hash, \
+    HashConsTable
+
 from doit.support.cmd.errors import \
     CommandProcessorError, \
     CommandError
@@ -48,7 +52,15 @@ from doit.support.cmd.runtime import \
     HashMap, \
     UserType, \
     ExceptionClass, \
-    Procedure
+    Procedure, \
+    Range, \
+    StrView, \
+    HashMapView, \
+    Stream, \
+    PersistentList, \
+    PersistentHashMap, \
+    Rope, \
+    Set
 
 from doit.support.cmd.commands import \
     CommandContext, \
@@ -58,6 +70,7 @@ from doit.support.cmd.commands import \
     Version, \
     MacroNode as _n, MacroNodeSequence as _s, MacroNodeAtom as _a, \
         MacroNodeParam as _p, \
+    Macro, \
     Expand, \
     SetLocal, \
     GetLocal, \
@@ -69,6 +82,7 @@ from doit.support.cmd.commands import \
     And, Or, Not, \
     NewPair, NewList, NewHashMap, \
     Copy, Slice, Concat, Join, Merge, \
+    Union, Intersection, Difference, \
     Type, InstanceOf, Strlen, Size, Empty, Contains, Count, \
     IsDigit, IsUpper, IsLower, IsAlpha, IsLetter, IsAlnum, IsWord, \
     Keys, Values, \
@@ -79,11 +93,12 @@ from doit.support.cmd.commands import \
     Sort, Reverse, Unique, \
     Split, \
     ToBool, ToInt, ToFlt, ToStr, ToPair, ToList, ToHash, \
+    ToSet, ToRope, ToPersistent, \
     All, Any, SeqOp, Map, Filter, \
     Lambda, \
     Block, If, Foreach, While, DoWhile, Break, Continue, \
     Call, ECall, Return, \
-    TryCatchFinally, Throw, Rethrow, \
+    TryCatchFinally, Throw, Rethrow, SandBox, \
     SetItem, DelItem, Append, Insert, Remove, RemoveAll, \
     Each, Visit, \
     Print, \
@@ -93,6 +108,9 @@ from doit.support.cmd.eval import \
     Environment, \
     CommandProcessor
 
+from doit.support.cmd.profiler import \
+    Profiler
+
 class UT_000(UserType):
     __slots__ = [ 'left', 'right' ]
 
@@ -220,6 +238,51 @@ class TestCommandCase(unittest.TestCase):
         self.assertNotEqual(c3, c4)
         self.assertEqual(c3, c5)
     #-def
+
+    def test_hash_consing(self):
+        p = CommandProcessor()
+        table = HashConsTable()
+        mk = lambda: Block(
+            SetLocal('x', Add(GetLocal('a'), 1)),
+            If(Lt(GetLocal('x'), 3), [
+                SetLocal('x', Add(GetLocal('a'), 1))
+            ], [
+                SetLocal('x', Add(GetLocal('a'), 2))
+            ])
+        )
+        b1, b2 = mk(), mk()
+
+        self.assertEqual(structural_hash(b1), structural_hash(b2))
+        with self.assertRaises(TypeError):
+            {b1: 1}
+        b2.set_location("f", 1, 1)
+        self.assertNotEqual(structural_hash(b1), structural_hash(b2))
+        b2.set_location()
+        b1 = table.intern(b1)
+        self.assertIs(b1.commands[0], b1.commands[1].t[0])
+        self.assertIs(table.intern(b2), b1)
+        self.assertEqual({b1: 1}[table.intern(mk())], 1)
+        self.assertIsNot(b1.commands[0], b1.commands[1].e[0])
+        self.assertIs(
+            b1.commands[0].value.operands[0],
+            b1.commands[1].e[0].value.operands[0]
+        )
+        p.run([SetLocal('a', 1), b1])
+        self.assertEqual(p.acc(), 2)
+
+        n1 = _n(Return, _a(1))
+        n1.deferred.append(lambda n: n.set_location("f", 1, 1))
+        n2 = _n(Return, _a(1))
+        n2.deferred.append(n1.deferred[0])
+        self.assertIs(table.intern(_s(n1, n2)).nodes[1], n1)
+        self.assertEqual(
+            structural_hash(_s(_p('x'))), structural_hash(_s(_p('x')))
+        )
+        prog = p.compile([mk()])
+        self.assertEqual(
+            structural_hash(prog), structural_hash(p.compile([mk()]))
+        )
+    #-def
 #-class
 
 class TestConstCase(unittest.TestCase):
@@ -355,6 +418,52 @@ class TestExpandCase(unittest.TestCase):
         with self.assertRaises(CommandProcessorError):
             p.run([Expand(GetLocal('M'), 1)])
     #-def
+
+    def test_memoization(self):
+        p = Printer()
+
+        const = _n(Print, _a("-"))
+        const.deferred.append(lambda n: n.set_location("f", 1, 2))
+        var = _n(Print, _p('x'))
+        var.deferred.append(lambda n: n.set_location("f", 3, 4))
+        m = Macro('m', 'm', ['x'], [const, var])
+
+        self.assertTrue(const.isconst())
+        self.assertFalse(var.isconst())
+        self.assertFalse(_s(const, var).isconst())
+        a1, a2 = ("a",), ("b",)
+        b1 = m.substitute(a1)
+        b2 = m.substitute(a1)
+        b3 = m.substitute(a2)
+        self.assertIsNot(b1, b2)
+        self.assertIs(b1[0], b2[0])
+        self.assertIs(b1[1], b2[1])
+        self.assertIs(b1[0], b3[0])
+        self.assertIsNot(b1[1], b3[1])
+        self.assertEqual(b3[1].location, ("f", 3, 4))
+        self.assertEqual(b1[0].location, ("f", 1, 2))
+        self.assertEqual(b3[1], Print("b").set_location("f", 3, 4))
+        b1.append(None)
+        self.assertEqual(len(m.substitute(a1)), 2)
+
+        size = Macro.CACHE_SIZE
+        Macro.CACHE_SIZE = 1
+        try:
+            m.cache.clear()
+            m.substitute(a1)
+            m.substitute(a2)
+            self.assertEqual(list(m.cache.values()), [(a2, b3)])
+            self.assertIsNot(m.substitute(a1)[1], b1[1])
+        finally:
+            Macro.CACHE_SIZE = size
+
+        p.run([
+            DefMacro('n', ['x'], [_n(Print, _p('x'))]),
+            Foreach('i', [1, 2, 3], [Expand(GetLocal('n'), "x")])
+        ])
+        self.assertEqual(p.output, "xxx")
+        self.assertEqual(len(p.getenv()['n'].cache), 1)
+    #-def
 #-class
 
 class TestSetLocalCase(unittest.TestCase):
@@ -429,6 +538,65 @@ class TestOperationsCase(unittest.TestCase):
             p.run([add3])
     #-def
 
+    def test_specialize(self):
+        p = CommandProcessor()
+        add = Operation.specialize('add')
+
+        self.assertIs(Operation.specialize('add'), add)
+        self.assertIs(Add(1, 2).FAST_OPS[(Add, 'add')], Add.specialize('add'))
+        self.assertIsNone(Operation.specialize('newlist'))
+        self.assertIsNone(Operation.specialize('undefined'))
+        self.assertEqual(add(p, [1, 2]), 3)
+        self.assertEqual(Operation.specialize('not')(p, [p.Null]), True)
+        self.assertEqual(
+            Operation.specialize('lt')(p, ["a", "b"]), True
+        )
+        self.assertEqual(
+            Operation.specialize('find')(p, ["abc", "c", 0, 3]), 2
+        )
+
+        with self.assertRaisesRegex(CommandProcessorError,
+            r'div: Second operand must be non-zero'
+        ):
+            p.run([Div(1, 0)])
+        with self.assertRaisesRegex(CommandProcessorError,
+            r"lt: Bad type of the 2nd operand \(1\)"
+        ):
+            p.run([Lt("a", 1)])
+    #-def
+
+    def test_specialize_per_class(self):
+        class Concat(Operation):
+            OP_TAB = {
+                'add': dict(
+                    types = [(str, str)],
+                    operation = (lambda a, b: "%s%s" % (b, a))
+                )
+            }
+            __slots__ = []
+
+            def __init__(self, a, b):
+                Operation.__init__(self, a, b)
+                self.name = 'add'
+                self.specialize(self.name)
+
+        p = CommandProcessor()
+        Operation.specialize('add')
+
+        self.assertIsNot(Concat.specialize('add'), Operation.specialize('add'))
+        p.run([Concat("a", "b")])
+        self.assertEqual(p.acc(), "ba")
+        p.run([Add(1, 2)])
+        self.assertEqual(p.acc(), 3)
+        p.run([
+            Define("f", [], ["x"], False, [
+                Return(Concat(GetLocal("x"), "y"))
+            ]),
+            Map(["a", "b"], GetLocal("f"))
+        ])
+        self.assertEqual(p.acc(), ["ya", "yb"])
+    #-def
+
     def test_Add(self):
         p = CommandProcessor()
 
@@ -822,6 +990,10 @@ class TestOperationsCase(unittest.TestCase):
         p.run([Join(['a', 1.5], [(1, 3), -9])])
         self.assertEqual(p.acc(), ['a', 1.5, (1, 3), -9])
         self.assertIsInstance(p.acc(), List)
+        with self.assertRaisesRegex(CommandProcessorError,
+            r"join: Bad type of the 2nd operand \(5\)"
+        ):
+            p.run([Join([1], 5)])
     #-def
 
     def test_Merge(self):
@@ -839,6 +1011,47 @@ class TestOperationsCase(unittest.TestCase):
         self.assertIsInstance(p.acc(), HashMap)
     #-def
 
+    def test_set_operations(self):
+        p = CommandProcessor()
+        a, b = ToSet([1, 2, 3]), ToSet(Range(2, 5))
+
+        p.run([Union(a, b)])
+        self.assertEqual(p.acc(), {1, 2, 3, 4})
+        self.assertIsInstance(p.acc(), Set)
+        p.run([Intersection(a, b)])
+        self.assertEqual(p.acc(), Set([2, 3]))
+        p.run([Difference(a, b)])
+        self.assertEqual(p.acc(), Set([1]))
+        p.run([Contains(a, 3)])
+        self.assertTrue(p.acc())
+        p.run([Contains(Difference(a, b), 3)])
+        self.assertFalse(p.acc())
+        p.run([Size(a)])
+        self.assertEqual(p.acc(), 3)
+        p.run([ToSet(HashMap({'x': 1, 'y': 2}))])
+        self.assertEqual(p.acc(), {'x', 'y'})
+        p.run([ToSet(ToSet("abca"))])
+        self.assertEqual(p.acc(), {'a', 'b', 'c'})
+        p.run([ToSet([Set([1]), Set([1])])])
+        self.assertEqual(p.acc(), {frozenset([1])})
+        p.run([Sort(ToList(a))])
+        self.assertEqual(p.acc(), [1, 2, 3])
+        p.run([
+            SetLocal("s", 0),
+            Foreach("x", a, [SetLocal("s", Add(GetLocal("s"), GetLocal("x")))]),
+            GetLocal("s")
+        ])
+        self.assertEqual(p.acc(), 6)
+        with self.assertRaises(CommandProcessorError):
+            p.run([Union(a, [4])])
+        with self.assertRaises(CommandProcessorError):
+            p.run([ToSet([[1]])])
+        with self.assertRaises(CommandProcessorError):
+            p.run([ToSet(1)])
+        with self.assertRaises(CommandProcessorError):
+            p.run([GetItem(a, 0)])
+    #-def
+
     def test_Type(self):
         p = CommandProcessor()
 
@@ -1822,6 +2035,278 @@ class TestOperationsCase(unittest.TestCase):
         self.assertIsInstance(p.acc(), List)
         self.assertEqual(p.acc(), [0, 2, 4, 6, 8])
     #-def
+
+    def test_SeqOp_fast_paths(self):
+        p = CommandProcessor()
+        calls = []
+        def f(x):
+            calls.append(x)
+            return None if x == 2 else x * 10
+        prog = [
+            Define("incr", [], ["x"], False, [
+                Return(Add(GetLocal("x"), 1))
+            ]),
+            Define("scale", [], ["x"], False, [
+                Return(ECall(f, GetLocal("x")))
+            ]),
+            Define("big", [], ["x"], False, [
+                SetLocal("y", Mul(GetLocal("x"), 2)),
+                Return(Gt(GetLocal("y"), 5))
+            ])
+        ]
+
+        p.run(prog)
+        p.run([Map([1, 2, 3], GetLocal("scale"))])
+        self.assertEqual(p.acc(), [10, p.Null, 30])
+        self.assertEqual(calls, [1, 2, 3])
+        p.run([Map([1, None], Lambda(["x"], False, [
+            Return(NewPair(GetLocal("x"), 1))
+        ], []))])
+        self.assertEqual(p.acc(), [(1, 1), (p.Null, 1)])
+        p.run([Map([1, 2], GetLocal("incr"))])
+        self.assertEqual(p.acc(), [2, 3])
+        with self.assertRaises(CommandProcessorError):
+            p.run([Map([1, "a"], GetLocal("incr"))])
+        p.run([Filter([1, 2, 3, 4], GetLocal("big"))])
+        self.assertEqual(p.acc(), [3, 4])
+        with self.assertRaises(CommandProcessorError):
+            p.run([Filter([1], GetLocal("incr"))])
+        with self.assertRaises(CommandProcessorError):
+            p.run([Map([1], Lambda(["x", "y"], False, [Return(0)], []))])
+        p.run([Map([], Lambda(["x", "y"], False, [Return(0)], []))])
+        self.assertEqual(p.acc(), [])
+    #-def
+
+    def test_SeqOp_traces(self):
+        def boom(x):
+            raise ValueError(x)
+        prog = [
+            Define("inv", [], ["x"], False, [
+                Return(Div(1, GetLocal("x")))
+            ]),
+            Define("ext", [], ["x"], False, [
+                Return(ECall(boom, GetLocal("x")))
+            ]),
+            Define("both", [], ["x", "y"], False, [Return(True)])
+        ]
+        lambda_frames = 'In "<lambda>" \\(internal\\)\n\\| from "%s" '
+        cases = [
+            (Map([1, 0], GetLocal("inv")), lambda_frames % "inv"),
+            (Map([1, 0], GetLocal("ext")), lambda_frames % "ext"),
+            (Filter([0], GetLocal("inv")), lambda_frames % "inv"),
+            (Filter([0], GetLocal("ext")), lambda_frames % "ext"),
+            (Each([1, 0], GetLocal("inv")), 'In "inv" \\(internal\\):'),
+            (Each([1, 0], GetLocal("ext")), 'In "ext" \\(internal\\):'),
+            (
+                Map([1], GetLocal("both")),
+                'In "<lambda>" \\(internal\\):\n.*call both'
+            ),
+            (Each([1], GetLocal("both")), 'In <main>:\n.*call both'),
+            (
+                Filter([1], GetLocal("inv")),
+                "In <main>:\n.*should return a pair \\(any, boolean\\)"
+            )
+        ]
+
+        for code, trace in cases:
+            p = CommandProcessor()
+            p.run(prog)
+            with self.assertRaisesRegex(CommandProcessorError, trace):
+                p.run([code])
+            q = CommandProcessor()
+            q.run(prog)
+            with self.assertRaisesRegex(CommandProcessorError, trace):
+                q.run([q.compile([code])])
+    #-def
+
+    def test_lazy_iterables(self):
+        p = CommandProcessor()
+        lines = (lambda: ("line %d" % i for i in range(3)))
+        sum_ = [
+            SetLocal("s", 0),
+            Foreach("i", GetLocal("it"), [
+                SetLocal("s", Add(GetLocal("s"), GetLocal("i")))
+            ]),
+            GetLocal("s")
+        ]
+        double = Lambda(["x"], False, [Return(Add(GetLocal("x"), 1))], [])
+        odd = Lambda(["x"], False, [Return(Eq(Mod(GetLocal("x"), 2), 1))], [])
+
+        p.run([SetLocal("it", Range(1000))] + sum_)
+        self.assertEqual(p.acc(), 499500)
+        p.run([SetLocal("it", Range(1000))] + [p.compile(sum_)])
+        self.assertEqual(p.acc(), 499500)
+        p.run([
+            Foreach("c", StrView("xabcx", 1, 4), []),
+            GetLocal("c")
+        ])
+        self.assertEqual(p.acc(), "c")
+        p.run([Map(Range(1, 4), double)])
+        self.assertEqual(p.acc(), [2, 3, 4])
+        p.run([Map(Stream(lines), Lambda(["x"], False, [
+            Return(Strlen(GetLocal("x")))
+        ], []))])
+        self.assertEqual(p.acc(), [6, 6, 6])
+        p.run([Filter(Range(10), odd)])
+        self.assertEqual(p.acc(), [1, 3, 5, 7, 9])
+        p.run([All(Range(1, 10, 2), odd)])
+        self.assertTrue(p.acc())
+        p.run([Any(HashMapView(HashMap({2: 0, 4: 1})), odd)])
+        self.assertFalse(p.acc())
+        p.run([All("", odd)])
+        self.assertTrue(p.acc())
+        p.run([
+            SetLocal("l", []),
+            Each(HashMapView(HashMap({"a": 1}), HashMapView.ITEMS), Lambda(
+                ["x", "l"], False, [Append(GetLocal("l"), GetLocal("x"))], []
+            ), GetLocal("l")),
+            GetLocal("l")
+        ])
+        self.assertEqual(p.acc(), [("a", 1)])
+        with self.assertRaises(CommandProcessorError):
+            p.run([Map(HashMap({1: 2}), double)])
+    #-def
+
+    def test_lazy_iterable_errors(self):
+        p = CommandProcessor()
+
+        def broken():
+            yield 1
+            raise ValueError()
+
+        def catch(ename, body):
+            return TryCatchFinally(body, [(ename, 'e', [
+                SetLocal('e', GetLocal('e'))
+            ])], [])
+
+        loop = [Foreach('x', Stream(broken), [])]
+        for code in (loop, [p.compile(loop)]):
+            p.run([SetLocal('e', 0), catch('Exception', code)])
+            self.assertIs(p.getenv()['e'].ecls, p.TypeError)
+            self.assertEqual(p.getenv()['x'], 1)
+        p.run([
+            SetLocal('e', 0),
+            catch('Exception', [
+                Map(Stream(broken), Lambda(['x'], False, [], []))
+            ])
+        ])
+        self.assertIs(p.getenv()['e'].ecls, p.TypeError)
+        with self.assertRaises(CommandProcessorError):
+            p.run(loop)
+        p.cleanup()
+
+        p.run([
+            SetLocal('h', HashMap({'a': 1})),
+            SetLocal('e', 0),
+            catch('Exception', [
+                Foreach('k', HashMapView(GetLocal('h')), [
+                    SetItem(GetLocal('h'), 'b', 2)
+                ])
+            ])
+        ])
+        self.assertIs(p.getenv()['e'].ecls, p.TypeError)
+
+        p.run([
+            SetLocal('e', 0),
+            catch('ValueError', [Foreach('i', Range(1, 5, 0), [])])
+        ])
+        self.assertIs(p.getenv()['e'].ecls, p.ValueError)
+        with self.assertRaises(CommandProcessorError):
+            p.run([Each(Range(1, 5, 0), Lambda(['x'], False, [], []))])
+        p.cleanup()
+    #-def
+
+    def test_persistent_collections(self):
+        p = CommandProcessor()
+
+        p.run([
+            SetLocal("l", ToPersistent(List(range(100)))),
+            SetLocal("k", Copy(GetLocal("l"))),
+            SetItem(GetLocal("k"), 0, 'a'),
+            Append(GetLocal("k"), 100),
+            Insert(GetLocal("k"), 1, 'b'),
+            Remove(GetLocal("k"), 50),
+            SetLocal("s", 0),
+            Foreach("i", GetLocal("l"), [
+                SetLocal("s", Add(GetLocal("s"), GetLocal("i"))),
+                Append(GetLocal("l"), 0)
+            ])
+        ])
+        l, k = p.getenv()['l'], p.getenv()['k']
+        self.assertIsInstance(l, PersistentList)
+        self.assertEqual(p.getenv()['s'], 4950)
+        self.assertEqual(l, list(range(100)) + [0] * 100)
+        self.assertEqual(len(k), 101)
+        self.assertEqual(k[:4], ['a', 'b', 1, 2])
+        self.assertNotIn(50, k)
+        p.run([Join(ToPersistent(List([1])), List([2, 3]))])
+        self.assertIsInstance(p.acc(), PersistentList)
+        self.assertEqual(p.acc(), [1, 2, 3])
+        p.run([Join(List([1]), ToPersistent(List([2, 3])))])
+        self.assertIsInstance(p.acc(), List)
+        self.assertEqual(p.acc(), [1, 2, 3])
+        p.run([Sort(ToPersistent(List([3, 1, 2])))])
+        self.assertIsInstance(p.acc(), PersistentList)
+        self.assertEqual(p.acc(), [1, 2, 3])
+        p.run([Reverse(ToPersistent(List([3, 1, 2])))])
+        self.assertEqual(p.acc(), [2, 1, 3])
+        p.run([Unique(ToPersistent(List([3, 1, 3])))])
+        self.assertEqual(p.acc(), [3, 1])
+        p.run([
+            SetLocal("d", ToPersistent(HashMap({'a': 1}))),
+            SetLocal("e", Merge(GetLocal("d"), HashMap({'b': 2}))),
+            SetItem(GetLocal("e"), 'c', 3),
+            DelItem(GetLocal("e"), 'a')
+        ])
+        d, e = p.getenv()['d'], p.getenv()['e']
+        self.assertIsInstance(e, PersistentHashMap)
+        self.assertEqual(d, {'a': 1})
+        self.assertEqual(e, {'b': 2, 'c': 3})
+        p.run([GetItem(ToPersistent(HashMap({'a': 1})), 'a')])
+        self.assertEqual(p.acc(), 1)
+        p.run([Keys(ToPersistent(HashMap({'a': 1})))])
+        self.assertEqual(p.acc(), ['a'])
+        p.run([ToHash(ToPersistent(HashMap({'a': 1})))])
+        self.assertIsInstance(p.acc(), HashMap)
+        self.assertEqual(p.acc(), {'a': 1})
+        p.run([ToList(ToPersistent(HashMap({'a': 1})))])
+        self.assertEqual(p.acc(), [('a', 1)])
+        with self.assertRaises(CommandProcessorError):
+            p.run([GetItem(ToPersistent(HashMap({'a': 1})), 'b')])
+        with self.assertRaises(CommandProcessorError):
+            p.run([ToPersistent("abc")])
+    #-def
+
+    def test_ropes(self):
+        p = CommandProcessor()
+        code = [
+            SetLocal("s", ToRope("<")),
+            Foreach("i", Range(1000), [
+                SetLocal("s", Concat(GetLocal("s"), "x"))
+            ]),
+            SetLocal("s", Join(GetLocal("s"), ToRope(">")))
+        ]
+
+        p.run(code)
+        self.assertIsInstance(p.getenv()['s'], Rope)
+        self.assertEqual(str(p.getenv()['s']), "<%s>" % ("x" * 1000))
+        p.run([p.compile(code)])
+        self.assertEqual(len(p.getenv()['s']), 1002)
+        p.run([Strlen(GetLocal("s"))])
+        self.assertEqual(p.acc(), 1002)
+        p.run([ToStr(GetLocal("s"))])
+        self.assertIsInstance(p.acc(), str)
+        self.assertEqual(p.acc(), "<%s>" % ("x" * 1000))
+        p.run([Concat("ab", ToRope("cd"))])
+        self.assertIsInstance(p.acc(), Rope)
+        self.assertEqual(str(p.acc()), "abcd")
+        p.run([Concat("ab", "cd")])
+        self.assertIsInstance(p.acc(), str)
+        with self.assertRaises(CommandProcessorError):
+            p.run([Join(ToRope("a"), 1)])
+        with self.assertRaises(CommandProcessorError):
+            p.run([ToRope(1)])
+    #-def
 #-class
 
 class TestBlockCase(unittest.TestCase):
@@ -2557,6 +3042,42 @@ class TestCallCase(unittest.TestCase):
         p.run([ECall(g_, 0, 1, {})])
         self.assertIs(p.acc(), p.Null)
     #-def
+
+    def test_tailcall(self):
+        p = CommandProcessor()
+        depths = []
+        program = [
+            Define("count", [], ["n", "acc"], False, [
+                If(Eq(GetLocal("n"), 0), [
+                    ECall(lambda: depths.append(len(p.traceback()))),
+                    Return(GetLocal("acc"))
+                ], [Block(
+                    Return(Call(GetLocal("count"),
+                        Sub(GetLocal("n"), 1), Add(GetLocal("acc"), 1)
+                    ))
+                )])
+            ]),
+            Define("guarded", [], ["n"], False, [
+                TryCatchFinally([
+                    Return(Call(GetLocal("count"), GetLocal("n"), 0))
+                ], [], [
+                    SetLocal("fin", GetLocal("n"), 1)
+                ])
+            ])
+        ]
+
+        p.run(program)
+        for n in (1, 10, 1000):
+            p.run([Call(GetLocal("count"), n, 0)])
+            self.assertEqual(p.acc(), n)
+        self.assertEqual(depths, [1, 1, 1])
+        p.run([SetLocal("r", Call(GetLocal("guarded"), 5))])
+        self.assertEqual(p.getenv()["r"], 5)
+        self.assertEqual(p.getenv()["fin"], 5)
+        self.assertEqual(depths[-1], 2)
+        with self.assertRaises(CommandProcessorError):
+            p.run([Return(Call(GetLocal("count"), 1, 0))])
+    #-def
 #-class
 
 class TestTryCatchFinallyCase(unittest.TestCase):
@@ -3331,6 +3852,45 @@ class TestTryCatchFinallyCase(unittest.TestCase):
         self.assertEqual(env.getvar('a'), 12)
         self.assertEqual(env.getvar('b'), 14)
     #-def
+
+    def test_unwinding_cost(self):
+        p = CommandProcessor()
+        prof = Profiler()
+        p.setprofiler(prof)
+
+        # Commands that complete normally do not sandbox anything:
+        p.run([
+            SetLocal('x', 1),
+            If(Lt(GetLocal('x'), 2), [SetLocal('x', 3)], []),
+            TryCatchFinally([Block(Add(1, 2))], [
+                ('TypeError', "", [SetLocal('x', 4)])
+            ], [])
+        ])
+        self.assertEqual(p.getenv().getvar('x'), 3)
+        self.assertNotIn(SandBox, prof.expansions)
+
+        # Exceptions without a handler propagate without sandboxing:
+        prof.reset()
+        p.run([
+            TryCatchFinally([
+                Block(Block(Div(0, "z")), SetLocal('x', 5))
+            ], [
+                ('TypeError', "", [SetLocal('x', 6)])
+            ], [])
+        ])
+        self.assertEqual(p.getenv().getvar('x'), 6)
+        self.assertEqual(prof.expansions[SandBox], 2)
+
+        # finally blocks are still run:
+        prof.reset()
+        p.run([
+            TryCatchFinally([SetLocal('x', 7)], [], [
+                SetLocal('y', GetLocal('x'))
+            ])
+        ])
+        self.assertEqual(p.getenv().getvar('y'), 7)
+        self.assertEqual(prof.expansions[SandBox], 2)
+    #-def
 #-class
 
 class TestSetItemCase(unittest.TestCase):
@@ -3680,6 +4240,16 @@ class TestEachCase(unittest.TestCase):
             ], []), 2, GetLocal('x'))
         ])
         self.assertEqual(p.getenv()['x'], [18, 50, 98])
+        calls = []
+        p.run([
+            Each([3, 5], Lambda(['x', 'k'], False, [
+                Return(ECall(
+                    (lambda *args: calls.append(args)), GetLocal('k'),
+                    Add(GetLocal('x'), 1)
+                ))
+            ], []), 2)
+        ])
+        self.assertEqual(calls, [(2, 4), (2, 6)])
     #-def
 #-class
 
@@ -3840,6 +4410,26 @@ class TestPrintCase(unittest.TestCase):
         )])
         self.assertEqual(p.output, "(1 + 2 = 3)")
     #-def
+
+    def test_Print_rope(self):
+        p = Printer()
+
+        p.run([
+            SetLocal("x", Concat(ToRope("a"), "b")),
+            Print("[", GetLocal("x"), "]", None)
+        ])
+        self.assertEqual(p.output, "[ab]null")
+        with self.assertRaises(CommandProcessorError):
+            p.run([Print((1, 2))])
+        with self.assertRaisesRegex(CommandProcessorError,
+            r"TypeError\(\"tostr: Bad type of 1st operand\"\)"
+        ):
+            p.run([TryCatchFinally([
+                Throw(GetLocal('TypeError'), "x")
+            ], [
+                ('TypeError', 'e', [Print(GetLocal('e'))])
+            ], [])])
+    #-def
 #-class
 
 class TestModuleCase(unittest.TestCase):
@@ -4022,6 +4612,47 @@ class TestModuleCase(unittest.TestCase):
         with self.assertRaises(CommandProcessorError):
             p.run([SetMember(1, 'x', 0)])
     #-def
+
+    def test_member_caches(self):
+        p = CommandProcessor()
+        p.run([
+            DefModule('A', [
+                DefModule('B', [SetLocal('x', 1)])
+            ])
+        ])
+        getx = GetMember(GetMember(GetLocal('A'), 'B'), 'x')
+        setx = SetMember(GetMember(GetLocal('A'), 'B'), 'x', 2)
+        p.run([getx])
+        self.assertEqual(p.acc(), 1)
+        p.run([getx])
+        self.assertEqual(p.acc(), 1)
+        p.run([setx, getx])
+        self.assertEqual(p.acc(), 2)
+        p.run([SetMember(GetLocal('A'), 'B', 3)])
+        with self.assertRaises(CommandProcessorError):
+            p.run([getx])
+
+        # Caches are per module, so sites can be shared by processors:
+        q = CommandProcessor()
+        q.run([
+            DefModule('A', [
+                DefModule('B', [SetLocal('x', 5)])
+            ])
+        ])
+        q.run([getx])
+        self.assertEqual(q.acc(), 5)
+        q.run([setx, getx])
+        self.assertEqual(q.acc(), 2)
+        self.assertEqual(
+            q.getenv()['A'].ctx.env['B'].ctx.env.getmeta('x').qname,
+            "A::B::x"
+        )
+        self.assertEqual(getx, GetMember(GetMember(GetLocal('A'), 'B'), 'x'))
+        self.assertEqual(
+            structural_hash(getx),
+            structural_hash(GetMember(GetMember(GetLocal('A'), 'B'), 'x'))
+        )
+    #-def
 #-class
 
 def suite():
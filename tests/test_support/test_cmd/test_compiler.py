@@ -0,0 +1,383 @@
+#                                                         -*- coding: utf-8 -*-
+#! \file    ./tests/test_support/test_cmd/test_compiler.py
+#! \author  Jiří Kučera, <sanczes@gmail.com>
+#! \stamp   2026-10-18 12:26:09 (UTC+01:00, DST+01:00)
+#! \project DoIt!: Tools and Libraries for Building DSLs
+#! \license MIT
+#! \version 0.0.0
+#! \fdesc   @pyfile.docstr
+#
+"""\
+Command processor's compiler tests.\
+"""
+
+__license__ = """\
+Copyright (c) 2014 - 2017 Jiří Kučera.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+IN THE SOFTWARE.\
+"""
+
+import unittest
+
+from doit.support.cmd.errors import \
+    CommandProcessorError
+
+from doit.support.cmd.runtime import \
+    Location, \
+    Pair, \
+    List, \
+    HashMap, \
+    Traceback
+
+from doit.support.cmd.commands import \
+    CommandContext, \
+    Const, \
+    SetLocal, \
+    GetLocal, \
+    Expand, \
+    Define, \
+    Add, Sub, Mul, Div, Mod, Lt, Gt, Eq, \
+    And, Or, Not, \
+    NewPair, NewList, NewHashMap, Concat, \
+    All, Map, Filter, \
+    Lambda, \
+    Block, If, Foreach, While, DoWhile, Break, Continue, \
+    Call, ECall, Return, \
+    TryCatchFinally, Throw
+
+from doit.support.cmd.compiler import \
+    Frame, \
+    Program, \
+    Folder, \
+    Compiler
+
+from doit.support.cmd.eval import \
+    CommandProcessor
+
+def inc(x):
+    return x + 1
+#-def
+
+# Each program leaves its result in 'r':
+PROGRAMS = [[
+    SetLocal('r', 0),
+    Foreach('i', List(range(10)), [
+        Block(
+            If(Eq(Mod(GetLocal('i'), 2), 0), [Continue()], []),
+            If(Gt(GetLocal('i'), 7), [Break()], []),
+            SetLocal('r', Add(GetLocal('r'), GetLocal('i')), 1)
+        )
+    ])
+], [
+    SetLocal('r', ""),
+    Foreach('c', "abc", [
+        Foreach('d', "xyz", [
+            If(Eq(GetLocal('d'), "y"), [Continue()], []),
+            If(Eq(GetLocal('c'), "b"), [Break()], []),
+            SetLocal('r', Concat(GetLocal('r'), GetLocal('c'))),
+            SetLocal('r', Concat(GetLocal('r'), GetLocal('d')))
+        ])
+    ])
+], [
+    SetLocal('i', 0),
+    SetLocal('r', 1),
+    While(True, [
+        SetLocal('i', Add(GetLocal('i'), 1)),
+        If(Gt(GetLocal('i'), 5), [Break()], []),
+        SetLocal('r', Mul(GetLocal('r'), GetLocal('i')))
+    ])
+], [
+    SetLocal('i', 0),
+    SetLocal('r', 0),
+    DoWhile([
+        SetLocal('i', Add(GetLocal('i'), 1)),
+        If(Eq(Mod(GetLocal('i'), 3), 0), [Continue()], []),
+        SetLocal('r', Add(GetLocal('r'), GetLocal('i')))
+    ], Lt(GetLocal('i'), 10))
+], [
+    SetLocal('r', NewPair(
+        And(Or(0, "x"), Or(False, [])), Not(Eq(And(1, Or(0, 2)), 2))
+    ))
+], [
+    Define('fact', [], ['n'], False, [
+        If(Lt(GetLocal('n'), 2), [Return(1)], []),
+        Return(Mul(GetLocal('n'),
+            Call(GetLocal('fact'), Sub(GetLocal('n'), 1))
+        ))
+    ]),
+    Define('va', [], ['a', 'b'], True, [Return(GetLocal('b'))]),
+    SetLocal('r', NewPair(
+        Call(GetLocal('fact'), 6), Call(GetLocal('va'), 1, 2, 3)
+    ))
+], [
+    Define('find', [], ['x'], False, [
+        Foreach('i', [1, 2, 3, 4], [
+            Block(If(Eq(GetLocal('i'), GetLocal('x')), [
+                Return(Mul(GetLocal('i'), 10))
+            ], []))
+        ]),
+        Return(-1)
+    ]),
+    SetLocal('r', NewPair(
+        Call(GetLocal('find'), 3), Call(GetLocal('find'), 7)
+    ))
+], [
+    SetLocal('r', NewPair(
+        Map([1, 2, 3], Lambda([ 'x' ], False, [
+            Return(ECall(inc, GetLocal('x')))
+        ], [])),
+        NewPair(
+            Filter("aBcD", Lambda([ 'c' ], False, [
+                Return(Lt(GetLocal('c'), "a"))
+            ], [])),
+            All([2, 4], Lambda([ 'x' ], False, [
+                Return(Eq(Mod(GetLocal('x'), 2), 0))
+            ], []))
+        )
+    ))
+], [
+    SetLocal('r', 0),
+    Foreach('i', [1, 2, 3, 4], [
+        TryCatchFinally([
+            If(Eq(GetLocal('i'), 3), [Break()], []),
+            Throw(GetLocal('TypeError'), "x")
+        ], [('TypeError', 'e', [
+            SetLocal('r', Add(GetLocal('r'), GetLocal('i')))
+        ])], [])
+    ])
+], [
+    SetLocal('x', 1),
+    SetLocal('y', 10),
+    Define('f', ['y'], ['a'], False, [
+        Block(
+            SetLocal('y', 100, 1),
+            SetLocal('z', 0),
+            Block(
+                Return(Add(Add(GetLocal('a'), GetLocal('x')), GetLocal('y')))
+            )
+        )
+    ]),
+    Block(
+        SetLocal('x', 2),
+        Block(
+            TryCatchFinally([
+                Throw(GetLocal('TypeError'), "x")
+            ], [('TypeError', 'x', [])], []),
+            SetLocal('r', NewPair(
+                Call(GetLocal('f'), 1000), Eq(GetLocal('x'), 2)
+            ), 2)
+        )
+    )
+]]
+
+class TestCompilerCase(unittest.TestCase):
+
+    def test_equivalence(self):
+        for code in PROGRAMS:
+            p = CommandProcessor()
+            p.run(code)
+            r = p.getenv()['r']
+            q = CommandProcessor()
+            prog = q.compile(code)
+            self.assertIsInstance(prog, Program)
+            q.run([prog])
+            self.assertEqual(q.getenv()['r'], r)
+            q.run([prog])
+            self.assertEqual(q.getenv()['r'], r)
+    #-def
+
+    def test_no_contexts_in_loops(self):
+        p = CommandProcessor()
+        nctxs = []
+        init = CommandContext.__init__
+        def counting_init(self, cmd):
+            nctxs[-1] += 1
+            init(self, cmd)
+        for n in (10, 100):
+            prog = p.compile([
+                SetLocal('r', 0),
+                Foreach('i', List(range(n)), [
+                    If(Lt(GetLocal('i'), 50), [
+                        SetLocal('r', Add(GetLocal('r'), GetLocal('i')))
+                    ], [])
+                ])
+            ])
+            nctxs.append(0)
+            CommandContext.__init__ = counting_init
+            try:
+                p.run([prog])
+            finally:
+                CommandContext.__init__ = init
+            self.assertEqual(p.getenv()['r'], sum(range(min(n, 50))))
+        self.assertEqual(nctxs[0], nctxs[1])
+    #-def
+
+    def test_fallback(self):
+        c = Compiler()
+        loop = Foreach('i', [1], [
+            TryCatchFinally([Break()], [], [])
+        ])
+        prog = c.compile([loop])
+        self.assertEqual(len(prog.code), 2)
+        self.assertIs(prog.code[0][2], loop)
+        prog = c.compile([Foreach('i', [1], [Block(Break())])])
+        self.assertGreater(len(prog.code), 2)
+        self.assertEqual(c.compile([Const(1)]), c.compile([Const(1)]))
+        self.assertNotEqual(c.compile([Const(1)]), c.compile([Const(2)]))
+        self.assertNotEqual(c.compile([Const(1)]), Const(1))
+    #-def
+
+    def test_tailcall(self):
+        p = CommandProcessor()
+        depths = []
+        p.run([p.compile([
+            Define('count', [], ['n'], False, [
+                If(Eq(GetLocal('n'), 0), [
+                    ECall(lambda: depths.append(len(p.traceback()))),
+                    Return(0)
+                ], [
+                    Return(Call(GetLocal('count'), Sub(GetLocal('n'), 1)))
+                ])
+            ]),
+            Call(GetLocal('count'), 10),
+            Call(GetLocal('count'), 1000)
+        ])])
+        self.assertEqual(depths[0], depths[1])
+    #-def
+
+    def test_lexical_addressing(self):
+        c = Compiler()
+        getx = lambda prog: [
+            ins[2] for ins in prog.code if ins[1].__class__ is GetLocal
+        ]
+
+        self.assertEqual(getx(c.compile([
+            GetLocal('x'),
+            Block(GetLocal('x'), Block(GetLocal('x'))),
+            Block(SetLocal('x', 1), Block(GetLocal('x'))),
+            Block(Block(GetLocal('x'), SetLocal('x', 1, 1))),
+            Block(Block(GetLocal('x')), SetLocal('x', 1, 1))
+        ])), [0, 1, 2, 1, 1, 2])
+        self.assertEqual(getx(c.compile([
+            Block(Foreach('x', [1], [Block(GetLocal('x'))])),
+            Block(Block(GetLocal('x')), Define('x', [], [], False, []))
+        ])), [1, 1])
+        self.assertEqual(getx(c.compile([
+            Block(Block(GetLocal('x')), Expand('m')),
+            Block(Block(GetLocal('x')), Lambda([], False, [
+                SetLocal('x', 1, 1)
+            ], []))
+        ])), [1, 1])
+        self.assertEqual(getx(c.compile([
+            Block(Block(GetLocal('x')), Lambda([], False, [
+                SetLocal('x', 1)
+            ], []))
+        ])), [2])
+        self.assertEqual(getx(c.compile([
+            Block(Block(GetLocal('a'), GetLocal('x'), GetLocal('b')))
+        ], ['a', 'b'])), [2, 3, 2])
+        prog = c.compile([Define('f', ['b'], ['a'], False, [
+            GetLocal('a'), GetLocal('b'), GetLocal('x')
+        ])])
+        self.assertEqual(getx(prog.code[0][2].body[0]), [0, 0, 1])
+    #-def
+
+    def test_folding(self):
+        f = Folder()
+        add = Add(1, Mul(2, Const(3))).set_location("f", 1, 2)
+        x = f.fold(add)
+        self.assertIsInstance(x, Const)
+        self.assertEqual(x.constval, 7)
+        self.assertEqual(x.location, Location("f", 1, 2))
+        x = f.fold(Concat("a", Concat(Const("b"), "c")))
+        self.assertEqual(x.constval, "abc")
+        x = f.fold(NewPair(1, NewPair("a", 2.0)))
+        self.assertEqual(x.constval, Pair(1, Pair("a", 2.0)))
+        x = f.fold(NewHashMap(NewPair("!", "XM"), NewPair("#", "HASH")))
+        self.assertEqual(x, {"!": "XM", "#": "HASH"})
+        self.assertNotIsInstance(x, HashMap)
+        self.assertEqual(f.fold(NewList(1, Add(1, 1))), [1, 2])
+        # Failing or non-constant operations are kept:
+        div = Div(1, 0)
+        self.assertIs(f.fold(div), div)
+        getx = GetLocal('x')
+        x = f.fold(Add(getx, Mul(2, 3)))
+        self.assertIsInstance(x, Add)
+        self.assertIs(x.operands[0], getx)
+        self.assertEqual(x.operands[1].constval, 6)
+        x = f.fold(NewList(NewList(1)))
+        self.assertIsInstance(x, NewList)
+        self.assertEqual(x.operands, ([1],))
+        # Dead branches:
+        self.assertIs(f.fold(If(Lt(1, 2), [getx], [div])), getx)
+        self.assertIs(f.fold(If(0, [div], [])).constval, False)
+        x = f.fold(If(Const(""), [div], [getx, getx]).set_location("g", 3))
+        self.assertIsInstance(x, If)
+        self.assertEqual(x.location, Location("g", 3))
+        self.assertEqual(x.c.constval, False)
+        self.assertEqual((x.t, x.e), ([], [getx, getx]))
+        # Nested bodies:
+        loop = While(True, [SetLocal('r', Sub(10, 4))])
+        x = f.fold(loop)
+        self.assertIsNot(x, loop)
+        self.assertEqual(x.b[0].value.constval, 6)
+        self.assertEqual(loop.b[0].value, Sub(10, 4))
+        x = f.fold(Lambda([], False, [Return(Not(Eq(1, 1)))], []))
+        self.assertEqual(x.operands[2][0].expr.operands, (Const(True),))
+        unchanged = [Foreach('i', [1], [Block(Break())])]
+        self.assertIs(f.fold_items(unchanged), unchanged)
+    #-def
+
+    def test_folded_literals_are_fresh(self):
+        p = CommandProcessor()
+        prog = p.compile([SetLocal('r', NewList(1, NewPair(2, 3)))])
+        self.assertEqual(prog.commands[0].value, NewList(1, NewPair(2, 3)))
+        p.run([prog])
+        r = p.getenv()['r']
+        p.run([prog])
+        self.assertEqual(p.getenv()['r'], r)
+        self.assertIsInstance(r, List)
+        self.assertIsNot(p.getenv()['r'], r)
+    #-def
+
+    def test_errors(self):
+        p = CommandProcessor()
+        tbs = []
+        with self.assertRaises(CommandProcessorError):
+            p.run([p.compile([Break()])])
+        with self.assertRaises(CommandProcessorError):
+            p.run([p.compile([Return(1)])])
+        with self.assertRaises(CommandProcessorError):
+            p.run([p.compile([Add(1, "a")])])
+        p.run([p.compile([
+            SetLocal('x', 1),
+            ECall(lambda: tbs.append(p.traceback())).set_location("f", 3, 4)
+        ])])
+        self.assertIsInstance(p.traceback(), Traceback)
+        self.assertIn("[\"f\":3:4]", str(tbs[0]))
+        frame = Frame(Program(((None, None),), []).set_location("g", 1, 1))
+        self.assertEqual(frame.location(), ("g", 1, 1))
+    #-def
+#-class
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestCompilerCase))
+    return suite
+#-def
@@ -33,6 +33,8 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 IN THE SOFTWARE.\
 """
 
+import asyncio
+import pickle
 import unittest
 
 from doit.support.cmd.errors import \
@@ -42,6 +44,7 @@ from doit.support.cmd.errors import \
 from doit.support.cmd.runtime import \
     isderived, \
     Location, \
+    QName, \
     Pair, \
     List, \
     HashMap, \
@@ -52,6 +55,7 @@ from doit.support.cmd.runtime import \
 from doit.support.cmd.eval import \
     MetaInfo, \
     Environment, \
+    Snapshot, \
     CommandProcessor
 
 from doit.support.cmd.commands import \
@@ -59,8 +63,21 @@ from doit.support.cmd.commands import \
     Initializer, \
     Finalizer, \
     Command, \
+    SetLocal, \
+    GetLocal, \
+    Define, \
     Lambda, \
-    Call, Return
+    Closure, \
+    Add, Lt, \
+    Size, GetItem, \
+    Append, \
+    While, \
+    Call, ECall, Return, \
+    Map, Each, \
+    DefModule, SetMember, GetMember
+
+from doit.support.cmd.compiler import \
+    Frame
 
 class LoggingEnv(Environment):
     __slots__ = []
@@ -347,6 +364,17 @@ class TestMetaInfoCase(unittest.TestCase):
         self.assertEqual(m4, m4)
         self.assertEqual(m4, m5)
     #-def
+
+    def test_qname(self):
+        m = MetaInfo()
+
+        self.assertEqual(m.qname, "")
+        m.qname = QName(None, "f").child("x")
+        self.assertEqual(m.qname, "f::x")
+        self.assertIsInstance(m.qname, str)
+        m.qname = "y"
+        self.assertEqual(m.qname, "y")
+    #-def
 #-class
 
 class TestEnvironmentCase(unittest.TestCase):
@@ -501,6 +529,78 @@ class TestEnvironmentCase(unittest.TestCase):
             e1.getvar('z')
         self.assertEqual(e2.getvar('z'), 7)
     #-def
+
+    def test_lookup(self):
+        p = CommandProcessor()
+        e1 = Environment(p)
+        e1.setvar('x', 1)
+        e2 = Environment(outer = e1)
+        e2.setvar('y', 2)
+        e3 = Environment(outer = e2)
+        e3.setvar('x', 3)
+
+        self.assertEqual(e3.getvar('x'), 3)
+        self.assertEqual(e3.lookup('x', 0), 3)
+        self.assertEqual(e3.lookup('x', 1), 1)
+        self.assertEqual(e3.lookup('x', 2), 1)
+        self.assertEqual(e3.lookup('y', 1), 2)
+        with self.assertRaises(CommandError):
+            e3.lookup('z', 1)
+    #-def
+
+    def test_empty_scope(self):
+        p = CommandProcessor()
+        e1 = Environment(p)
+        e1.setvar('x', 1)
+        e2 = Environment(outer = e1)
+        e3 = Environment(outer = e2)
+        e3.setvar('y', 3)
+
+        self.assertEqual(e2.getvar('x'), 1)
+        self.assertEqual(e2.lookup('x', 1), 1)
+        with self.assertRaises(CommandError):
+            e3.getvar('x')
+        with self.assertRaises(CommandError):
+            e3.lookup('x', 2)
+        e2.setvar('z', 2)
+        self.assertEqual(e3.getvar('x'), 1)
+        self.assertEqual(e3.lookup('x', 2), 1)
+
+        code = [
+            SetLocal('x', 1),
+            Define('g', [], [], False, [
+                Return(Call(Lambda([], False, [Return(GetLocal('x'))], [])))
+            ]),
+            Call(GetLocal('g'))
+        ]
+        q = CommandProcessor()
+        for prog in (code, [q.compile(code)]):
+            with self.assertRaisesRegex(CommandProcessorError,
+                r"NameError\(\"Undefined variable 'x'\"\)"
+            ):
+                q.run(prog)
+    #-def
+
+    def test_meta(self):
+        e = Environment(CommandProcessor())
+        q = QName(None, "f")
+        e.setvar('x', 1)
+        e.setvar('y', 2, q.child('y'))
+
+        self.assertEqual(e.getmeta('x').qname, "")
+        self.assertEqual(e.meta['y'].qname, "f::y")
+        self.assertIs(e.getmeta('y'), e.getmeta('y'))
+        e.setvar('y', 3, "g::y")
+        self.assertEqual(e.getmeta('y').qname, "g::y")
+        e.bind({'a': 4}, q)
+        self.assertEqual(e.getmeta('a').qname, "f::a")
+        self.assertEqual(sorted(e.meta.keys()), ['a', 'x', 'y'])
+        with self.assertRaises(KeyError):
+            e.getmeta('b')
+        e.unsetvar('y')
+        with self.assertRaises(KeyError):
+            e.getmeta('y')
+    #-def
 #-class
 
 class TestCommandProcessorCase(unittest.TestCase):
@@ -588,6 +688,71 @@ class TestCommandProcessorCase(unittest.TestCase):
         self.assertIs(p.cmdctx(c1), ctx1)
     #-def
 
+    def test_cmdctx_debug(self):
+        p = CommandProcessor(debug = True)
+        c1 = Command()
+        c2 = Command()
+        ctx1 = CommandContext(c1)
+        ctx2 = CommandContext(c2)
+
+        p.pushctx(ctx1)
+        with self.assertRaises(CommandProcessorError):
+            p.cmdctx(c1)
+        p.insertcode(c1, Finalizer(ctx2), Finalizer(ctx1))
+        with self.assertRaises(CommandProcessorError):
+            p.cmdctx(c1)
+        p.insertcode(c2, Finalizer(ctx1))
+        self.assertIs(p.cmdctx(c1), ctx1)
+        p._CommandProcessor__fnlzidx.append(0)
+        with self.assertRaises(CommandProcessorError):
+            p.cmdctx(c1)
+        p._CommandProcessor__fnlzidx.pop()
+        self.assertIs(p.cmdctx(c1), ctx1)
+
+        p = CommandProcessor(debug = True)
+        p.run([TBlock([TSet('x', 1), TLoad('x')])])
+        self.assertEqual(p.acc(), 1)
+    #-def
+
+    def test_qnames(self):
+        p = CommandProcessor()
+        c = Command()
+        f = Closure("f", "::f", [], {}, [], None)
+        g = Closure("g", "::f::g", [], {}, [], None)
+        ctx, fctx, gctx = CommandContext(c), CommandContext(f), \
+            CommandContext(g)
+
+        self.assertEqual(p.mkqname("x"), "::x")
+        self.assertIs(p.qpath("x"), p.qpath("x"))
+        p.pushctx(fctx)
+        p.pushctx(ctx)
+        self.assertEqual(p.mkqname("x"), "f::x")
+        p.pushctx(gctx)
+        self.assertEqual(p.mkqname("x"), "f::g::x")
+        self.assertIs(p.qpath("x").parent.parent, p.qroot("f"))
+        p.popctx(gctx)
+        self.assertEqual(str(p.qpath("y")), "f::y")
+        p.popctx(ctx)
+        p.popctx(fctx)
+        self.assertEqual(p.mkqname("x"), "::x")
+        p.pushctx(fctx)
+        p.cleanup()
+        self.assertEqual(p.mkqname("x"), "::x")
+
+        p.run([
+            Define("h", [ 'b' ], [ 'a' ], False, [
+                SetLocal('z', 1),
+                Return(Lambda([], False, [], []))
+            ]),
+            Call(GetLocal('h'), 2)
+        ])
+        env = p.acc()[6]
+        self.assertEqual(env.meta['a'].qname, "::h::a")
+        self.assertEqual(env.meta['b'].qname, "::h::b")
+        self.assertEqual(env.meta['z'].qname, "h::z")
+        self.assertEqual(p.getenv().meta['h'].qname, "::h")
+    #-def
+
     def test_valstack(self):
         p = CommandProcessor()
 
@@ -688,6 +853,28 @@ class TestCommandProcessorCase(unittest.TestCase):
             p.run([CommandProcessor()])
     #-def
 
+    def test_codebuff(self):
+        le = LoggingEnv()
+        p = LoggingProcessor(le)
+
+        p.run([
+            TLogBlock(1, [
+                TLogBlock(2, [TSet('x', 1)]),
+                TLogBlock(3, [TLogBlock(4, []), TSet('x', 2)])
+            ]),
+            TLogBlock(5, [])
+        ])
+        self.assertEqual(p.log, [
+            "<1>", "<2>", "</2>", "<3>", "<4>", "</4>", "</3>", "</1>",
+            "<5>", "</5>"
+        ])
+
+        p = CommandProcessor()
+        n = 20000
+        p.run([TBlock([TSet('x', i) for i in range(n)] + [TLoad('x')])])
+        self.assertEqual(p.acc(), n - 1)
+    #-def
+
     def test_event_handling(self):
         p = CommandProcessor()
         c = Command()
@@ -803,6 +990,57 @@ class TestCommandProcessorCase(unittest.TestCase):
         self.assertIs(p.acc(), p.Null)
     #-def
 
+    def test_unwinding(self):
+        def nest(n, cmds):
+            for i in range(n, 0, -1):
+                cmds = [TLogBlock(i, cmds)]
+            return cmds
+
+        def steps(code):
+            p = LoggingProcessor(LoggingEnv())
+            n = 1
+            more = p.run(code, max_steps = 1)
+            while more:
+                more = p.step(1)
+                n += 1
+            return n
+
+        le = LoggingEnv()
+        p = LoggingProcessor(le)
+
+        p.pushval(7)
+        p.run([
+            TTryCatch(nest(3, [TLoad('?')]), [
+                ('NameError', "", [TSet('et', 1)])
+            ]),
+            TSet('ef', 2)
+        ])
+        self.assertEqual(p.log, [
+            "<1>", "<2>", "<3>", "</3>", "</2>", "</1>"
+        ])
+        self.assertEqual(p.getenv().getvar('et'), 1)
+        self.assertEqual(p.getenv().getvar('ef'), 2)
+        self.assertEqual(p.popval(), 7)
+        with self.assertRaises(CommandProcessorError):
+            p.popval()
+
+        # Contexts between the throw point and the handler are left without
+        # dispatching their finalizers:
+        def unwound(n):
+            return steps([
+                TTryCatch(nest(n, [TLoad('?')]), [('NameError', "", [])])
+            ])
+
+        def normal(n):
+            return steps([
+                TTryCatch(nest(n, [TSet('x', 1)]), [('NameError', "", [])])
+            ])
+
+        self.assertEqual(
+            (normal(20) - normal(10)) - (unwound(20) - unwound(10)), 10
+        )
+    #-def
+
     def test_cleanup(self):
         le = LoggingEnv()
         p = LoggingProcessor(le)
@@ -859,6 +1097,255 @@ class TestCommandProcessorCase(unittest.TestCase):
         self.assertIsNone(p.acc())
     #-def
 
+    def test_step(self):
+        code = [
+            SetLocal('i', 0),
+            While(Lt(GetLocal('i'), 100), [
+                SetLocal('i', Add(GetLocal('i'), 1))
+            ]),
+            GetLocal('i')
+        ]
+        p, q = CommandProcessor(), CommandProcessor()
+
+        self.assertFalse(p.running())
+        self.assertTrue(p.run(code, max_steps = 10))
+        self.assertTrue(q.run(code, max_steps = 10))
+        self.assertTrue(p.running())
+        n = 1
+        while p.step(10) | q.step(10):
+            n += 1
+        self.assertFalse(p.running())
+        self.assertFalse(q.running())
+        self.assertEqual(p.acc(), 100)
+        self.assertEqual(q.acc(), 100)
+        self.assertGreater(n, 100)
+        self.assertFalse(p.step(10))
+
+        self.assertFalse(p.run(code))
+        self.assertEqual(p.acc(), 100)
+
+        slice_ = Frame.SLICE
+        try:
+            Frame.SLICE = 8
+            self.assertTrue(p.run([p.compile(code)], max_steps = 4))
+            n = 1
+            while p.step(4):
+                n += 1
+            self.assertEqual(p.acc(), 100)
+            self.assertGreater(n, 100 // 8)
+        finally:
+            Frame.SLICE = slice_
+    #-def
+
+    def test_quotas(self):
+        p = CommandProcessor()
+        recursion = [
+            Define('f', [], ['n'], False, [
+                Return(Add(1, Call(GetLocal('f'), GetLocal('n'))))
+            ]),
+            Call(GetLocal('f'), 0)
+        ]
+
+        self.assertEqual(p.quotas(), (None, None))
+        p.setquotas(contexts = 32)
+        self.assertEqual(p.quotas(), (None, 32))
+        with self.assertRaises(CommandProcessorError) as e:
+            p.run(recursion)
+        self.assertIn(
+            "Command context stack quota exceeded", str(e.exception)
+        )
+        p.cleanup()
+        self.assertFalse(p.running())
+        self.assertEqual(p.quotas(), (None, 32))
+        p.run([Add(1, 2)])
+        self.assertEqual(p.acc(), 3)
+
+        p.setquotas(values = 32)
+        with self.assertRaises(CommandProcessorError) as e:
+            p.run(recursion)
+        self.assertIn("Value stack quota exceeded", str(e.exception))
+        p.cleanup()
+        with self.assertRaises(CommandProcessorError):
+            p.popval()
+        p.run([Add(1, 2)])
+        self.assertEqual(p.acc(), 3)
+    #-def
+
+    def test_run_async(self):
+        log = []
+
+        async def twice(tag, x):
+            log.append(tag)
+            await asyncio.sleep(0)
+            return x * 2
+
+        async def fail():
+            raise ValueError()
+
+        def loop(tag):
+            return [
+                SetLocal('i', 0),
+                SetLocal('s', 0),
+                While(Lt(GetLocal('i'), 5), [
+                    SetLocal('s', Add(
+                        GetLocal('s'), ECall(twice, tag, GetLocal('i'))
+                    )),
+                    SetLocal('i', Add(GetLocal('i'), 1))
+                ]),
+                GetLocal('s')
+            ]
+
+        async def main(p, q, r):
+            await asyncio.gather(
+                p.run_async(loop('p')),
+                q.run_async(loop('q')),
+                r.run_async([r.compile(loop('r'))])
+            )
+
+        p, q, r = CommandProcessor(), CommandProcessor(), CommandProcessor()
+        asyncio.run(main(p, q, r))
+        self.assertEqual((p.acc(), q.acc(), r.acc()), (20, 20, 20))
+        self.assertEqual(sorted(log), ['p'] * 5 + ['q'] * 5 + ['r'] * 5)
+        self.assertNotEqual(log, sorted(log))
+
+        with self.assertRaises(CommandProcessorError) as e:
+            asyncio.run(p.run_async([ECall(fail)]))
+        self.assertIn(
+            "Calling the external procedure has failed", str(e.exception)
+        )
+        p.cleanup()
+
+        with self.assertRaises(CommandProcessorError) as e:
+            p.run([ECall(twice, 'p', 1)])
+        self.assertIn(
+            "Awaiting is possible only inside of run_async",
+            str(e.exception)
+        )
+        p.cleanup()
+        self.assertEqual(log.count('p'), 5)
+    #-def
+
+    def test_run_async_batched(self):
+        log = []
+
+        async def twice(x):
+            await asyncio.sleep(0)
+            return x * 2
+
+        async def fail(x):
+            raise ValueError()
+
+        async def record(x, y):
+            await asyncio.sleep(0)
+            log.append(x + y)
+
+        def proc(f, *args):
+            return Lambda(['x'] + list(args), False, [
+                Return(ECall(f, GetLocal('x'), *map(GetLocal, args)))
+            ], [])
+
+        p = CommandProcessor()
+        asyncio.run(p.run_async([Map([1, 2, 3], proc(twice))]))
+        self.assertEqual(p.acc(), [2, 4, 6])
+        asyncio.run(p.run_async([Each([1, 2], proc(record, 'y'), 10)]))
+        self.assertEqual(log, [11, 12])
+
+        with self.assertRaises(CommandProcessorError) as e:
+            asyncio.run(p.run_async([Map([1], proc(fail))]))
+        self.assertIn(
+            "Calling the external procedure has failed", str(e.exception)
+        )
+        p.cleanup()
+
+        with self.assertRaises(CommandProcessorError) as e:
+            p.run([Map([1], proc(twice))])
+        self.assertIn(
+            "Awaiting is possible only inside of run_async",
+            str(e.exception)
+        )
+        p.cleanup()
+    #-def
+
+    def test_snapshot(self):
+        p = CommandProcessor()
+        p.run([
+            SetLocal('log', List([])),
+            SetLocal('none', None),
+            Define('log1', [], [], False, [
+                Append(GetLocal('log'), 1),
+                Return(Size(GetLocal('log')))
+            ]),
+            DefModule('M', [
+                SetLocal('x', 1),
+                Define('getx', [], [], False, [Return(GetLocal('x'))])
+            ])
+        ])
+        s = p.snapshot()
+        use = [Call(GetLocal('log1'))]
+        getx = [Call(GetMember(GetLocal('M'), 'getx'))]
+
+        self.assertIsInstance(s, Snapshot)
+        q = CommandProcessor(snapshot = s)
+        r = CommandProcessor(snapshot = pickle.loads(pickle.dumps(s)))
+        for x in (p, q, r):
+            x.run(use)
+            self.assertEqual(x.acc(), 1)
+        q.run(use)
+        self.assertEqual(q.acc(), 2)
+        self.assertEqual(len(p.getenv()['log']), 1)
+        self.assertEqual(len(r.getenv()['log']), 1)
+        q.run([SetMember(GetLocal('M'), 'x', 2)] + getx)
+        self.assertEqual(q.acc(), 2)
+        r.run(getx)
+        self.assertEqual(r.acc(), 1)
+        self.assertIs(r.getenv()['none'], r)
+        self.assertIs(r.getenv()['TypeError'], r.TypeError)
+        self.assertIs(r.getenv()[''], r.getenv()['this'])
+        self.assertIs(q.getenv().processor, q)
+        with self.assertRaises(CommandError) as e:
+            q.getenv().getvar('undefined')
+        self.assertIs(e.exception.ecls, q.NameError)
+
+        self.assertTrue(p.run(use, max_steps = 1))
+        with self.assertRaises(CommandProcessorError):
+            p.snapshot()
+        while p.step(16):
+            pass
+        self.assertEqual(p.acc(), 2)
+        self.assertIsInstance(p.snapshot(), Snapshot)
+    #-def
+
+    def test_snapshot_independence(self):
+        p = CommandProcessor()
+        p.run([
+            SetLocal('data', List([List([1]), HashMap({'k': List([2])})])),
+            DefModule('M', [SetLocal('x', List([3]))])
+        ])
+        s = p.snapshot()
+        q, r = CommandProcessor(snapshot = s), CommandProcessor(snapshot = s)
+        mutate = [
+            Append(GetItem(GetLocal('data'), 0), 10),
+            Append(GetItem(GetItem(GetLocal('data'), 1), 'k'), 20),
+            Append(GetMember(GetLocal('M'), 'x'), 30),
+            SetLocal('y', 1)
+        ]
+
+        q.run(mutate)
+        for x in (p, r, CommandProcessor(snapshot = s)):
+            env = x.getenv()
+            self.assertEqual(env['data'], [[1], {'k': [2]}])
+            self.assertEqual(env['M'].ctx.env['x'], [3])
+            self.assertNotIn('y', env)
+        env = q.getenv()
+        self.assertEqual(env['data'], [[1, 10], {'k': [2, 20]}])
+        self.assertEqual(env['M'].ctx.env['x'], [3, 30])
+        self.assertIsNot(env['M'], r.getenv()['M'])
+        self.assertIs(env['M'].ctx.env.processor, q)
+
+        with self.assertRaises(CommandProcessorError):
+            CommandProcessor(Environment(), snapshot = s)
+    #-def
+
     def test_impls(self):
         p = CommandProcessor()
 
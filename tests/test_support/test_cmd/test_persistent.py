@@ -0,0 +1,162 @@
+#                                                         -*- coding: utf-8 -*-
+#! \file    ./tests/test_support/test_cmd/test_persistent.py
+#! \author  Jiří Kučera, <sanczes@gmail.com>
+#! \stamp   2026-10-18 15:12:40 (UTC+01:00, DST+01:00)
+#! \project DoIt!: Tools and Libraries for Building DSLs
+#! \license MIT
+#! \version 0.0.0
+#! \fdesc   @pyfile.docstr
+#
+"""\
+Persistent data structures tests.\
+"""
+
+__license__ = """\
+Copyright (c) 2014 - 2017 Jiří Kučera.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+IN THE SOFTWARE.\
+"""
+
+import random
+import unittest
+
+from doit.support.cmd.persistent import \
+    WIDTH, \
+    PVector, \
+    PMap
+
+class Colliding(object):
+    __slots__ = [ 'name' ]
+
+    def __init__(self, name):
+        self.name = name
+    #-def
+
+    def __hash__(self):
+        return 42
+    #-def
+
+    def __eq__(self, other):
+        return isinstance(other, Colliding) and self.name == other.name
+    #-def
+#-class
+
+class TestPVectorCase(unittest.TestCase):
+
+    def test_push_and_get(self):
+        n = WIDTH * WIDTH * 2 + 7
+        v = PVector()
+        for i in range(n):
+            v = v.append(i)
+        self.assertEqual(len(v), n)
+        self.assertEqual(list(v), list(range(n)))
+        self.assertEqual([v.get(i) for i in range(n)], list(range(n)))
+    #-def
+
+    def test_sharing(self):
+        v1 = PVector().extend(range(100))
+        v2 = v1.set(50, 'x')
+        v3 = v1.append(100)
+        self.assertEqual(v1.get(50), 50)
+        self.assertEqual(v2.get(50), 'x')
+        self.assertEqual(len(v1), 100)
+        self.assertEqual(len(v3), 101)
+        self.assertEqual(list(v3), list(range(101)))
+        self.assertIs(v1.leaf(0), v2.leaf(0))
+        self.assertIs(v1.leaf(0), v3.leaf(0))
+    #-def
+
+    def test_random(self):
+        rng = random.Random(18)
+        model, v = [], PVector()
+        for _ in range(3000):
+            if model and rng.random() < 0.3:
+                i = rng.randrange(len(model))
+                model[i] = rng.random()
+                v = v.set(i, model[i])
+            else:
+                model.append(rng.random())
+                v = v.append(model[-1])
+        self.assertEqual(list(v), model)
+    #-def
+#-class
+
+class TestPMapCase(unittest.TestCase):
+
+    def test_set_get_remove(self):
+        m = PMap()
+        for i in range(1000):
+            m = m.set(i, i * i)
+        self.assertEqual(len(m), 1000)
+        self.assertEqual(m.get(31), 961)
+        self.assertIsNone(m.get(1000))
+        self.assertEqual(m.get(1000, 'd'), 'd')
+        m2 = m.set(31, 0)
+        self.assertEqual(len(m2), 1000)
+        self.assertEqual(m.get(31), 961)
+        self.assertEqual(m2.get(31), 0)
+        m3 = m.remove(31)
+        self.assertEqual(len(m3), 999)
+        self.assertIsNone(m3.get(31))
+        self.assertEqual(m.get(31), 961)
+        self.assertIs(m.remove(1000), m)
+        self.assertIs(m.set(31, m.get(31)), m)
+        self.assertEqual(sorted(m.keys()), list(range(1000)))
+        self.assertEqual(
+            sorted(m.values()), sorted(i * i for i in range(1000))
+        )
+    #-def
+
+    def test_collisions(self):
+        a, b, c = Colliding('a'), Colliding('b'), Colliding('c')
+        m = PMap().update([(a, 1), (b, 2), (c, 3), (0, 4)])
+        self.assertEqual(len(m), 4)
+        self.assertEqual(m.get(Colliding('b')), 2)
+        m2 = m.remove(b)
+        self.assertEqual(len(m2), 3)
+        self.assertIsNone(m2.get(b))
+        self.assertEqual(m2.get(a), 1)
+        self.assertEqual(m.get(b), 2)
+        m3 = m2.remove(a).remove(c)
+        self.assertEqual(dict(m3.items()), {0: 4})
+        self.assertIs(m3.remove(a), m3)
+    #-def
+
+    def test_random(self):
+        rng = random.Random(18)
+        model, m = {}, PMap()
+        for _ in range(5000):
+            k = rng.randrange(700)
+            if rng.random() < 0.35:
+                model.pop(k, None)
+                m = m.remove(k)
+            else:
+                model[k] = rng.random()
+                m = m.set(k, model[k])
+        self.assertEqual(len(m), len(model))
+        self.assertEqual(dict(m.items()), model)
+    #-def
+#-class
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestPVectorCase))
+    suite.addTest(unittest.makeSuite(TestPMapCase))
+    return suite
+#-def
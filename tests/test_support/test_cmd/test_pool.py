@@ -0,0 +1,149 @@
+#                                                         -*- coding: utf-8 -*-
+#! \file    ./tests/test_support/test_cmd/test_pool.py
+#! \author  Jiří Kučera, <sanczes@gmail.com>
+#! \stamp   2026-10-18 13:05:34 (UTC+01:00, DST+01:00)
+#! \project DoIt!: Tools and Libraries for Building DSLs
+#! \license MIT
+#! \version 0.0.0
+#! \fdesc   @pyfile.docstr
+#
+"""\
+Command processor pool tests.\
+"""
+
+__license__ = """\
+Copyright (c) 2014 - 2017 Jiří Kučera.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+IN THE SOFTWARE.\
+"""
+import pickle
+import sys
+import unittest
+
+from doit.support.cmd.errors import \
+    CommandProcessorError
+
+from doit.support.cmd.runtime import \
+    List
+
+from doit.support.cmd.commands import \
+    SetLocal, \
+    GetLocal, \
+    Define, \
+    Add, Mul, \
+    Foreach, \
+    Call, Return, \
+    Throw, \
+    DefModule, GetMember
+
+from doit.support.cmd.eval import \
+    CommandProcessor
+
+from doit.support.cmd.pool import \
+    ProcessorPool
+
+def job(n):
+    return [
+        Define('sq', [], ['x'], False, [
+            Return(Mul(GetLocal('x'), GetLocal('x')))
+        ]),
+        SetLocal('s', 0),
+        Foreach('i', List(range(n)), [
+            SetLocal('s', Add(
+                GetLocal('s'), Call(GetLocal('sq'), GetLocal('i'))
+            ))
+        ]),
+        GetLocal('s')
+    ]
+#-def
+
+def member_job(n, site):
+    return [
+        DefModule('M', [SetLocal('x', n)]),
+        SetLocal('s', 0),
+        Foreach('i', List(range(200)), [
+            SetLocal('s', Add(GetLocal('s'), site))
+        ]),
+        GetLocal('s')
+    ]
+#-def
+
+FAILING = [
+    Define('f', [], [], False, [Throw(GetLocal('TypeError'), "boom")]),
+    Call(GetLocal('f'))
+]
+
+class TestProcessorPoolCase(unittest.TestCase):
+
+    def test_shared_tree(self):
+        code = job(10)
+        foreach = code[2]
+        results = ProcessorPool(workers = 4).map([code] * 16)
+        self.assertEqual(results, [(285, None)] * 16)
+        self.assertEqual(foreach, job(10)[2])
+    #-def
+
+    def test_shared_member_cache(self):
+        site = GetMember(GetLocal('M'), 'x')
+        jobs = [member_job(n, site) for n in range(16)]
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            results = ProcessorPool(workers = 4).map(jobs)
+        finally:
+            sys.setswitchinterval(interval)
+        self.assertEqual(results, [(200 * n, None) for n in range(16)])
+    #-def
+
+    def test_errors(self):
+        p = CommandProcessor()
+        with self.assertRaises(CommandProcessorError) as e:
+            p.run(FAILING)
+        results = ProcessorPool(workers = 2).map([job(3), FAILING])
+        self.assertEqual(results[0], (5, None))
+        self.assertIsNone(results[1][0])
+        self.assertIsInstance(results[1][1], CommandProcessorError)
+        self.assertEqual(str(results[1][1]), str(e.exception))
+        e2 = pickle.loads(pickle.dumps(e.exception))
+        self.assertEqual(str(e2), str(e.exception))
+        self.assertEqual(
+            list(e2.traceback), [str(x) for x in e.exception.traceback]
+        )
+    #-def
+
+    def test_processes(self):
+        p = CommandProcessor()
+        with self.assertRaises(CommandProcessorError) as e:
+            p.run(FAILING)
+        results = ProcessorPool(workers = 2, processes = True).map([
+            job(4), FAILING, job(5)
+        ])
+        self.assertEqual(results[0], (14, None))
+        self.assertEqual(results[2], (30, None))
+        self.assertIsNone(results[1][0])
+        self.assertIsInstance(results[1][1], CommandProcessorError)
+        self.assertEqual(str(results[1][1]), str(e.exception))
+    #-def
+#-class
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestProcessorPoolCase))
+    return suite
+#-def
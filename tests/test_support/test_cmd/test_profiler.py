@@ -0,0 +1,179 @@
+#                                                         -*- coding: utf-8 -*-
+#! \file    ./tests/test_support/test_cmd/test_profiler.py
+#! \author  Jiří Kučera, <sanczes@gmail.com>
+#! \stamp   2026-10-18 13:05:12 (UTC+01:00, DST+01:00)
+#! \project DoIt!: Tools and Libraries for Building DSLs
+#! \license MIT
+#! \version 0.0.0
+#! \fdesc   @pyfile.docstr
+#
+"""\
+Command processor's profiler tests.\
+"""
+
+__license__ = """\
+Copyright (c) 2014 - 2017 Jiří Kučera.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+IN THE SOFTWARE.\
+"""
+
+import io
+import os
+import pstats
+import tempfile
+import unittest
+
+from doit.support.cmd.runtime import \
+    Location
+
+from doit.support.cmd.commands import \
+    Initializer, \
+    Finalizer, \
+    GetLocal, \
+    Define, \
+    Add, Sub, Mul, Eq, \
+    If, Block, \
+    Call, Return
+
+from doit.support.cmd.eval import \
+    CommandProcessor
+
+from doit.support.cmd.profiler import \
+    Profiler
+
+class Clock(object):
+    __slots__ = [ 't' ]
+
+    def __init__(self):
+        self.t = 0
+
+    def __call__(self):
+        self.t += 1
+        return self.t
+#-class
+
+FACT = [
+    Define('fact', [], ['n'], False, [
+        If(Eq(GetLocal('n'), 0), [
+            Return(1)
+        ], [
+            Return(Mul(
+                GetLocal('n'),
+                Call(GetLocal('fact'), Sub(GetLocal('n'), 1))
+                .set_location("f", 3, 1)
+            ))
+        ]).set_location("f", 2, 1)
+    ]).set_location("f", 1, 1),
+    Call(GetLocal('fact'), 5).set_location("f", 5, 1)
+]
+
+class TestProfilerCase(unittest.TestCase):
+
+    def setUp(self):
+        self.p = CommandProcessor()
+        self.prof = Profiler(Clock())
+        self.p.setprofiler(self.prof)
+        self.p.run(FACT)
+
+    def test_result(self):
+        self.assertIs(self.p.profiler(), self.prof)
+        self.assertEqual(self.p.acc(), 120)
+        self.p.setprofiler(None)
+        self.p.run([Add(1, 2)])
+        self.assertEqual(self.p.acc(), 3)
+        self.assertEqual(self.prof.expansions.get(Add, 0), 0)
+
+    def test_counts(self):
+        self.assertEqual(self.prof.expansions[Define], 1)
+        self.assertEqual(self.prof.expansions[Call], 6)
+        self.assertEqual(self.prof.expansions[If], 6)
+        self.assertEqual(self.prof.expansions[Mul], 5)
+        self.assertLessEqual(18, self.prof.callbacks[Initializer])
+        self.assertLessEqual(
+            self.prof.callbacks[Initializer], self.prof.callbacks[Finalizer]
+        )
+        self.assertEqual(
+            sum(n for (_, f), n in self.prof.calls.items() if f[4]), 6
+        )
+
+    def test_times(self):
+        total = sum(self.prof.samples.values())
+        procs = self.prof.procedures()
+        incl, excl = procs['::fact']
+        self.assertLess(0, excl)
+        self.assertLessEqual(excl, incl)
+        self.assertLessEqual(incl, total)
+        locs = self.prof.locations()
+        self.assertLessEqual(incl, locs[Location("f", 5, 1)][0])
+        self.assertLessEqual(locs[Location("f", 2, 1)][0], incl)
+        self.assertLessEqual(
+            sum(v[1] for v in locs.values()), total
+        )
+
+    def test_collapsed(self):
+        lines = self.prof.collapsed()
+        self.assertTrue(lines)
+        for line in lines:
+            stack, n = line.rsplit(" ", 1)
+            self.assertTrue(stack.startswith("<main>"))
+            self.assertLess(0, int(n))
+        self.assertIn(
+            "<main>;call at [\"f\":5:1];::fact;if at [\"f\":2:1]", "\n".join(
+                lines
+            )
+        )
+        self.assertEqual(
+            sum(int(l.rsplit(" ", 1)[1]) for l in lines),
+            int(round(sum(self.prof.samples.values()) * 1000000))
+        )
+
+    def test_pstats(self):
+        out = io.StringIO()
+        stats = pstats.Stats(self.prof, stream = out)
+        key = ("~", 0, "::fact")
+        cc, nc, tt, ct, callers = stats.stats[key]
+        self.assertEqual(nc, 6)
+        self.assertEqual(ct, self.prof.procedures()['::fact'][0])
+        self.assertIn(("f", 5, "call at [\"f\":5:1]"), callers)
+        self.assertIn(("f", 3, "call at [\"f\":3:1]"), callers)
+        stats.sort_stats('cumulative').print_stats()
+        self.assertIn("::fact", out.getvalue())
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            self.prof.dump_stats(path)
+            self.assertIn(key, pstats.Stats(path).stats)
+        finally:
+            os.remove(path)
+
+    def test_reset(self):
+        self.prof.reset()
+        self.assertEqual(self.prof.samples, {})
+        self.assertEqual(self.prof.procedures(), {})
+        self.p.run([Block(Add(1, 2))])
+        self.assertEqual(self.prof.expansions[Block], 1)
+        self.assertEqual(self.prof.expansions[Add], 1)
+        self.assertNotIn(Define, self.prof.expansions)
+#-class
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestProfilerCase))
+    return suite
+#-def
@@ -33,6 +33,7 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 IN THE SOFTWARE.\
 """
 
+import pickle
 import unittest
 
 from doit.support.cmd.errors import \
@@ -41,13 +42,26 @@ from doit.support.cmd.errors import \
 from doit.support.cmd.runtime import \
     isderived, \
     Location, \
+    QName, \
     Evaluable, \
     BaseIterator, \
     FiniteIterator, \
+    RangeIterator, \
+    StreamIterator, \
     Iterable, \
     Pair, \
     List, \
     HashMap, \
+    Set, \
+    LazyIterable, \
+    Range, \
+    StrView, \
+    HashMapView, \
+    Stream, \
+    Rope, \
+    iterator_of, \
+    PersistentList, \
+    PersistentHashMap, \
     UserType, \
     ExceptionClass, \
     Traceback, \
@@ -103,6 +117,32 @@ class TestLocationCase(unittest.TestCase):
         x, y, z = loc1
         self.assertEqual((x, y, z), ("A", 1, 2))
         self.assertEqual(str(loc1), 'at ["A":1:2]')
+
+        loc2 = pickle.loads(pickle.dumps(loc1))
+        self.assertIsInstance(loc2, Location)
+        self.assertEqual(loc2, loc1)
+    #-def
+#-class
+
+class TestQNameCase(unittest.TestCase):
+
+    def test_methods(self):
+        root = QName(None, "")
+        f = QName(None, "f")
+        x = root.child("x")
+
+        self.assertIs(root.child("x"), x)
+        self.assertIs(x.parent, root)
+        self.assertEqual(x.name, "x")
+        self.assertEqual(str(root), "")
+        self.assertEqual(str(x), "::x")
+        self.assertEqual(str(f.child("g").child("y")), "f::g::y")
+        self.assertIsNot(f.child("g"), root.child("g"))
+        q = f
+        for i in range(5000):
+            q = q.child("a")
+        self.assertEqual(str(q), "f" + 5000 * "::a")
+        self.assertEqual(str(q.parent), "f" + 4999 * "::a")
     #-def
 #-class
 
@@ -161,6 +201,48 @@ class TestIteratorCase(unittest.TestCase):
         self.assertEqual(fi1.next(), fi1)
         fi1.reset()
         self.assertEqual(fi1.next(), "a")
+
+        fi2 = FiniteIterator("abcd", 1, 3)
+        fi2.reset()
+        self.assertEqual(fi2.next(), "b")
+        self.assertEqual(fi2.next(), "c")
+        self.assertIs(fi2.next(), fi2)
+        fi2.reset()
+        self.assertEqual(fi2.next(), "b")
+    #-def
+
+    def test_RangeIterator(self):
+        ri0 = RangeIterator(0, 3, 1)
+        ri1 = RangeIterator(3, 0, -2)
+
+        self.assertEqual(ri0.next(), 0)
+        self.assertEqual(ri0.next(), 1)
+        self.assertEqual(ri0.next(), 2)
+        self.assertIs(ri0.next(), ri0)
+        ri0.reset()
+        self.assertEqual(ri0.next(), 0)
+
+        self.assertEqual(ri1.next(), 3)
+        self.assertEqual(ri1.next(), 1)
+        self.assertIs(ri1.next(), ri1)
+    #-def
+
+    def test_StreamIterator(self):
+        si0 = StreamIterator(lambda: iter("ab"))
+        si1 = StreamIterator(x for x in "ab")
+
+        self.assertEqual(si0.next(), "a")
+        self.assertEqual(si0.next(), "b")
+        self.assertIs(si0.next(), si0)
+        si0.reset()
+        self.assertEqual(si0.next(), "a")
+
+        si1.reset()
+        self.assertEqual(si1.next(), "a")
+        self.assertEqual(si1.next(), "b")
+        self.assertIs(si1.next(), si1)
+        si1.reset()
+        self.assertIs(si1.next(), si1)
     #-def
 #-class
 
@@ -180,6 +262,7 @@ class TestIterableCase(unittest.TestCase):
         self.assertEqual(i.next(), 1)
         self.assertEqual(i.next(), 2)
         self.assertIs(i.next(), i)
+        self.assertEqual(pickle.loads(pickle.dumps(p)), p)
     #-def
 
     def test_List(self):
@@ -195,6 +278,28 @@ class TestIterableCase(unittest.TestCase):
         self.assertIs(i.next(), i)
     #-def
 
+    def test_List_unique(self):
+        l = [3, [1], 1, 3, [1], True, 'a', (1, [2]), (1, [2]), 1.0]
+
+        self.assertEqual(List.unique(l), [3, [1], 1, 'a', (1, [2])])
+        self.assertIsInstance(List.unique(l), List)
+        self.assertEqual(List.unique(range(10 ** 4)), list(range(10 ** 4)))
+    #-def
+
+    def test_Set(self):
+        s = Set([1, 2, 2])
+        i = Set(s).iterator()
+
+        self.assertEqual(len(s), 2)
+        self.assertEqual(s, Set([2, 1]))
+        self.assertEqual(hash(s), hash(frozenset([1, 2])))
+        self.assertIn(s, {Set([1, 2])})
+        self.assertIsInstance(pickle.loads(pickle.dumps(s)), Set)
+        self.assertEqual(pickle.loads(pickle.dumps(s)), s)
+        self.assertEqual(sorted([i.next(), i.next()]), [1, 2])
+        self.assertIs(i.next(), i)
+    #-def
+
     def test_HashMap(self):
         d = {'a': '1', 1: 'b', "xy": 0.25}
         c = (lambda x: {1: 0, 'a': 1, "xy": 2}.get(x, -1))
@@ -221,6 +326,184 @@ class TestIterableCase(unittest.TestCase):
         self.assertEqual(l, k)
         self.assertEqual(l, [1, 'a', "xy"])
     #-def
+
+    def test_Range(self):
+        self.assertEqual(list(Range(4)), [0, 1, 2, 3])
+        self.assertEqual(list(Range(1, 7, 3)), [1, 4])
+        self.assertEqual(list(Range(3, 0, -1)), [3, 2, 1])
+        self.assertEqual(list(Range(3, 0)), [])
+        self.assertEqual(len(Range(1, 7, 3)), 2)
+        self.assertEqual(len(Range(10 ** 12)), 10 ** 12)
+        self.assertEqual(Range(4), Range(0, 4, 1))
+        self.assertNotEqual(Range(4), Range(0, 4, 2))
+        self.assertIsInstance(Range(4), LazyIterable)
+        self.assertEqual(pickle.loads(pickle.dumps(Range(1, 5))), Range(1, 5))
+        with self.assertRaises(ValueError):
+            list(Range(0, 4, 0))
+    #-def
+
+    def test_StrView(self):
+        v = StrView("abcdef", 1, -1)
+
+        self.assertEqual(str(v), "bcde")
+        self.assertEqual(len(v), 4)
+        self.assertEqual(list(v), ["b", "c", "d", "e"])
+        self.assertEqual(v, StrView("xbcdex", 1, 5))
+        self.assertNotEqual(v, StrView("abcdef"))
+        self.assertEqual(list(StrView("abc", 2, 1)), [])
+        self.assertEqual(len(StrView("abc", 2, 1)), 0)
+    #-def
+
+    def test_HashMapView(self):
+        h = HashMap({'a': 1, 'b': 2})
+        keys = HashMapView(h)
+        values = HashMapView(h, HashMapView.VALUES)
+        items = HashMapView(h, HashMapView.ITEMS)
+
+        self.assertEqual(sorted(keys), ['a', 'b'])
+        self.assertEqual(sorted(values), [1, 2])
+        self.assertEqual(sorted(items), [('a', 1), ('b', 2)])
+        self.assertIsInstance(list(items)[0], Pair)
+        self.assertEqual(len(keys), 2)
+        self.assertEqual(keys, HashMapView(HashMap(h)))
+        self.assertNotEqual(keys, values)
+        h['c'] = 3
+        self.assertEqual(sorted(keys), ['a', 'b', 'c'])
+    #-def
+
+    def test_Stream(self):
+        f = (lambda: iter([1, 2, 3]))
+        s = Stream(f)
+
+        self.assertEqual(list(s), [1, 2, 3])
+        self.assertEqual(list(s), [1, 2, 3])
+        self.assertEqual(s, Stream(f))
+        self.assertNotEqual(s, Stream(lambda: iter([1, 2, 3])))
+        s = Stream(x for x in "ab")
+        self.assertEqual(list(s), ["a", "b"])
+        self.assertEqual(list(s), [])
+    #-def
+
+    def test_Rope(self):
+        class Sink(object):
+            def __init__(self):
+                self.data = []
+            def write(self, s):
+                self.data.append(s)
+        r = Rope("ab")
+        a = r.concat("c")
+        b = r.concat("d")
+        c = a.concat(Rope("x", a)).concat("")
+        sink = Sink()
+
+        self.assertEqual((str(r), str(a), str(b)), ("ab", "abc", "abd"))
+        self.assertEqual(str(c), "abcxabc")
+        self.assertEqual(len(c), 7)
+        self.assertEqual(list(a), ["a", "b", "c"])
+        self.assertEqual(c, Rope("abcxabc"))
+        self.assertNotEqual(c, "abcxabc")
+        self.assertEqual(hash(c), hash(Rope("abc", "xabc")))
+        self.assertIsInstance(c, LazyIterable)
+        self.assertEqual(pickle.loads(pickle.dumps(c)), c)
+        a.concat(Rope("x", a)).write_to(sink)
+        self.assertEqual(sink.data, ["ab", "c", "x", "abc"])
+        self.assertIs(a.concat(""), a)
+        s = Rope()
+        for i in range(10000):
+            s = s.concat("%d," % (i % 10))
+        self.assertEqual(len(s), 20000)
+        self.assertEqual(str(s)[:6], "0,1,2,")
+        self.assertEqual(list(s.chunks()), [str(s)])
+    #-def
+
+    def test_iterator_of(self):
+        i = iterator_of("ab")
+        j = iterator_of(List([1]))
+
+        self.assertIsInstance(i, FiniteIterator)
+        self.assertEqual(i.next(), "a")
+        self.assertEqual(i.next(), "b")
+        self.assertIs(i.next(), i)
+        self.assertEqual(j.next(), 1)
+        self.assertIs(j.next(), j)
+    #-def
+
+    def test_PersistentList(self):
+        l = PersistentList(range(40))
+        k = PersistentList(l)
+
+        self.assertEqual(l, list(range(40)))
+        self.assertEqual(len(l), 40)
+        self.assertEqual(l[-1], 39)
+        self.assertIn(7, l)
+        self.assertEqual(l[2:5], PersistentList([2, 3, 4]))
+        self.assertIsInstance(l[2:5], PersistentList)
+        l[0] = 'a'
+        l.append(40)
+        self.assertEqual(l[0], 'a')
+        self.assertEqual(k[0], 0)
+        self.assertEqual(len(k), 40)
+        self.assertEqual(len(l), 41)
+        m = k.updated(1, 'b').appended('c')
+        self.assertEqual((m[1], m[-1], k[1], len(k)), ('b', 'c', 1, 40))
+        self.assertEqual(k + [40], list(range(41)))
+        del l[0]
+        l.remove(40)
+        l.insert(0, 0)
+        self.assertEqual(l, k)
+        l.reverse()
+        self.assertEqual(l[0], 39)
+        l.sort()
+        self.assertEqual(l, k)
+        self.assertEqual((l.index(3), l.count(3)), (3, 1))
+        i = k.iterator()
+        k[0] = 'x'
+        self.assertEqual(i.next(), 0)
+        with self.assertRaises(IndexError):
+            k[40]
+        with self.assertRaises(TypeError):
+            hash(k)
+    #-def
+
+    def test_PersistentHashMap(self):
+        d = PersistentHashMap({'a': 1, 'b': 2})
+        e = PersistentHashMap(d)
+
+        self.assertEqual(d, {'a': 1, 'b': 2})
+        self.assertEqual(d, HashMap({'a': 1, 'b': 2}))
+        self.assertEqual(len(d), 2)
+        self.assertIn('a', d)
+        self.assertNotIn('c', d)
+        self.assertEqual(d['b'], 2)
+        self.assertIsNone(d.get('c'))
+        d['c'] = 3
+        del d['a']
+        self.assertEqual(d, {'b': 2, 'c': 3})
+        self.assertEqual(e, {'a': 1, 'b': 2})
+        self.assertEqual(e.updated('a', 0), {'a': 0, 'b': 2})
+        self.assertEqual(e.removed('a'), {'b': 2})
+        self.assertEqual(e['a'], 1)
+        self.assertEqual(
+            PersistentHashMap.merge(e, {'b': 0, 'z': 9}),
+            {'a': 1, 'b': 0, 'z': 9}
+        )
+        e.update([('x', 1)])
+        self.assertEqual(sorted(e.keys()), ['a', 'b', 'x'])
+        self.assertEqual(sorted(e.values()), [1, 1, 2])
+        self.assertEqual(sorted(PersistentHashMap(e.items())), ['a', 'b', 'x'])
+        i = e.iterator()
+        e['y'] = 0
+        self.assertEqual(
+            sorted([i.next(), i.next(), i.next()]), ['a', 'b', 'x']
+        )
+        self.assertIs(i.next(), i)
+        with self.assertRaises(KeyError):
+            e['c']
+        with self.assertRaises(KeyError):
+            del e['c']
+        with self.assertRaises(TypeError):
+            hash(e)
+    #-def
 #-class
 
 class TestUserTypeCase(unittest.TestCase):
@@ -365,6 +648,53 @@ class TestTracebackCase(unittest.TestCase):
             tb = Traceback(stack)
             self.assertEqual(str(tb), r)
     #-def
+
+    def test_lazy_capture(self):
+        class Counting(PseudoCommand):
+            __slots__ = []
+            calls = 0
+            def isfunc(self):
+                Counting.calls += 1
+                return PseudoCommand.isfunc(self)
+        stack = [
+            PseudoContext("f", Location()), PseudoContext("g", Location())
+        ]
+        for ctx in stack:
+            ctx.cmd = Counting(ctx.cmd.name, ctx.cmd.location)
+        stack[-1].cmd.location = Location("foo.g", 1, 2)
+        tb = Traceback(stack)
+        g = stack.pop()
+        stack.append(PseudoContext("h", Location()))
+
+        self.assertEqual(Counting.calls, 0)
+        self.assertEqual(len(tb), 2)
+        self.assertEqual(Counting.calls, 2)
+        self.assertEqual(str(tb), "In f\n| from g:\n> At [\"foo.g\":1:2]:")
+        self.assertEqual(Counting.calls, 2)
+        self.assertEqual([str(x) for x in tb], ["f", "g"])
+        self.assertEqual(tb, Traceback([stack[0], g]))
+        self.assertNotEqual(tb, Traceback(stack))
+        u = pickle.loads(pickle.dumps(tb))
+        self.assertEqual(list(u), ["f", "g"])
+        self.assertEqual(str(u), str(tb))
+    #-def
+
+    def test_chain_capture(self):
+        f, g = PseudoContext("f", Location()), PseudoContext("g", Location())
+        h = PseudoContext("h", Location("foo.h", 3, 4), False)
+        chain = (h, (g, (f, None)))
+        tb = Traceback(chain)
+        ntb = Traceback((f, None))
+
+        self.assertEqual([str(x) for x in tb], ["f", "g"])
+        self.assertEqual(tb.frames() + ["x"], [f.cmd, g.cmd, "x"])
+        self.assertEqual(list(tb), [f.cmd, g.cmd])
+        self.assertEqual(tb.frames().index(g.cmd), 1)
+        self.assertEqual(str(tb), "In f\n| from g:\n> At [\"foo.h\":3:4]:")
+        self.assertEqual(tb, Traceback([f, g, h]))
+        self.assertEqual(ntb, [f.cmd])
+        self.assertEqual(str(Traceback(None)), "In <main>:\n>")
+    #-def
 #-class
 
 class TestProcedureTemplateCase(unittest.TestCase):
@@ -388,6 +718,7 @@ class TestProcedureTemplateCase(unittest.TestCase):
 def suite():
     suite = unittest.TestSuite()
     suite.addTest(unittest.makeSuite(TestLocationCase))
+    suite.addTest(unittest.makeSuite(TestQNameCase))
     suite.addTest(unittest.makeSuite(TestEvaluableCase))
     suite.addTest(unittest.makeSuite(TestIteratorCase))
     suite.addTest(unittest.makeSuite(TestIterableCase))
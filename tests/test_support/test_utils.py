@@ -43,6 +43,7 @@ from doit.support.errors import DoItAssertionError
 
 from doit.support.utils import \
     ordinal_suffix, deep_eq, timestamp, \
+    structural_fields, structural_hash, Structural, HashConsTable, \
     Functor, WithStatementExceptionHandler, Collection
 
 class Struct(object):
@@ -117,6 +118,38 @@ class FunctorB(Functor):
     #-def
 #-class
 
+class Node(Structural):
+    __slots__ = [ 'ctor', '__kids', 'hash_' ]
+    NONSTRUCTURAL = [ 'ctor' ]
+
+    def __init__(self, *kids):
+        self.ctor = lambda: None
+        self.__kids = list(kids)
+        self.hash_ = None
+    #-def
+
+    def kids(self):
+        return self.__kids
+    #-def
+
+    def __eq__(self, other):
+        return isinstance(other, self.__class__) \
+        and deep_eq(self.__kids, other.__kids)
+    #-def
+#-class
+
+class Leaf(Node):
+    __slots__ = []
+
+    def __init__(self, value):
+        Node.__init__(self, value)
+    #-def
+
+    def __eq__(self, other):
+        return Node.__eq__(self, other)
+    #-def
+#-class
+
 class TestOrdinalSuffixCase(unittest.TestCase):
 
     def test_ordinal_suffix(self):
@@ -295,6 +328,68 @@ class TestFunctorCase(unittest.TestCase):
     #-def
 #-class
 
+class TestHashConsingCase(unittest.TestCase):
+
+    def test_structural_hash(self):
+        self.assertEqual(structural_fields(Node), ('_Node__kids',))
+        self.assertEqual(structural_fields(Leaf), ('_Node__kids',))
+        self.assertEqual(structural_hash(Leaf(1)), structural_hash(Leaf(1)))
+        self.assertEqual(
+            structural_hash(Node(Leaf(1), [2])),
+            structural_hash(Node(Leaf(1), (2,)))
+        )
+        self.assertNotEqual(structural_hash(Leaf(1)), structural_hash(Node(1)))
+        self.assertEqual(
+            structural_hash(FunctorA(1, [2], c = {'x': 3})),
+            structural_hash(FunctorA(1, (2,), c = {'x': 3}))
+        )
+        self.assertEqual(structural_hash([{}, ()]), structural_hash(({}, [])))
+        l = [1]
+        l.append(l)
+        self.assertEqual(structural_hash(l), structural_hash(l))
+        self.assertEqual(structural_hash(set()), 0)
+        with self.assertRaises(TypeError):
+            hash(Leaf(1))
+        with self.assertRaises(TypeError):
+            {FunctorA(1, 2): 1}
+        table = HashConsTable()
+        d = {table.intern(Leaf(1)): 1, table.intern(Leaf(1)): 2}
+        d[table.intern(Leaf(2))] = 3
+        self.assertEqual(len(d), 2)
+        leaf = table.intern(Leaf(1))
+        leaf.kids()[0] = 5
+        self.assertEqual(d[leaf], 2)
+
+    def test_intern(self):
+        table = HashConsTable()
+        t1 = Node(Leaf(1), Node(Leaf(2), (Leaf(1),)))
+        t2 = Node(Leaf(1), Node(Leaf(2), (Leaf(1),)))
+        t3 = Node(Leaf(2), Node(Leaf(2), (Leaf(1),)))
+        kids = t2.kids()
+
+        i1 = table.intern(t1)
+        self.assertIs(i1, t1)
+        self.assertIs(t1.kids()[0], t1.kids()[1].kids()[1][0])
+        self.assertEqual(len(table), 4)
+        self.assertIs(table.intern(t2), t1)
+        self.assertIs(t2.kids(), kids)
+        self.assertIs(kids[0], t1.kids()[0])
+        i3 = table.intern(t3)
+        self.assertIs(i3.kids()[1], t1.kids()[1])
+        self.assertIn(t1, table)
+        self.assertNotIn(t2, table)
+        self.assertNotIn(1, table)
+        self.assertEqual(len(table), 5)
+        self.assertFalse(deep_eq(t1, t3))
+        self.assertIs(
+            table.intern(FunctorA(1, 2)), table.intern(FunctorA(1, 2))
+        )
+        self.assertEqual(table.intern((1, [2])), (1, [2]))
+        table.clear()
+        self.assertEqual(len(table), 0)
+        self.assertIsNot(table.intern(Leaf(1)), t1.kids()[0])
+#-class
+
 class TestWithStatementExceptionHandlerCase(unittest.TestCase):
 
     def test_what_happen_when_exception_is_not_raised(self):
@@ -521,6 +616,7 @@ def suite():
     suite.addTest(unittest.makeSuite(TestDeepEqCase))
     suite.addTest(unittest.makeSuite(TestTimeStampCase))
     suite.addTest(unittest.makeSuite(TestFunctorCase))
+    suite.addTest(unittest.makeSuite(TestHashConsingCase))
     suite.addTest(unittest.makeSuite(TestWithStatementExceptionHandlerCase))
     suite.addTest(unittest.makeSuite(TestCollectionCase))
     return suite
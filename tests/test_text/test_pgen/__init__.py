@@ -35,7 +35,8 @@ IN THE SOFTWARE.\
 
 import unittest
 
-from . import test_errors, test_utils, test_models, test_readers
+from . import test_errors, test_utils, test_models, test_readers, \
+    test_cache
 
 def suite():
     suite = unittest.TestSuite()
@@ -43,5 +44,6 @@ def suite():
     suite.addTest(test_utils.suite())
     suite.addTest(test_models.suite())
     suite.addTest(test_readers.suite())
+    suite.addTest(test_cache.suite())
     return suite
 #-def
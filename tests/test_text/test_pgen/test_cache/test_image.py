@@ -0,0 +1,176 @@
+#                                                         -*- coding: utf-8 -*-
+#! \file    ./tests/test_text/test_pgen/test_cache/test_image.py
+#! \author  Jiří Kučera, <sanczes@gmail.com>
+#! \stamp   2026-10-18 14:48:05 (UTC+01:00, DST+01:00)
+#! \project DoIt!: Tools and Libraries for Building DSLs
+#! \license MIT
+#! \version 0.0.0
+#! \fdesc   @pyfile.docstr
+#
+"""\
+Compiled module image cache tests.\
+"""
+
+__license__ = """\
+Copyright (c) 2014 - 2017 Jiří Kučera.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+IN THE SOFTWARE.\
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from doit.config.version import \
+    Version
+
+from doit.text.pgen.cache.image import \
+    ImageCache
+
+from doit.text.pgen.readers.glap.bootstrap import \
+    GlapReader
+
+SOURCE = """\
+module m
+  grammar G
+    start -> "a"+ | b;
+    b -> "x".."z";
+  end
+  define f {
+  }
+  defmacro mac x y (#x + #y;)
+end
+"""
+
+class CountingCache(ImageCache):
+    __slots__ = [ 'scans' ]
+
+    def __init__(self, *args):
+        ImageCache.__init__(self, *args)
+        self.scans = 0
+    #-def
+
+    def entries(self):
+        self.scans += 1
+        return ImageCache.entries(self)
+    #-def
+#-class
+
+class TestImageCacheCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache = ImageCache(os.path.join(self.dir, "cache"))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_load_store(self):
+        c = self.cache
+
+        self.assertIsNone(c.load("x"))
+        self.assertEqual(c.size(), 0)
+        self.assertTrue(c.store("x", [1, (2, 3)]))
+        self.assertEqual(c.load("x"), [1, (2, 3)])
+        self.assertIsNone(c.load("x", "other"))
+        self.assertIsNone(c.load("y"))
+        self.assertFalse(c.store("z", lambda: None))
+        self.assertEqual(len(c.entries()), 1)
+        self.assertEqual(c.size(), os.path.getsize(c.entries()[0][2]))
+
+    def test_invalid_images(self):
+        c = self.cache
+        c.store("x", 1)
+        path = c.path(c.digest("x"))
+
+        newer = ImageCache(c.directory, version = Version(99, 0, 0, 0))
+        self.assertIsNone(newer.load("x"))
+        self.assertFalse(os.path.exists(path))
+
+        c.store("x", 1)
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) - 1)
+        self.assertIsNone(c.load("x"))
+        self.assertFalse(os.path.exists(path))
+
+        c.store("x", 1)
+        with open(path, 'r+b') as f:
+            f.write(b"NOTANIMG")
+        self.assertIsNone(c.load("x"))
+        self.assertEqual(c.entries(), [])
+
+    def test_invalidate_and_evict(self):
+        c = self.cache
+        for i, s in enumerate("abcd"):
+            c.store(s, s * 100)
+            os.utime(c.path(c.digest(s)), (i, i))
+        c.load("a")
+        c.invalidate("b")
+        self.assertIsNone(c.load("b"))
+        self.assertEqual(len(c.entries()), 3)
+
+        size = c.entries()[0][1]
+        c.evict(2 * size)
+        self.assertIsNone(c.load("c"))
+        self.assertEqual(c.load("a"), "a" * 100)
+        self.assertEqual(c.load("d"), "d" * 100)
+
+        c.limit = size
+        c.store("e", "e" * 100)
+        self.assertEqual(len(c.entries()), 1)
+        c.invalidate()
+        self.assertEqual(c.size(), 0)
+
+    def test_eviction_threshold(self):
+        c = CountingCache(self.cache.directory, 10 ** 6)
+        for x in "abcd":
+            c.store(x, x * 100)
+        self.assertEqual(c.scans, 1)
+        self.assertEqual(len(c.entries()), 4)
+
+        size = c.entries()[0][1]
+        c.scans = 0
+        c.limit = 2 * size
+        c.store("e", "e" * 100)
+        self.assertEqual(c.scans, 1)
+        self.assertEqual(len(c.entries()), 2)
+        self.assertEqual(c.load("e"), "e" * 100)
+
+    def test_glap_reader(self):
+        plain = GlapReader().read(SOURCE, name = "m.g")
+        reader = GlapReader(cache = self.cache)
+
+        self.assertEqual(reader.read(SOURCE, name = "m.g"), plain)
+        self.assertEqual(len(self.cache.entries()), 1)
+        cached = reader.read(SOURCE, name = "m.g")
+        self.assertEqual(cached, plain)
+        self.assertIsNot(cached, plain)
+        self.assertEqual(cached.location, ("m.g", 1, 1))
+        self.assertIsNotNone(self.cache.load(SOURCE, "m.g"))
+        self.assertIsNone(reader.read(
+            os.path.join(self.dir, "none.g"), from_file = True
+        ))
+#-class
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestImageCacheCase))
+    return suite
+#-def
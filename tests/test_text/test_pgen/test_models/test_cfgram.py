@@ -38,6 +38,10 @@ import unittest
 from doit.support.errors import \
     DoItAssertionError
 
+from doit.support.utils import \
+    structural_hash, \
+    HashConsTable
+
 from doit.support.cmd.eval import \
     CommandProcessor
 
@@ -85,6 +89,24 @@ class TestRuleNodeCase(unittest.TestCase):
         self.assertIsInstance(e1['+'], PositiveIteration)
         self.assertIsInstance(e1['?'], Optional)
     #-def
+
+    def test_hashing(self):
+        table = HashConsTable()
+        r1 = (Sym('a') + Word("bc")) | -Sym('a')
+        r2 = (Sym('a') + Word("bc")) | -Sym('a')
+
+        self.assertEqual(structural_hash(r1), structural_hash(r2))
+        self.assertNotEqual(
+            structural_hash(r1),
+            structural_hash((Sym('a') + Word("bd")) | -Sym('a'))
+        )
+        with self.assertRaises(TypeError):
+            hash(r1)
+        self.assertIs(table.intern(r1), r1)
+        self.assertIs(table.intern(r2), r1)
+        self.assertEqual({r1: 1}[table.intern(r2)], 1)
+        self.assertEqual(len(table), 5)
+    #-def
 #-class
 
 class TestTerminalNodeCase(unittest.TestCase):